@@ -0,0 +1,127 @@
+'''
+dedupbenchmark - time AnalyzeAgeGrade.deduplicate() for large synthetic runners
+===================================================================================
+
+Usage::
+
+    python benchmarks/dedupbenchmark.py [-s STATS] [-r RUNNERS] [-d DUPFRACTION]
+
+each synthetic runner has STATS results, DUPFRACTION of which are repeats of an
+earlier race reported by another source, with slightly different distance and
+priority. The deduplicated stats are checked against the previous implementation,
+which popped from the front of the sorted list and so was quadratic in the
+number of stats.
+'''
+
+# standard
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+# pypi
+
+# github
+
+# other
+
+# home grown
+from running.analyzeagegrade import AnalyzeAgeGrade
+
+SOURCES = [('runningahead', 1), ('athlinks', 2), ('ultrasignup', 3)]
+DISTANCES = [1609, 5000, 8047, 10000, 15000, 21097, 42195, 80467]
+
+#----------------------------------------------------------------------
+def synthrunner(nstats, dupfraction, rand):
+#----------------------------------------------------------------------
+    '''
+    create runner with synthetic stats
+
+    :param nstats: number of stats
+    :param dupfraction: fraction of stats which duplicate an earlier race
+    :param rand: random.Random instance
+    :rtype: AnalyzeAgeGrade
+    '''
+    aag = AnalyzeAgeGrade()
+    aag.set_runner('synthetic runner')
+    start = datetime(1990, 1, 1)
+    races = []
+    for i in range(nstats):
+        if races and rand.random() < dupfraction:
+            date, dist = rand.choice(races)
+            dist = dist * rand.uniform(0.97, 1.03)
+        else:
+            date = start + timedelta(days=rand.randrange(30*365))
+            dist = rand.choice(DISTANCES)
+            races.append((date, dist))
+        source, priority = rand.choice(SOURCES)
+        aag.add_stat(date, dist, dist/3.5, race='race {}'.format(i), source=source, priority=priority)
+    return aag
+
+#----------------------------------------------------------------------
+def legacydeduplicate(stats):
+#----------------------------------------------------------------------
+    '''
+    previous deduplicate algorithm, with index added to sort keys so that ties
+    don't compare AgeGradeStat objects
+
+    :param stats: list of AgeGradeStat
+    :rtype: deduplicated list of AgeGradeStat
+    '''
+    EPS = .1
+    decstats = sorted([((s.date,s.dist,i),s) for i,s in enumerate(stats)])
+    stats = [ds[1] for ds in decstats]
+
+    deduped = []
+    while len(stats) > 0:
+        thisstat = stats.pop(0)
+        sameraces = [(thisstat.priority,0,thisstat)]
+        while   len(stats) > 0 \
+                and thisstat.date == stats[0].date \
+                and abs((thisstat.dist - stats[0].dist) / thisstat.dist) <= EPS:
+            stat = stats.pop(0)
+            sameraces.append((stat.priority,len(sameraces),stat))
+        sameraces.sort()
+        deduped.append(sameraces[0][2])
+    return deduped
+
+#----------------------------------------------------------------------
+def main():
+#----------------------------------------------------------------------
+    parser = argparse.ArgumentParser(description='time AnalyzeAgeGrade.deduplicate()')
+    parser.add_argument('-s', '--stats', type=int, default=10000, help='stats per runner, default %(default)s')
+    parser.add_argument('-r', '--runners', type=int, default=5, help='number of runners, default %(default)s')
+    parser.add_argument('-d', '--dupfraction', type=float, default=0.3, help='fraction of duplicated races, default %(default)s')
+    parser.add_argument('--seed', type=int, default=1, help='random seed, default %(default)s')
+    args = parser.parse_args()
+
+    rand = random.Random(args.seed)
+    runners = [synthrunner(args.stats, args.dupfraction, rand) for r in range(args.runners)]
+
+    legacytime = 0
+    expected = []
+    for aag in runners:
+        started = time.perf_counter()
+        expected.append(legacydeduplicate(aag.stats))
+        legacytime += time.perf_counter() - started
+
+    dedupetime = 0
+    for aag in runners:
+        started = time.perf_counter()
+        aag.deduplicate()
+        dedupetime += time.perf_counter() - started
+
+    for aag, legacy in zip(runners, expected):
+        if aag.stats != legacy:
+            raise SystemExit('deduplicated stats differ from legacy algorithm')
+
+    print('{} runners x {} stats, {} kept per runner on average'.format(
+        args.runners, args.stats, sum(len(aag.stats) for aag in runners) // args.runners))
+    print('legacy      {:8.3f} secs'.format(legacytime))
+    print('deduplicate {:8.3f} secs ({:.1f}x)'.format(dedupetime, legacytime/dedupetime))
+
+# ##########################################################################################
+#	__main__
+# ##########################################################################################
+if __name__ == "__main__":
+    main()
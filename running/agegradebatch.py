@@ -0,0 +1,165 @@
+'''
+agegradebatch - age grade many results at once
+===================================================================
+
+:class:`AgeGradeBatch` computes the same statistics as AgeGrade.agegrade(), but
+for arrays of ages, genders, distances and times in a single call. The factors
+for all ages are interpolated once for each (surface, gender, distance), and kept
+for later calls, so grading a club's results is a few numpy operations.
+
+Where AgeGrade.agegrade() raises parameterError, e.g., for a distance outside of the
+factor tables, the statistics for that result are nan, so one bad result doesn't
+stop the rest of the batch from being graded.
+'''
+
+# standard
+
+# pypi
+import numpy as np
+
+# github
+
+# other
+
+# home grown
+
+MPERMILE = 1609.344
+
+# some known conversions, as in AgeGrade.agegrade()
+CDIST = {26.2: 42195, 13.1: 21098}
+
+# ages in the factor tables, other ages use the closest of these
+MINAGE = 5
+MAXAGE = 99
+
+# meter fuzziness allowed outside of table distances
+EPSILON = 1
+
+# genders in the factor tables
+GENS = ('F', 'M', 'X')
+
+########################################################################
+class AgeGradeBatch():
+########################################################################
+    '''
+    batch age grade calculation
+
+    :param agegradedata: AgeGrade.agegradedata, i.e.,
+        {surface: {gen: {dist: {'OC': openstd, age: factor, ...}, ...}, ...}, ...}
+        or without the surface level, which is then treated as 'road'
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self, agegradedata):
+    #----------------------------------------------------------------------
+        if 'road' not in agegradedata:
+            agegradedata = {'road': agegradedata}
+        self.agegradedata = agegradedata
+
+        # tables {(surface, gen): (dists, factors, openstds)}, dists sorted
+        # factors is array [dist, age], for ages 0 through MAXAGE
+        self.tables = {}
+
+        # interpolated {(surface, gen, meters): (factors, openstd)}, factors indexed by age
+        self.interpolated = {}
+
+    #----------------------------------------------------------------------
+    def _table(self, surface, gen):
+    #----------------------------------------------------------------------
+        key = (surface, gen)
+        if key not in self.tables:
+            data = self.agegradedata[surface][gen]
+            dists = np.array(sorted(data), dtype=np.float64)
+            factors = np.zeros((len(dists), MAXAGE+1))
+            for i, dist in enumerate(sorted(data)):
+                for age in range(MINAGE, MAXAGE+1):
+                    factors[i, age] = data[dist][age]
+            openstds = np.array([data[dist]['OC'] for dist in sorted(data)])
+            self.tables[key] = (dists, factors, openstds)
+        return self.tables[key]
+
+    #----------------------------------------------------------------------
+    def _interpolate(self, surface, gen, meters):
+    #----------------------------------------------------------------------
+        '''
+        interpolate factors and open standards between table distances
+
+        :param surface: 'road' or 'track'
+        :param gen: 'F', 'M' or 'X'
+        :param meters: numpy array of unique distances, rounded to the meter
+        :rtype: (factors, openstds) - factors is array [meters, age]
+        '''
+        missing = [m for m in meters.tolist() if (surface, gen, m) not in self.interpolated]
+        if missing:
+            dists, factors, openstds = self._table(surface, gen)
+            missing = np.array(missing, dtype=np.float64)
+
+            # surrounding table distances, extrapolating from the end segments
+            upper = np.clip(np.searchsorted(dists, missing, side='left'), 1, len(dists)-1)
+            lower = upper - 1
+            fraction = (missing - dists[lower]) / (dists[upper] - dists[lower])
+
+            mfactors = factors[lower] + (factors[upper] - factors[lower]) * fraction[:, np.newaxis]
+            mopenstds = openstds[lower] + (openstds[upper] - openstds[lower]) * fraction
+            for i, m in enumerate(missing.tolist()):
+                self.interpolated[surface, gen, m] = (mfactors[i], mopenstds[i])
+
+        rows = [self.interpolated[surface, gen, m] for m in meters.tolist()]
+        return np.array([row[0] for row in rows]), np.array([row[1] for row in rows])
+
+    #----------------------------------------------------------------------
+    def agegrade(self, ages, gens, distmiles, times, surface=None):
+    #----------------------------------------------------------------------
+        '''
+        age grade statistics for each result, see AgeGrade.agegrade()
+
+        :param ages: sequence of ages, fractional ages are truncated
+        :param gens: sequence of genders, M, F or X, or single gender for all results
+        :param distmiles: sequence of distances (miles)
+        :param times: sequence of times (seconds)
+        :param surface: 'road', 'track' or 'trail', default chooses road if there are road
+            factors for the distance, else track
+        :rtype: (age performance percentages, age graded results, age grade factors) numpy arrays,
+            nan for results which can't be age graded
+        '''
+        ages = np.clip(np.asarray(ages, dtype=np.float64).astype(np.int64), MINAGE, MAXAGE)
+        distmiles = np.asarray(distmiles, dtype=np.float64)
+        times = np.asarray(times, dtype=np.float64)
+        n = len(distmiles)
+
+        gens = np.char.upper(np.broadcast_to(np.asarray(gens, dtype=str), (n,)))
+        validgens = [gen for gen in np.unique(gens).tolist() if gen in GENS]
+
+        distmeters = distmiles * MPERMILE
+        for miles, meters in CDIST.items():
+            distmeters[distmiles == miles] = meters
+        rounded = np.round(distmeters)
+
+        # choose surface for each result
+        if surface == 'trail':
+            surface = 'road'
+        surfaces = np.full(n, surface or 'road', dtype=object)
+        if not surface:
+            for gen in validgens:
+                minroad = self._table('road', gen)[0][0]
+                surfaces[(gens == gen) & (rounded < minroad)] = 'track'
+
+        # results with bad gender or distance outside the tables are left nan
+        factor = np.full(n, np.nan)
+        openstd = np.full(n, np.nan)
+        for thissurface in np.unique(surfaces).tolist():
+            for gen in validgens:
+                selected = np.flatnonzero((surfaces == thissurface) & (gens == gen))
+                dists = self._table(thissurface, gen)[0]
+                inside = (distmeters[selected] >= dists[0]-EPSILON) & (distmeters[selected] <= dists[-1]+EPSILON)
+                selected = selected[inside]
+                if len(selected) == 0: continue
+
+                meters, inverse = np.unique(rounded[selected], return_inverse=True)
+                mfactors, mopenstds = self._interpolate(thissurface, gen, meters)
+                factor[selected] = mfactors[inverse, ages[selected]]
+                openstd[selected] = mopenstds[inverse]
+
+        agpercentage = 100*(openstd/factor)/times
+        agresult = times*factor
+        return agpercentage, agresult, factor
@@ -0,0 +1,321 @@
+'''
+agegradecolumns - columnar storage of age grade statistics
+===================================================================
+
+statistics are held as numpy arrays, one array per field, so a runner's results
+can be filtered, grouped and regressed without looping through stat objects
+
+race, loc and source repeat across many results, so they are encoded as integers
+indexing into self.categories[attr]
+
+:meth:`AgeGradeColumns.regress` computes the age grade trend for any number of
+subsets of the stats at once, without matplotlib
+'''
+
+# standard
+import hashlib
+from collections import namedtuple
+
+# pypi
+import numpy as np
+from scipy import stats
+
+# github
+
+# other
+
+# home grown
+
+# same as AgeGradeStat.attrs
+ATTRS = 'race,date,loc,dist,time,ag,source,fuzzyage,priority'.split(',')
+
+# attributes which are stored as category codes
+CATEGORICAL = ['race', 'loc', 'source']
+
+# epsilon -- if event distance is within this tolerance, it is considered the same
+DUPEPS = .1
+
+# avoid division by zero in t statistic when correlation is perfect, as in scipy.stats.linregress
+TINY = 1.0e-20
+
+# statistics for a subset of stats, regression of ag against datenum() of date
+# n - number of stats, mean - mean ag
+# slope, intercept, rvalue, pvalue, stderr - as in scipy.stats.linregress, nan if n < 2
+Regression = namedtuple('Regression', 'n,mean,slope,intercept,rvalue,pvalue,stderr')
+
+#----------------------------------------------------------------------
+def datenum(dates):
+#----------------------------------------------------------------------
+    '''
+    convert dates to days since 1970-01-01, as matplotlib.dates.date2num() with default epoch
+
+    :param dates: numpy datetime64 array
+    :rtype: numpy float array
+    '''
+    return (dates - np.datetime64('1970-01-01T00:00:00', 'us')) / np.timedelta64(1, 'D')
+
+########################################################################
+class AgeGradeColumns():
+########################################################################
+    '''
+    columnar age grade statistics for a single runner
+
+    dates are numpy datetime64[us], dist is meters, time is seconds, ag is percentage
+    (nan if not calculated), lower priority is kept by :meth:`deduplicate`
+
+    dist and time are float arrays for computation, but the values they were created
+    from are kept too, so :meth:`rows` gives back e.g. int distances unchanged
+
+    :param rows: iterable of {attr: value, ...}, attrs as in AgeGradeStat.attrs
+    :param categories: {attr: [value, ...], ...} to share with another instance, for internal use
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self, rows=(), categories=None):
+    #----------------------------------------------------------------------
+        rows = list(rows)
+
+        # categories may be shared with the instance these were taken from
+        self.categories = categories if categories is not None else {attr: [] for attr in CATEGORICAL}
+        self._catcodes = {attr: {value: code for code, value in enumerate(self.categories[attr])} for attr in CATEGORICAL}
+
+        self.date = np.array([row['date'] for row in rows], dtype='datetime64[us]')
+        self.dist = np.array([row['dist'] for row in rows], dtype=np.float64)
+        self.time = np.array([row['time'] for row in rows], dtype=np.float64)
+        self.distvalues = np.array([row['dist'] for row in rows], dtype=object)
+        self.timevalues = np.array([row['time'] for row in rows], dtype=object)
+        self.ag = np.array([np.nan if row.get('ag') is None else row['ag'] for row in rows], dtype=np.float64)
+        self.priority = np.array([row.get('priority', 1) for row in rows], dtype=np.int64)
+        self.fuzzyage = np.array([row.get('fuzzyage') for row in rows], dtype=object)
+        self.codes = {attr: np.array([self._code(attr, row.get(attr)) for row in rows], dtype=np.int32)
+                      for attr in CATEGORICAL}
+
+    #----------------------------------------------------------------------
+    @classmethod
+    def fromstats(cls, stats):
+    #----------------------------------------------------------------------
+        '''
+        create columns from stat objects
+
+        :param stats: iterable of :class:`AgeGradeStat`
+        :rtype: AgeGradeColumns
+        '''
+        return cls({attr: getattr(stat, attr) for attr in ATTRS} for stat in stats)
+
+    #----------------------------------------------------------------------
+    def _code(self, attr, value):
+    #----------------------------------------------------------------------
+        codes = self._catcodes[attr]
+        if value not in codes:
+            codes[value] = len(self.categories[attr])
+            self.categories[attr].append(value)
+        return codes[value]
+
+    #----------------------------------------------------------------------
+    def __len__(self):
+    #----------------------------------------------------------------------
+        return len(self.date)
+
+    #----------------------------------------------------------------------
+    def _arrays(self):
+    #----------------------------------------------------------------------
+        arrays = {'date': self.date, 'dist': self.dist, 'time': self.time, 'ag': self.ag,
+                  'priority': self.priority, 'fuzzyage': self.fuzzyage,
+                  'distvalues': self.distvalues, 'timevalues': self.timevalues}
+        arrays.update(self.codes)
+        return arrays
+
+    #----------------------------------------------------------------------
+    def _fromarrays(self, arrays):
+    #----------------------------------------------------------------------
+        columns = AgeGradeColumns(categories=self.categories)
+        for attr in ['date', 'dist', 'time', 'ag', 'priority', 'fuzzyage', 'distvalues', 'timevalues']:
+            setattr(columns, attr, arrays[attr])
+        columns.codes = {attr: arrays[attr] for attr in CATEGORICAL}
+        return columns
+
+    #----------------------------------------------------------------------
+    def take(self, index):
+    #----------------------------------------------------------------------
+        '''
+        select some of the stats
+
+        :param index: boolean mask or integer index array
+        :rtype: AgeGradeColumns with selected stats, in index order
+        '''
+        return self._fromarrays({attr: array[index] for attr, array in self._arrays().items()})
+
+    #----------------------------------------------------------------------
+    def extend(self, rows):
+    #----------------------------------------------------------------------
+        '''
+        add stats after the current ones
+
+        :param rows: iterable of {attr: value, ...}
+        :rtype: AgeGradeColumns with current stats followed by rows
+        '''
+        other = AgeGradeColumns(rows, categories=self.categories)
+        theseattrs = self._arrays()
+        otherattrs = other._arrays()
+        return self._fromarrays({attr: np.concatenate([theseattrs[attr], otherattrs[attr]]) for attr in theseattrs})
+
+    #----------------------------------------------------------------------
+    def values(self, attr):
+    #----------------------------------------------------------------------
+        '''
+        decode categorical attribute
+
+        :param attr: 'race', 'loc' or 'source'
+        :rtype: numpy object array of values
+        '''
+        return np.array(self.categories[attr], dtype=object)[self.codes[attr]]
+
+    #----------------------------------------------------------------------
+    def years(self):
+    #----------------------------------------------------------------------
+        '''
+        :rtype: numpy integer array of year of each stat
+        '''
+        return self.date.astype('datetime64[Y]').astype(np.int64) + 1970
+
+    #----------------------------------------------------------------------
+    def ages(self, dob):
+    #----------------------------------------------------------------------
+        '''
+        age of runner at each stat
+
+        :param dob: datetime date of birth
+        :rtype: numpy integer array of ages
+        '''
+        months = self.date.astype('datetime64[M]')
+        monthday = (months - self.date.astype('datetime64[Y]').astype('datetime64[M]')).astype(np.int64) * 100 \
+                 + (self.date.astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64)
+        beforebirthday = monthday < (dob.month - 1) * 100 + (dob.day - 1)
+        return self.years() - dob.year - beforebirthday
+
+    #----------------------------------------------------------------------
+    def rows(self):
+    #----------------------------------------------------------------------
+        '''
+        :rtype: [{attr: value, ...}, ...] suitable for AgeGradeStat(**row)
+        '''
+        columns = {
+            'date':     self.date.astype(object).tolist(),
+            'dist':     self.distvalues.tolist(),
+            'time':     self.timevalues.tolist(),
+            'ag':       [None if np.isnan(ag) else ag for ag in self.ag.tolist()],
+            'priority': self.priority.tolist(),
+            'fuzzyage': self.fuzzyage.tolist(),
+        }
+        for attr in CATEGORICAL:
+            columns[attr] = self.values(attr).tolist()
+        return [dict(zip(ATTRS, values)) for values in zip(*[columns[attr] for attr in ATTRS])]
+
+    #----------------------------------------------------------------------
+    def digest(self):
+    #----------------------------------------------------------------------
+        '''
+        hash of the stats' contents, which changes if any stat is added, removed or changed
+
+        category codes depend on the order values were first seen, so decoded values are hashed
+
+        :rtype: hex string
+        '''
+        hashed = hashlib.sha256()
+        for array in [self.date.astype(np.int64), self.dist, self.time, self.ag, self.priority]:
+            hashed.update(np.ascontiguousarray(array).tobytes())
+        for attr in CATEGORICAL + ['fuzzyage']:
+            values = self.values(attr) if attr in CATEGORICAL else self.fuzzyage
+            hashed.update(repr(values.tolist()).encode('utf-8'))
+        return hashed.hexdigest()
+
+    #----------------------------------------------------------------------
+    def deduplicate(self, eps=DUPEPS):
+    #----------------------------------------------------------------------
+        '''
+        remove stats which are duplicates, assuming stats on same day for same
+        distance are duplicated, same as AnalyzeAgeGrade.deduplicate()
+
+        races are grouped in (date, dist) order, a stat joins the group if it has the
+        same date as the group's first stat, and distance within eps of it. The lowest
+        priority of each group is kept, the first in (date, dist) order if tied
+
+        :param eps: relative distance tolerance
+        :rtype: AgeGradeColumns with deduplicated stats, in (date, dist) order
+        '''
+        n = len(self)
+        if n == 0:
+            return self
+
+        position = np.arange(n)
+        order = np.lexsort((position, self.priority, self.dist, self.date))
+        dates = self.date[order].tolist()
+        dists = self.dist[order].tolist()
+
+        # groups depend on the first stat of the group, so can't be found from neighbors alone
+        isstart = np.zeros(n, dtype=bool)
+        firstdate = firstdist = None
+        for i in range(n):
+            if i == 0 or dates[i] != firstdate or abs((firstdist - dists[i]) / firstdist) > eps:
+                isstart[i] = True
+                firstdate, firstdist = dates[i], dists[i]
+        group = np.cumsum(isstart) - 1
+
+        # best of each group is first after sorting by group, priority, position
+        bygroup = np.lexsort((position, self.priority[order], group))
+        isbest = np.ones(n, dtype=bool)
+        isbest[1:] = group[bygroup][1:] != group[bygroup][:-1]
+        return self.take(order[bygroup[isbest]])
+
+    #----------------------------------------------------------------------
+    def regress(self, subsets):
+    #----------------------------------------------------------------------
+        '''
+        age grade trend for each subset of the stats, in a single pass
+
+        for each subset, linear regression of ag against :func:`datenum` of date
+        gives the same result as scipy.stats.linregress
+
+        :param subsets: {label: boolean mask, ...}
+        :rtype: {label: Regression, ...}
+        '''
+        labels = list(subsets)
+        if not labels:
+            return {}
+        masks = np.array([subsets[label] for label in labels], dtype=np.float64).reshape(len(labels), len(self))
+
+        # center x so sums of squares don't lose precision
+        x = datenum(self.date)
+        offset = x.mean() if len(x) > 0 else 0.0
+        x = x - offset
+        y = self.ag
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            n = masks.sum(axis=1)
+            xmean = masks @ x / n
+            ymean = masks @ y / n
+            ssxm = masks @ (x*x) - n*xmean*xmean
+            ssym = masks @ (y*y) - n*ymean*ymean
+            ssxym = masks @ (x*y) - n*xmean*ymean
+
+            slope = ssxym / ssxm
+            intercept = ymean - slope*(xmean + offset)
+            rvalue = np.clip(ssxym / np.sqrt(ssxm*ssym), -1.0, 1.0)
+            df = n - 2
+            t = rvalue * np.sqrt(df / ((1.0 - rvalue)*(1.0 + rvalue) + TINY))
+            pvalue = 2 * stats.t.sf(np.abs(t), df)
+            stderr = np.sqrt((1 - rvalue**2) * ssym / ssxm / df)
+
+        # line through two points is exact, as scipy.stats.linregress reports
+        two = n == 2
+        pvalue[two] = 0.0
+        stderr[two] = 0.0
+
+        # regression needs at least 2 points
+        few = n < 2
+        for array in [slope, intercept, rvalue, pvalue, stderr]:
+            array[few] = np.nan
+
+        return {label: Regression(int(n[i]), float(ymean[i]), float(slope[i]), float(intercept[i]),
+                                  float(rvalue[i]), float(pvalue[i]), float(stderr[i]))
+                for i, label in enumerate(labels)}
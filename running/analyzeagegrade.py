@@ -26,17 +26,15 @@ log = logging.getLogger('running.analyzeagegrade')
 log.setLevel(logging.INFO)
 
 # other libraries
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
-import matplotlib.colors as colors
-import matplotlib.dates as mdates
-import matplotlib.font_manager as fontmgr
-from scipy import stats
+# matplotlib is imported only when rendering, so summaries can be computed without it
+import numpy as np
 
 # home grown libraries
 from running.running import version
 from loutilities import timeu
 from runningclub import agegrade
+from running import agegradebatch
+from running.agegradecolumns import AgeGradeColumns
 import running.running.runningahead as runningahead
 from running.running.runningahead import FIELD
 
@@ -50,8 +48,9 @@ SUBS = {1609:'1M',3219:'2M',4989:'5K',5000:'5K',8047:'5M',10000:'10K',15000:'15K
         80467:'50M',160934:'100M'} #
 
 tdisp = timeu.asctime('%m/%d/%Y')
-# pull in age grade object
+# pull in age grade object, and batch calculation using the same factors
 ag = agegrade.AgeGrade()
+agbatch = agegradebatch.AgeGradeBatch(ag.agegradedata)
     
 
 #-------------------------------------------------------------------------------
@@ -142,12 +141,16 @@ class AnalyzeAgeGrade():
 ########################################################################
     '''
     age grade analysis
+    
+    :param size: True if marker size is to depend on distance
+    :param columnar: True to store stats in :class:`AgeGradeColumns`, rather than list of :class:`AgeGradeStat`
     '''
     
     #-------------------------------------------------------------------------------
-    def __init__(self, size=False):
+    def __init__(self, size=False, columnar=False):
     #-------------------------------------------------------------------------------
         self.exectime = time.time()
+        self.columnar = columnar
         self.gender = None
         self.dob = None
         self.cmapsm = None
@@ -173,6 +176,12 @@ class AnalyzeAgeGrade():
         # stats = list(AgeGradeStat(),... ) 
         self.stats = []
         
+        # columnar stats, added stats are pending until columns are needed
+        # columnstats caches objects created from columns for get_stats()
+        self.columns = AgeGradeColumns()
+        self.pending = []
+        self.columnstats = None
+        
         # self.dists = set of distances included in stats, rounded
         self.dists = set([])
 
@@ -188,7 +197,11 @@ class AnalyzeAgeGrade():
         :param kwargs: keyword arguments, must match AgeGradeState attrs
         '''
         
-        self.stats.append(AgeGradeStat(date,dist,time,**kwargs))
+        if self.columnar:
+            self.pending.append(dict(date=date,dist=dist,time=time,**kwargs))
+            self.columnstats = None
+        else:
+            self.stats.append(AgeGradeStat(date,dist,time,**kwargs))
         self.dists.add(round(dist))
         
     #-------------------------------------------------------------------------------
@@ -200,7 +213,16 @@ class AnalyzeAgeGrade():
         :param stat: :class:`AgeGradeStat` to delete
         '''
         try:
-            self.stats.remove(stat)
+            if self.columnar:
+                # stat must be one returned by get_stats()
+                stats = self.get_stats()
+                position = [id(s) for s in stats].index(id(stat))
+                keep = np.ones(len(stats), dtype=bool)
+                keep[position] = False
+                self.columns = self.columns.take(keep)
+                del stats[position]
+            else:
+                self.stats.remove(stat)
         except ValueError:
             log.warning('del_stat: failed to delete {}'.format(stat))
         
@@ -210,10 +232,63 @@ class AnalyzeAgeGrade():
         '''
         return stats collected
         
+        if stats are columnar, these are created from the columns, so changes to them are not kept
+        
         :rtype: list of :class:`AgeGradeStat` entries
         '''
+        if self.columnar:
+            if self.columnstats is None:
+                self.columnstats = [AgeGradeStat(**row) for row in self.get_columns().rows()]
+            return self.columnstats
+        
         return self.stats
     
+    #-------------------------------------------------------------------------------
+    def get_columns(self):
+    #-------------------------------------------------------------------------------
+        '''
+        return stats collected, as columns
+        
+        if stats are not columnar, the columns are created from the stats
+        
+        :rtype: :class:`AgeGradeColumns`
+        '''
+        if not self.columnar:
+            return AgeGradeColumns.fromstats(self.stats)
+        
+        if self.pending:
+            self.columns = self.columns.extend(self.pending)
+            self.pending = []
+        return self.columns
+    
+    #-------------------------------------------------------------------------------
+    def set_ag(self, ags):
+    #-------------------------------------------------------------------------------
+        '''
+        set age grade percentage for all stats
+        
+        stats which couldn't be age graded, i.e., with nan age grade, are removed
+        
+        :param ags: sequence of age grade percentages, in get_stats() order
+        '''
+        ags = np.asarray(ags, dtype=np.float64)
+        graded = ~np.isnan(ags)
+        if self.columnar:
+            columns = self.get_columns()
+            columns.ag = ags
+            if not graded.all():
+                self.columns = columns.take(graded)
+            self.columnstats = None
+        else:
+            for stat,ag in zip(self.stats,ags.tolist()):
+                stat.ag = ag
+            if not graded.all():
+                self.stats = [stat for stat,keep in zip(self.stats,graded.tolist()) if keep]
+        
+        ungraded = len(ags) - int(graded.sum())
+        if ungraded > 0:
+            log.warning('{} results could not be age graded, removed for runner {}'.format(ungraded,self.who))
+    
     #-------------------------------------------------------------------------------
     def deduplicate(self):
     #-------------------------------------------------------------------------------
@@ -241,6 +316,16 @@ class AnalyzeAgeGrade():
         #if dupremoved > 0:
         #    log.debug('{} duplicate points removed, runner {}'.format(dupremoved,self.who))
         
+        # columnar stats are deduplicated by AgeGradeColumns
+        if self.columnar:
+            numstats = len(self.get_columns())
+            self.columns = self.columns.deduplicate()
+            self.columnstats = None
+            dupremoved = numstats - len(self.columns)
+            if dupremoved > 0:
+                log.debug('{} duplicate points removed, runner {}'.format(dupremoved,self.who))
+            return
+        
         # be careful of degenerate case
         if len(self.stats) == 0:
             return
@@ -248,29 +333,31 @@ class AnalyzeAgeGrade():
         # collect unique statistics, within epsilon distance
         EPS = .1   # epsilon -- if event distance is within this tolerance, it is considered the same
 
-        # sort self.stats into stats, by date,distance
-        decstats = sorted([((s.date,s.dist),s) for s in self.stats])
-        stats = [ds[1] for ds in decstats]
+        # sort index of self.stats by date,distance,priority
+        # index breaks ties so AgeGradeStat objects are never compared
+        order = sorted(range(len(self.stats)), key=lambda i: (self.stats[i].date,self.stats[i].dist,self.stats[i].priority,i))
         
-        # deduplicate stats, paying attention to priority when races determined to be the same
+        # deduplicate stats in a single pass, paying attention to priority when races determined to be the same
+        # firststat is the first "samerace", beststat the highest priority (lowest valued) of the same races so far
         deduped = []
-        while len(stats) > 0:
-            # get the first entry, that's the first "samerace"
-            thisstat = stats.pop(0)
-            sameraces = [(thisstat.priority,thisstat)]
+        firststat = beststat = None
+        for i in order:
+            thisstat = self.stats[i]
             
-            # pull races off stats when the race date and distance are the same
+            # races are the same when the race date and distance are the same
             # distance has to be within epsilon to be deduced to be the same
-            while   len(stats) > 0 \
-                    and thisstat.date == stats[0].date \
-                    and abs((thisstat.dist - stats[0].dist) / thisstat.dist) <= EPS:
-                stat = stats.pop(0)
-                sameraces.append((stat.priority,stat))
+            if      firststat is not None \
+                    and thisstat.date == firststat.date \
+                    and abs((firststat.dist - thisstat.dist) / firststat.dist) <= EPS:
+                if thisstat.priority < beststat.priority:
+                    beststat = thisstat
+                continue
             
-            # sort same races by priority, and add highes priority (lowest valued) to deduped list
-            sameraces.sort()
-            prio,stat = sameraces[0]
-            deduped.append(stat)
+            # new race, so keep the best of the last same races
+            if beststat is not None:
+                deduped.append(beststat)
+            firststat = beststat = thisstat
+        deduped.append(beststat)
         
         dupremoved = len(self.stats) - len(deduped)
         if dupremoved > 0:
@@ -371,12 +458,15 @@ class AnalyzeAgeGrade():
         
         :param dists: sequence containing range which must be met by colormap, defaults to stored statistics, meters
         '''
+        import matplotlib.cm as cm
+        import matplotlib.colors as colors
+        
         # set up color normalization
         cnorm = colors.LogNorm()
         if dists:
             cnorm.autoscale(dists)
         else:
-            cnorm.autoscale([s.dist for s in self.stats])
+            cnorm.autoscale(self.get_columns().dist)
         cmap = cm.jet
         self.cmapsm = cm.ScalarMappable(cmap=cmap,norm=cnorm)
         
@@ -433,22 +523,22 @@ class AnalyzeAgeGrade():
             else:
                 ag = None
                 
-            self.dists.add(round(dist))      # keep track of distances to nearest meter
-            self.stats.append(AgeGradeStat(date,dist,rtime))
+            self.add_stat(date,dist,rtime)
             #print(s_date,date,dist,ag)
             
         _IN.close()
     
     #-------------------------------------------------------------------------------
-    def getdatafromra(self):
+    def getdatafromra(self, workoutcachefilename=None):
     #-------------------------------------------------------------------------------
         '''
         get the user's data from RunningAHEAD
         
+        :param workoutcachefilename: optional file to cache workouts, so only new workouts are retrieved from RunningAHEAD
         :rtype: dists,stats,dob,gender where dists =  set of distances included in stats, stats = {'date':[datetime of race,...], 'dist':[distance(meters),...], 'time':[racetime(seconds),...]}, dob = date of birth (datetime), gender = 'M'|'F'
         '''
         # set up RunningAhead object and get users we're allowed to look at
-        ra = runningahead.RunningAhead()    
+        ra = runningahead.RunningAhead(workoutcachefilename=workoutcachefilename)
         users = ra.listusers()
         day = timeu.asctime('%Y-%m-%d') # date format in RunningAhead workout object
         
@@ -469,13 +559,20 @@ class AnalyzeAgeGrade():
                 self.gender = 'M' if thisuser['gender']=='male' else 'F'
             
             # if we're here, found the right user, now let's look at the workouts
-            firstdate = day.asc2dt('1980-01-01')
-            lastdate = day.asc2dt('2199-12-31')
-            workouts = ra.listworkouts(user['token'],begindate=firstdate,enddate=lastdate,getfields=list(FIELD['workout'].keys()))
+            # the workout cache only retrieves workouts since the last time this user was synced
+            if workoutcachefilename:
+                workouts = ra.listcachedworkouts(user['token'])
+            else:
+                firstdate = day.asc2dt('1980-01-01')
+                lastdate = day.asc2dt('2199-12-31')
+                workouts = ra.listworkouts(user['token'],begindate=firstdate,enddate=lastdate,getfields=list(FIELD['workout'].keys()))
     
             # we've found the right user and collected their data, so we're done
             break
             
+        # saves the workout cache, if requested
+        ra.close()
+
         # save race workouts, if any found
         if workouts:
             tempstats = []
@@ -485,15 +582,14 @@ class AnalyzeAgeGrade():
                 thisdist = runningahead.dist2meters(wo['details']['distance'])
                 thistime = wo['details']['duration']
                 
-                tempstats.append((thisdate,AgeGradeStat(thisdate,thisdist,thistime)))
+                tempstats.append((thisdate,thisdist,thistime))
                 
         # these may come sorted already, but just in case
         #tempstats.sort()
         
         # put the stats in the right format
-        for thisdate,thisstat in tempstats:
-            self.stats.append(thisstat)
-            self.dists.add(round(thisstat.dist))      # keep track of distances to nearest meter
+        for thisdate,thisdist,thistime in tempstats:
+            self.add_stat(thisdate,thisdist,thistime)
     
     #-------------------------------------------------------------------------------
     def crunch(self):
@@ -512,24 +608,16 @@ class AnalyzeAgeGrade():
             DEB.writeheader()
         ### <DEBUG
             
-        # calculate age grade for each sample    
-        for i in range(len(self.stats)):
-            racedate = self.stats[i].date
-            agegradeage = racedate.year - self.dob.year - int((racedate.month, racedate.day) < (self.dob.month, self.dob.day))
-            distmiles = self.stats[i].dist/METERSPERMILE
-            agpercentage,agtime,agfactor = ag.agegrade(agegradeage,self.gender,distmiles,self.stats[i].time)
-            self.stats[i].ag = agpercentage
+        # calculate age grade for all samples at once
+        crunchall([self])
             
-            ### DEBUG>
-            if debug:
+        ### DEBUG>
+        if debug:
+            for stat in self.get_stats():
                 thisstat = {}
                 for field in fields:
-                    thisstat[field] = getattr(self.stats[i],field)
+                    thisstat[field] = getattr(stat,field)
                 DEB.writerow(thisstat)
-            ### <DEBUG
-            
-        ### DEBUG>
-        if debug:
             _DEB.close()
         ### <DEBUG
     
@@ -541,6 +629,8 @@ class AnalyzeAgeGrade():
         
         :param size: true if size needed
         '''
+        import matplotlib.dates as mdates
+        
         DEFAULTSIZE = 60
         
         ### DEBUG>
@@ -553,23 +643,20 @@ class AnalyzeAgeGrade():
             DEB.writeheader()
         ### <DEBUG
     
-        # make hashed scatter lists
+        # make hashed scatter arrays
+        columns = self.get_columns()
+        rounded = np.round(columns.dist)
         hdate = {}
         hag = {}
         hsize = {}
         for thisd in self.dists:
-            hdate[thisd] = []
-            hag[thisd] = []
-            hsize[thisd] = []
-        for i in range(len(self.stats)):
-            d = round(self.stats[i].dist)
-            hdate[d].append(self.stats[i].date)
-            hag[d].append(self.stats[i].ag)
+            selected = rounded == thisd
+            hdate[thisd] = columns.date[selected]
+            hag[thisd] = columns.ag[selected]
             if self.size:
-                hsize[d].append(distmap(d))
-    #            hsize[d].append(self.stats['size'][i])
+                hsize[thisd] = np.full(len(hag[thisd]), distmap(thisd))
             else:
-                hsize[d].append(DEFAULTSIZE)
+                hsize[thisd] = np.full(len(hag[thisd]), DEFAULTSIZE)
         
         # create figure and axes
         fig.autofmt_xdate()
@@ -628,13 +715,8 @@ class AnalyzeAgeGrade():
         # check to see if any points are outside this limit, and print warning
         if self.ylim:
             ax.set_ylim(self.ylim)
-            outsidelimits = 0
-            numpoints = 0
-            for thisd in l_dists:
-                for i in range(len(hdate[thisd])):
-                    numpoints += 1
-                    if hag[thisd][i] < self.ylim[0] or hag[thisd][i] > self.ylim[1]:
-                        outsidelimits += 1
+            numpoints = len(columns)
+            outsidelimits = int(((columns.ag < self.ylim[0]) | (columns.ag > self.ylim[1])).sum())
             if outsidelimits > 0:
                 log.warning('{} of {} points found outside of ylim {}, runner {}'.format(outsidelimits,numpoints,self.ylim,self.who))
         
@@ -658,35 +740,60 @@ class AnalyzeAgeGrade():
         ax.annotate(s,xy,**kwargs)
         
     #-------------------------------------------------------------------------------
-    def render_trendline(self, fig, label, thesestats=None, color=None):
+    def regress(self, subsets):
     #-------------------------------------------------------------------------------
         '''
-        plot a trend line
+        calculate trend statistics for several subsets of the stats at once, without plotting
+        
+        :param subsets: {label: boolean mask over get_columns(), ...}
+        :rtype: {label: :class:`agegradecolumns.Regression`, ...}
+        '''
+        return self.get_columns().regress(subsets)
+        
+    #-------------------------------------------------------------------------------
+    def plot_trendline(self, fig, label, trend, color=None):
+    #-------------------------------------------------------------------------------
+        '''
+        plot a trend line which has already been calculated
         
         :param label: label for trendline
-        :param thesestats: list of :class:`AgeGradeStat`, or None if all stats to be used
+        :param trend: :class:`TrendLine` or :class:`agegradecolumns.Regression`
         :param color: color per matplotlib for trendline, or None to automate
-        :rtype: :class:`TrendLine` containing parameters of trendline
         '''
+        import matplotlib.dates as mdates
         
         ax = fig.get_axes()[0]  # only one axes instance
-
-        if not thesestats:
-            thesestats = self.stats
-        
-        x = [mdates.date2num(s.date) for s in thesestats]
-        y = [s.ag for s in thesestats]
         
-        slope,intercept,rvalue,pvalue,stderr = stats.linregress(x,y)
+        # trend is in days since 1970-01-01, axes may use another epoch
+        epoch = mdates.date2num(np.datetime64('1970-01-01T00:00:00'))
         xline = ax.get_xlim()  # returns floats, not datetimes
-        yline = [slope*thisx+intercept for thisx in xline]
+        yline = [trend.slope*(thisx-epoch)+trend.intercept for thisx in xline]
         
         if color:
             ax.plot(xline,yline,color=color,linestyle='-',label=label)
         else:
             ax.plot(xline,yline,linestyle='-',label=label)
-
-        return TrendLine(slope,intercept,rvalue,pvalue,stderr)
+        
+    #-------------------------------------------------------------------------------
+    def render_trendline(self, fig, label, thesestats=None, color=None):
+    #-------------------------------------------------------------------------------
+        '''
+        plot a trend line
+        
+        :param label: label for trendline
+        :param thesestats: :class:`AgeGradeColumns` or list of :class:`AgeGradeStat`, or None if all stats to be used
+        :param color: color per matplotlib for trendline, or None to automate
+        :rtype: :class:`TrendLine` containing parameters of trendline
+        '''
+        if thesestats is None or len(thesestats) == 0:
+            thesestats = self.get_columns()
+        elif not isinstance(thesestats, AgeGradeColumns):
+            thesestats = AgeGradeColumns.fromstats(thesestats)
+        
+        trend = thesestats.regress({label: np.ones(len(thesestats), dtype=bool)})[label]
+        self.plot_trendline(fig,label,trend,color)
+        
+        return TrendLine(trend.slope,trend.intercept,trend.rvalue,trend.pvalue,trend.stderr)
         
     #-------------------------------------------------------------------------------
     def save(self,fig):
@@ -694,6 +801,8 @@ class AnalyzeAgeGrade():
         '''
         save the plot in indicated file
         '''
+        import matplotlib.font_manager as fontmgr
+        
         outfile = self.get_outfilename()
     
         ax = fig.get_axes()[0]  # only one axes instance
@@ -701,6 +810,35 @@ class AnalyzeAgeGrade():
         ax.legend(loc=1,bbox_to_anchor=(1.19, 1),prop=smallfont)    #bbox_to_anchor moves legend outside axes
         fig.savefig(outfile,format='png')
         
+#-------------------------------------------------------------------------------
+def crunchall(aags):
+#-------------------------------------------------------------------------------
+    '''
+    put the age grade data into the stats of several runners, in a single batch calculation
+    
+    results which can't be age graded, e.g., distance out of range, are removed from the
+    runner's stats, and don't affect other results or runners
+    
+    :param aags: iterable of :class:`AnalyzeAgeGrade`, with runner set
+    '''
+    aags = list(aags)
+    allcolumns = [aag.get_columns() for aag in aags]
+    
+    # degenerate case
+    if sum(len(columns) for columns in allcolumns) == 0:
+        return
+    
+    ages = np.concatenate([columns.ages(aag.dob) for aag,columns in zip(aags,allcolumns)])
+    gens = np.concatenate([np.full(len(columns), aag.gender) for aag,columns in zip(aags,allcolumns)])
+    distmiles = np.concatenate([columns.dist for columns in allcolumns]) / METERSPERMILE
+    times = np.concatenate([columns.time for columns in allcolumns])
+    agpercentages,agtimes,agfactors = agbatch.agegrade(ages,gens,distmiles,times)
+    
+    # put age grade back into each runner's stats
+    ends = np.cumsum([len(columns) for columns in allcolumns])
+    for aag,agpercentage in zip(aags,np.split(agpercentages,ends[:-1])):
+        aag.set_ag(agpercentage)
+    
 #-------------------------------------------------------------------------------
 def main():
 #-------------------------------------------------------------------------------
@@ -712,6 +850,7 @@ def main():
     parser = argparse.ArgumentParser(version='running {0}'.format(version.__version__))
     parser.add_argument('--agfile', help="age grade csv file, with fields 'Date', 'Distance (miles)', 'AG' (optional, takes precedence)", default=None)
     parser.add_argument('--ra', action='store_true', help="use --ra to get data from RunningAHEAD")
+    parser.add_argument('--workoutcache', help="file to cache RunningAHEAD workouts, so only new workouts are retrieved (used with --ra)", default=None)
     parser.add_argument('--athlinks', action='store_true', help="use --athlinks to get data from athlinks [TBA]")
     parser.add_argument('-y', '--ylim', help="y limits, of the form (bottom,top), e.g., (55,80)")
     parser.add_argument('-w', '--who', help="specify name to be used in plot header, and to pick user for --ra and --athlinks")
@@ -753,7 +892,7 @@ def main():
         
     # get data from RunningAHEAD
     if usera:
-        aag.getdatafromra()
+        aag.getdatafromra(workoutcachefilename=args.workoutcache)
     
     # TODO: combine file data with RA data -- currently RA data takes precedence
     
@@ -767,6 +906,7 @@ def main():
         aag.set_ylim(ylim[0],ylim[1])
     
     # plot statistics
+    import matplotlib.pyplot as plt
     fig = plt.figure()
     ax = fig.add_subplot(111)
     aag.render_stats(fig)
@@ -34,6 +34,9 @@ import urllib.request, urllib.parse, urllib.error
 import json
 import time
 import logging
+import threading
+from collections import OrderedDict
+from tempfile import NamedTemporaryFile
 logging.basicConfig(format='%(asctime)s %(levelname)s:%(message)s')
 
 # pypi
@@ -46,6 +49,9 @@ import httplib2
 # home grown
 from loutilities import apikey
 from running import accessError, parameterError
+from running.hostpool import ThreadLocalHttp
+from running import cassette
+from running.httpretry import RetryPolicy, httpStatusError
 
 # access stuff
 ATHLINKS_URL = 'https://api.athlinks.com'
@@ -58,8 +64,12 @@ ATH_CAT_RUNNING = 2
 
 HTTPTIMEOUT = 60
 SERVERDELAY = 20
+RETRIES = 10
 MPERMILE = 1609.344
 
+# maximum number of courses to keep in the course cache
+COURSECACHESIZE = 5000
+
 
 #----------------------------------------------------------------------
 def gettime(athlinkstime):
@@ -108,10 +118,19 @@ class Athlinks():
 ########################################################################
     '''
     access methods for athlinks.com
+
+    courses retrieved by :meth:`getcourse` are kept in a least recently used cache,
+    which is saved by :meth:`close` if coursecachefilename is given
+
+    :param key: athlinks key, if not configured using apikey
+    :param debug: True to enable debug logging
+    :param coursecachefilename: name of file in which course cache is saved
+    :param coursecachesize: maximum number of courses kept in course cache
+    :param retry: httpretry.RetryPolicy for failed requests
     '''
 
     #----------------------------------------------------------------------
-    def __init__(self, key=None, debug=False):
+    def __init__(self, key=None, debug=False, coursecachefilename=None, coursecachesize=COURSECACHESIZE, retry=None):
     #----------------------------------------------------------------------
         """
         initialize http and get athlinks key
@@ -125,16 +144,64 @@ class Athlinks():
             except apikey.unknownKey:
                 raise parameterError("'athlinks' key needs to be configured using apikey")
         
-        # need http object
-        self.http = httplib2.Http(timeout=HTTPTIMEOUT)
+        # need http object, one per thread if used concurrently
+        self.http = ThreadLocalHttp(lambda: cassette.wraphttp(httplib2.Http(timeout=HTTPTIMEOUT)))
+        self.retry = retry or RetryPolicy(maxretries=RETRIES, basedelay=1, maxdelay=SERVERDELAY*3)
 
         # set up logging level
         self.log = logging.getLogger('running.athlinks')
         self.setdebug(debug)
         
-        # count how many pages have been retrieved
+        # count how many pages have been retrieved, requests may be made from several threads
         self.urlcount = 0
-        
+        self.urlcountlock = threading.Lock()
+
+        # course cache {'raceid/courseid': course, ...}, least recently used first
+        # courseinflight {'raceid/courseid': threading.Event, ...} for courses being retrieved
+        self.coursecache = OrderedDict()
+        self.coursecachefilename = coursecachefilename
+        self.coursecachesize = coursecachesize
+        self.coursecacheupdated = False
+        self.coursecachehits = 0
+        self.courselock = threading.Lock()
+        self.courseinflight = {}
+        if self.coursecachefilename and os.path.isfile(self.coursecachefilename):
+            with open(self.coursecachefilename, 'r') as coursecachefile:
+                # courses are stored one per line, in json format, least recently used first
+                for line in coursecachefile:
+                    cached = json.loads(line)
+                    self.coursecache[cached['key']] = cached['course']
+                    self.coursecache.move_to_end(cached['key'])
+            while len(self.coursecache) > self.coursecachesize:
+                self.coursecache.popitem(last=False)
+
+    #----------------------------------------------------------------------
+    def close(self):
+    #----------------------------------------------------------------------
+        '''
+        save the course cache, if requested and it's been updated
+        '''
+        if not self.coursecachefilename or not self.coursecacheupdated: return
+
+        # get full path for self.coursecachefilename to assure cachedir isn't relative
+        cachedir = os.path.dirname(os.path.abspath(self.coursecachefilename))
+        with self.courselock:
+            with NamedTemporaryFile(mode='w', suffix='.athlcache', delete=False, dir=cachedir) as tempcache:
+                tempcoursecachefilename = tempcache.name
+                for key in self.coursecache:
+                    tempcache.write('{}\n'.format(json.dumps({'key':key, 'course':self.coursecache[key]})))
+            self.coursecacheupdated = False
+
+        # now overwrite the previous version of the coursecachefile with the new coursecachefile
+        try:
+            # atomic operation in Linux
+            os.rename(tempcoursecachefilename, self.coursecachefilename)
+
+        # should only happen under windows
+        except OSError:
+            os.remove(self.coursecachefilename)
+            os.rename(tempcoursecachefilename, self.coursecachefilename)
+
     #----------------------------------------------------------------------
     def setdebug(self,debugval):
     #----------------------------------------------------------------------
@@ -160,16 +227,28 @@ class Athlinks():
         return self.urlcount
 
     #----------------------------------------------------------------------
-    def listathleteresults(self,name,**filt):
+    def listathleteresults(self,name,begindate=None,enddate=None,**filt):
     #----------------------------------------------------------------------
         """
         return results which match an athlete's name
+
+        results are filtered as each page is retrieved. The search has no option to
+        sort by race date, so all pages are retrieved even when a date window is given,
+        as later pages may have results within the window
         
         :param name: name of athlete
+        :param begindate: epoch time, optional earliest race date to return
+        :param enddate: epoch time, optional latest race date to return
         :param **filt: keyword parameters to filter with
         :rtype: list of athlinks Race dicts
         """
-        
+
+        def _checkfilter(checkdict):
+            for key in filt:
+                if key not in checkdict or checkdict[key] != filt[key]:
+                    return False
+            return True
+
         # get the data for this athlete
         page = 1
         races = []
@@ -182,16 +261,16 @@ class Athlinks():
                                )
             if len(data['List']) == 0: break
             
-            races += data['List']
-            page += 1
+            # keep results within date window
+            for race in data['List']:
+                racetime = gettime(race['Race']['RaceDate'])
+                if begindate is not None and racetime < begindate: continue
+                if enddate is not None and racetime > enddate: continue
+                if not _checkfilter(race): continue
+                races.append(race)
 
-        def _checkfilter(checkdict):
-            for key in filt:
-                if key not in checkdict or checkdict[key] != filt[key]:
-                    return False
-            return True
+            page += 1
 
-        races = list(filter(_checkfilter,races))
         return races
         
     #----------------------------------------------------------------------
@@ -223,12 +302,44 @@ class Athlinks():
     def getcourse(self,raceid,courseid):
     #----------------------------------------------------------------------
         '''
-        get race record associated with id
+        get race record associated with raceid, courseid
+
+        the course cache is checked first. If another thread is already retrieving
+        this course, wait for it rather than retrieving it again.
         
-        :param id: id of race
+        :param raceid: id of race
+        :param courseid: id of course within race
         '''
-        data = self._get(COURSE_SEARCH.format(raceid=raceid,courseid=courseid)
-                           )
+        key = '{}/{}'.format(raceid,courseid)
+        while True:
+            with self.courselock:
+                if key in self.coursecache:
+                    self.coursecache.move_to_end(key)
+                    self.coursecachehits += 1
+                    return self.coursecache[key]
+
+                inflight = self.courseinflight.get(key)
+                if not inflight:
+                    inflight = self.courseinflight[key] = threading.Event()
+                    break
+
+            # if the other thread fails, loop around and try it ourselves
+            inflight.wait()
+
+        try:
+            data = self._get(COURSE_SEARCH.format(raceid=raceid,courseid=courseid)
+                               )
+            with self.courselock:
+                self.coursecache[key] = data
+                self.coursecacheupdated = True
+                while len(self.coursecache) > self.coursecachesize:
+                    self.coursecache.popitem(last=False)
+
+        finally:
+            with self.courselock:
+                del self.courseinflight[key]
+            inflight.set()
+
         return data
         
     #----------------------------------------------------------------------
@@ -247,32 +358,29 @@ class Athlinks():
         body = urllib.parse.urlencode(params)
         url = '{}/{}?{}'.format(ATHLINKS_URL,method,body)
         
-        # loop RETRIES times for timeout or other error
-        retries = 20
-        while retries > 0:
-            retries -= 1
+        # retry with backoff for timeout or other error
+        def request():
+            self.log.debug(url)
+            resp,jsoncontent = self.http.request(url)
+
+            if resp.status != 200:
+                raise httpStatusError(resp.status, 'URL response status = {0}'.format(resp.status))
+            
+            # unmarshall the response content
             try:
-                self.log.debug(url)
-                resp,jsoncontent = self.http.request(url)
-
-                if resp.status != 200:
-                    raise accessError('URL response status = {0}'.format(resp.status))
-                
-                # unmarshall the response content
-                content = json.loads(jsoncontent)
-
-                self.urlcount += 1
-                break
-
-            except Exception as e:
-                if retries == 0:
-                    self.log.info('{} requests attempted'.format(self.geturlcount()))
-                    self.log.error('http request failure, retries exceeded: {0}'.format(e))
-                    if repr(e) == 'ValueError: No JSON object could be decoded':
-                        self.log.error('   jsoncontent={}'.format(jsoncontent))
-                    raise
-                self.log.warning('http request failure: {0}'.format(e))
-                time.sleep(SERVERDELAY)  # give the server some time to recover
+                return json.loads(jsoncontent)
+            except ValueError:
+                self.log.error('   jsoncontent={}'.format(jsoncontent))
+                raise
+
+        try:
+            content = self.retry.call(url, request, log=self.log)
+        except Exception:
+            self.log.info('{} requests attempted'.format(self.geturlcount()))
+            raise
+
+        with self.urlcountlock:
+            self.urlcount += 1
 
         return content 
         
@@ -26,8 +26,8 @@ athlinksresults - manage race results data from athlinks
 ===================================================================
 
 Usage::
-    athlinksresults.py [-h] [-v] [-b BEGINDATE] [-e ENDDATE]
-                                     searchfile outfile
+    athlinksresults.py [-h] [-v] [-b BEGINDATE] [-e ENDDATE] [-c COURSECACHE]
+                                     [-w WORKERS] searchfile outfile
     
         collect race results from athlinks
     
@@ -53,6 +53,10 @@ Usage::
                             choose races between begindate and enddate, yyyy-mm-dd
       -e ENDDATE, --enddate ENDDATE
                             choose races between begindate and enddate, yyyy-mm-dd
+      -c COURSECACHE, --coursecache COURSECACHE
+                            file in which athlinks courses are cached between runs
+      -w WORKERS, --workers WORKERS
+                            number of runners to search for concurrently, default 1
                         
 '''
 
@@ -73,6 +77,8 @@ from loutilities import timeu
 from loutilities import csvu
 from runningclub import agegrade
 from running.running import version, athlinks
+from running import hostpool
+from running import resultfile
 
 # see http://api.athlinks.com/Enums/RaceCategories
 CAT_RUNNING = 2
@@ -81,15 +87,16 @@ race_category = {CAT_RUNNING:'Running',CAT_TRAILS:'Trail Running'}
 ag = agegrade.AgeGrade()
 class invalidParameter(Exception): pass
 
-# resultfilehdr needs to associate 1:1 with resultattrs
+# resultfilehdr needs to associate 1:1 with resultattrs and resultkinds
 resultfilehdr = 'GivenName,FamilyName,name,DOB,Gender,athlmember,athlid,race,date,loc,age,fuzzyage,miles,km,category,time,ag'.split(',')
 resultattrs = 'firstname,lastname,name,dob,gender,member,id,racename,racedate,raceloc,age,fuzzyage,distmiles,distkm,racecategory,resulttime,resultagegrade'.split(',')
 resultdates = 'dob,racedate'.split(',')
 hdrtransform = dict(list(zip(resultfilehdr,resultattrs)))
+resultkinds = 'text,text,text,date,gender,num,num,text,date,text,int,num,float,float,text,text,float'.split(',')
 ftime = timeu.asctime('%Y-%m-%d')
 
 #----------------------------------------------------------------------
-def collect(searchfile,outfile,begindate,enddate):
+def collect(searchfile,outfile,begindate,enddate,coursecachefilename=None,workers=1):
 #----------------------------------------------------------------------
     '''
     collect race results from athlinks
@@ -98,6 +105,8 @@ def collect(searchfile,outfile,begindate,enddate):
     :param outfile: output file path
     :param begindate: epoch time - choose races between begindate and enddate
     :param enddate: epoch time - choose races between begindate and enddate
+    :param coursecachefilename: optional file in which athlinks courses are cached between runs
+    :param workers: number of runners to search for concurrently
     '''
     
     # open files
@@ -107,11 +116,8 @@ def collect(searchfile,outfile,begindate,enddate):
     OUT = csv.DictWriter(_OUT,resultfilehdr)
     OUT.writeheader()
 
-    # common fields between input and output
-    commonfields = 'GivenName,FamilyName,DOB,Gender'.split(',')
-
     # create athlinks
-    athl = athlinks.Athlinks(debug=True)
+    athl = athlinks.Athlinks(debug=True, coursecachefilename=coursecachefilename)
 
     # reset begindate to beginning of day, enddate to end of day
     dt_begindate = timeu.epoch2dt(begindate)
@@ -125,113 +131,136 @@ def collect(searchfile,outfile,begindate,enddate):
     start = time.time()
     today = timeu.epoch2dt(start)
     
-    # loop through runners in the input file
-    for runner in IN:
-        name = ' '.join([runner['GivenName'],runner['FamilyName']])
-        e_dob = ftime.asc2epoch(runner['DOB'])
-        dt_dob = ftime.asc2dt(runner['DOB'])
+    # loop through runners in the input file, possibly concurrently, writing results in input file order
+    for outrecs in hostpool.orderedmap(lambda runner: collectrunner(athl,runner,begindate,enddate), IN, workers):
+        for outrec in outrecs:
+            OUT.writerow(outrec)
         
-        ## skip getting results if participant too young
-        #todayage = timeu.age(today,dt_dob)
-        #if todayage < 14: continue
+    _OUT.close()
+    _IN.close()
+    athl.close()
+    
+    finish = time.time()
+    print('number of URLs retrieved = {}'.format(athl.geturlcount()))
+    print('number of courses found in cache = {}'.format(athl.coursecachehits))
+    print('elapsed time (min) = {}'.format((finish-start)/60))
+    
+#----------------------------------------------------------------------
+def collectrunner(athl,runner,begindate,enddate):
+#----------------------------------------------------------------------
+    '''
+    collect race results from athlinks for a single runner
+    
+    :param athl: athlinks.Athlinks object
+    :param runner: record from searchfile
+    :param begindate: epoch time, beginning of day - choose races between begindate and enddate
+    :param enddate: epoch time, end of day - choose races between begindate and enddate
+    :rtype: list of output records
+    '''
+    # common fields between input and output
+    commonfields = 'GivenName,FamilyName,DOB,Gender'.split(',')
+
+    name = ' '.join([runner['GivenName'],runner['FamilyName']])
+    e_dob = ftime.asc2epoch(runner['DOB'])
+    dt_dob = ftime.asc2dt(runner['DOB'])
+    
+    ## skip getting results if participant too young
+    #todayage = timeu.age(today,dt_dob)
+    #if todayage < 14: return []
+    
+    # get results for this athlete within the time window
+    results = athl.listathleteresults(name,begindate=begindate,enddate=enddate)
+    outrecs = []
+    
+    # loop through each result
+    for result in results:
+        e_racedate = athlinks.gettime(result['Race']['RaceDate'])
         
-        # get results for this athlete
-        results = athl.listathleteresults(name)
+        # skip result if outside the desired time window
+        if e_racedate < begindate or e_racedate > enddate: continue
         
-        # loop through each result
-        for result in results:
-            e_racedate = athlinks.gettime(result['Race']['RaceDate'])
-            
-            # skip result if outside the desired time window
-            if e_racedate < begindate or e_racedate > enddate: continue
+        # create output record and copy common fields
+        outrec = {}
+        for field in commonfields:
+            outrec[field] = runner[field]
             
-            # create output record and copy common fields
-            outrec = {}
-            for field in commonfields:
-                outrec[field] = runner[field]
-                
-            # skip result if runner's age doesn't match the age within the result
-            # sometimes athlinks stores the age group of the runner, not exact age,
-            # so also check if this runner's age is within the age group, and indicate if so
-            dt_racedate = timeu.epoch2dt(e_racedate)
-            racedateage = timeu.age(dt_racedate,dt_dob)
-            resultage = int(result['Age'])
-            if resultage != racedateage:
-                # if results are not stored as age group, skip this result
-                if (resultage//5)*5 != resultage:
-                    continue
-                # result's age might be age group, not exact age
+        # skip result if runner's age doesn't match the age within the result
+        # sometimes athlinks stores the age group of the runner, not exact age,
+        # so also check if this runner's age is within the age group, and indicate if so
+        dt_racedate = timeu.epoch2dt(e_racedate)
+        racedateage = timeu.age(dt_racedate,dt_dob)
+        resultage = int(result['Age'])
+        if resultage != racedateage:
+            # if results are not stored as age group, skip this result
+            if (resultage//5)*5 != resultage:
+                continue
+            # result's age might be age group, not exact age
+            else:
+                # if runner's age consistent with race age, use result, but mark "fuzzy"
+                if (racedateage//5)*5 == resultage:
+                    outrec['fuzzyage'] = 'Y'
+                # otherwise skip result
                 else:
-                    # if runner's age consistent with race age, use result, but mark "fuzzy"
-                    if (racedateage//5)*5 == resultage:
-                        outrec['fuzzyage'] = 'Y'
-                    # otherwise skip result
-                    else:
-                        continue
-            
-            # skip result if runner's gender doesn't match gender within the result
-            resultgen = result['Gender'][0]
-            if resultgen != runner['Gender'][0]: continue
-            
-            # get course used for this result
-            course = athl.getcourse(result['Race']['RaceID'],result['CourseID'])
-            
-            # skip result if not Running or Trail Running race
-            thiscategory = course['Courses'][0]['RaceCatID']
-            if thiscategory not in race_category: continue
-            
-            # fill in output record fields from runner, result, course
-            # combine name, get age
-            outrec['name'] = '{} {}'.format(runner['GivenName'],runner['FamilyName'])
-            outrec['age'] = result['Age']
+                    continue
+        
+        # skip result if runner's gender doesn't match gender within the result
+        resultgen = result['Gender'][0]
+        if resultgen != runner['Gender'][0]: continue
+        
+        # get course used for this result
+        course = athl.getcourse(result['Race']['RaceID'],result['CourseID'])
+        
+        # skip result if not Running or Trail Running race
+        thiscategory = course['Courses'][0]['RaceCatID']
+        if thiscategory not in race_category: continue
+        
+        # fill in output record fields from runner, result, course
+        # combine name, get age
+        outrec['name'] = '{} {}'.format(runner['GivenName'],runner['FamilyName'])
+        outrec['age'] = result['Age']
 
-            # leave athlmember and athlid blank if result not from an athlink member
-            athlmember = result['IsMember']
-            if athlmember:
-                outrec['athlmember'] = 'Y'
-                outrec['athlid'] = result['RacerID']
+        # leave athlmember and athlid blank if result not from an athlink member
+        athlmember = result['IsMember']
+        if athlmember:
+            outrec['athlmember'] = 'Y'
+            outrec['athlid'] = result['RacerID']
 
-            # race name, location; convert from unicode if necessary
-            # TODO: make function to do unicode translation -- apply to runner name as well (or should csv just store unicode?)
-            racename = csvu.unicode2ascii(course['RaceName'])
-            coursename = csvu.unicode2ascii(course['Courses'][0]['CourseName'])
-            outrec['race'] = '{} / {}'.format(racename,coursename)
-            outrec['date'] = ftime.epoch2asc(athlinks.gettime(course['RaceDate']))
-            outrec['loc'] = csvu.unicode2ascii(course['Home'])
-            
-            # distance, category, time
-            distmiles = athlinks.dist2miles(course['Courses'][0]['DistUnit'], course['Courses'][0]['DistTypeID'])
-            distkm = athlinks.dist2km(course['Courses'][0]['DistUnit'], course['Courses'][0]['DistTypeID'])
-            if distkm < 0.050: continue # skip timed events, which seem to be recorded with 0 distance
+        # race name, location; convert from unicode if necessary
+        # TODO: make function to do unicode translation -- apply to runner name as well (or should csv just store unicode?)
+        racename = csvu.unicode2ascii(course['RaceName'])
+        coursename = csvu.unicode2ascii(course['Courses'][0]['CourseName'])
+        outrec['race'] = '{} / {}'.format(racename,coursename)
+        outrec['date'] = ftime.epoch2asc(athlinks.gettime(course['RaceDate']))
+        outrec['loc'] = csvu.unicode2ascii(course['Home'])
+        
+        # distance, category, time
+        distmiles = athlinks.dist2miles(course['Courses'][0]['DistUnit'], course['Courses'][0]['DistTypeID'])
+        distkm = athlinks.dist2km(course['Courses'][0]['DistUnit'], course['Courses'][0]['DistTypeID'])
+        if distkm < 0.050: continue # skip timed events, which seem to be recorded with 0 distance
 
-            outrec['miles'] = distmiles
-            outrec['km'] = distkm
-            outrec['category'] = race_category[thiscategory]
-            resulttime = result['TicksString']
+        outrec['miles'] = distmiles
+        outrec['km'] = distkm
+        outrec['category'] = race_category[thiscategory]
+        resulttime = result['TicksString']
 
-            # strange case of TicksString = ':00'
-            if resulttime[0] == ':':
-                resulttime = '0'+resulttime
-            while resulttime.count(':') < 2:
-                resulttime = '0:'+resulttime
-            outrec['time'] = resulttime
+        # strange case of TicksString = ':00'
+        if resulttime[0] == ':':
+            resulttime = '0'+resulttime
+        while resulttime.count(':') < 2:
+            resulttime = '0:'+resulttime
+        outrec['time'] = resulttime
 
-            # just leave out age grade if exception occurs
-            try:
-                agpercent,agresult,agfactor = ag.agegrade(racedateage,resultgen,distmiles,timeu.timesecs(resulttime))
-                outrec['ag'] = agpercent
-                if agpercent < 15 or agpercent >= 100: continue # skip obvious outliers
-            except:
-                pass
+        # just leave out age grade if exception occurs
+        try:
+            agpercent,agresult,agfactor = ag.agegrade(racedateage,resultgen,distmiles,timeu.timesecs(resulttime))
+            outrec['ag'] = agpercent
+            if agpercent < 15 or agpercent >= 100: continue # skip obvious outliers
+        except:
+            pass
 
-            OUT.writerow(outrec)
-        
-    _OUT.close()
-    _IN.close()
-    
-    finish = time.time()
-    print('number of URLs retrieved = {}'.format(athl.geturlcount()))
-    print('elapsed time (min) = {}'.format((finish-start)/60))
+        outrecs.append(outrec)
+
+    return outrecs
     
 ########################################################################
 class AthlinksResult():
@@ -264,7 +293,7 @@ class AthlinksResult():
         return reprstr
     
 ########################################################################
-class AthlinksResultFile():
+class AthlinksResultFile(resultfile.ResultFile):
 ########################################################################
     '''
     represents file of athlinks results collected from athlinks
@@ -272,77 +301,9 @@ class AthlinksResultFile():
     TODO:: add write methods, and update :func:`collect` to use :class:`AthlinksResult` class
     '''
    
-    #----------------------------------------------------------------------
-    def __init__(self,filename):
-    #----------------------------------------------------------------------
-        self.filename = filename
-        
-    #----------------------------------------------------------------------
-    def open(self,mode='r'):
-    #----------------------------------------------------------------------
-        '''
-        open athlinks result file
-        
-        :param mode: 'r' or 'w' -- TODO: support 'w'
-        '''
-        if mode[0] not in 'r':
-            raise invalidParameter('mode {} not currently supported'.format(mode))
-    
-        self._fh = open(self.filename,mode,newline='')
-        if mode[0] == 'r':
-            self._csv = csv.DictReader(self._fh)
-        else:
-            pass
-        
-    #----------------------------------------------------------------------
-    def close(self):
-    #----------------------------------------------------------------------
-        '''
-        close athlinks result file
-        '''
-        if hasattr(self,'_fh'):
-            self._fh.close()
-            delattr(self,'_fh')
-            delattr(self,'_csv')
-        
-    #----------------------------------------------------------------------
-    def __next__(self):
-    #----------------------------------------------------------------------
-        '''
-        get next :class:`AthlinksResult`
-        
-        :rtype: :class:`AthlinksResult`, or None when end of file reached
-        '''
-        try:
-            fresult = next(self._csv)
-            
-        except StopIteration:
-            return None
-        
-        aresultargs = {}
-        for fattr in hdrtransform:
-            aattr = hdrtransform[fattr]
-            
-            # special handling for gender
-            if aattr == 'gender':
-                aresultargs[aattr] = fresult[fattr][0]
-                
-            # special handling for dates
-            elif aattr in resultdates:
-                aresultargs[aattr] = ftime.asc2dt(fresult[fattr])
-                
-            else:
-                # convert numbers
-                try:
-                    aresultargs[aattr] = int(fresult[fattr])
-                except ValueError:
-                    try:
-                        aresultargs[aattr] = float(fresult[fattr])
-                    except ValueError:
-                        aresultargs[aattr] = fresult[fattr]
-                
-        return AthlinksResult(**aresultargs)
-    
+    schema = resultfile.ResultSchema(list(zip(resultfilehdr,resultattrs,resultkinds)))
+    resultclass = AthlinksResult
+
 #----------------------------------------------------------------------
 def main(): 
 #----------------------------------------------------------------------
@@ -365,6 +326,8 @@ def main():
     parser.add_argument('outfile', help="output file contains race results")
     parser.add_argument('-b','--begindate', help="choose races between begindate and enddate, yyyy-mm-dd",default=None)
     parser.add_argument('-e','--enddate', help="choose races between begindate and enddate, yyyy-mm-dd",default=None)
+    parser.add_argument('-c','--coursecache', help="file in which athlinks courses are cached between runs",default=None)
+    parser.add_argument('-w','--workers', help="number of runners to search for concurrently, default 1",type=int,default=1)
     args = parser.parse_args()
 
     searchfile = args.searchfile
@@ -381,7 +344,7 @@ def main():
         enddate = argtime.asc2epoch('2030-12-31')
         
     # collect all the data
-    collect(searchfile,outfile,begindate,enddate)
+    collect(searchfile,outfile,begindate,enddate,coursecachefilename=args.coursecache,workers=args.workers)
         
 ########################################################################
 #	__main__
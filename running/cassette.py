@@ -0,0 +1,448 @@
+'''
+cassette - record and replay http traffic
+===================================================================
+
+responses are kept on disk so later runs can replay them without network access,
+e.g., for reproducible benchmarks or working offline. Response bodies are gzipped
+and stored under their sha256 digest, so identical bodies are only stored once.
+The index maps each request to the status, headers and body digest of its response.
+
+a request is identified by its method, its url with the query parameters sorted,
+and its body. Application credentials (api keys, secrets) in the query are left out,
+so a cassette recorded with one set of credentials replays with another, and the
+credentials aren't written to the cassette. User tokens (e.g., oauth access tokens)
+select whose data is returned, so they stay part of the request's identity, but only
+as a hash salted with a random value kept in the cassette directory.
+
+modes are
+
+* record - make requests, and store the responses
+* replay - replay stored responses, raising :class:`cassetteMiss` for requests which weren't recorded
+* auto - replay stored responses, and make and record requests which weren't recorded
+* off - make requests, nothing is stored
+
+clients use the cassette configured through the environment, if any, e.g.::
+
+    RUNNING_CASSETTE=~/cassettes/results RUNNING_CASSETTE_MODE=replay athlinksresults ...
+'''
+
+# standard
+import os
+import os.path
+import gzip
+import json
+import hashlib
+import hmac
+import threading
+import logging
+from http.client import responses as reasons
+from tempfile import NamedTemporaryFile
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# pypi
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# github
+
+# other
+
+# home grown
+from running import accessError, parameterError
+
+class cassetteMiss(accessError): pass
+
+MODES = ('record', 'replay', 'auto', 'off')
+
+# environment variables which configure the cassette used by clients
+ENVDIRECTORY = 'RUNNING_CASSETTE'
+ENVMODE = 'RUNNING_CASSETTE_MODE'
+
+# query parameters which aren't part of the request identity, and aren't stored
+CREDENTIALPARAMS = {'key', 'apikey', 'api_key', 'api_secret', 'secret', 'client_secret', 'rsu_api_reg'}
+
+# query parameters which identify the user, stored as a salted hash
+USERPARAMS = {'access_token', 'token'}
+
+# response headers which aren't stored
+DROPHEADERS = {'set-cookie'}
+
+# header added to replayed responses
+REPLAYHEADER = 'x-cassette-replay'
+
+INDEXFILE = 'index.jsonl'
+SALTFILE = 'salt'
+OBJECTDIR = 'objects'
+
+thislogger = logging.getLogger('running.cassette')
+
+#----------------------------------------------------------------------
+def _bytes(data):
+#----------------------------------------------------------------------
+    if data is None:
+        return b''
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    return bytes(data)
+
+#----------------------------------------------------------------------
+def _hashtoken(token, salt):
+#----------------------------------------------------------------------
+    '''
+    :param token: user token
+    :param salt: bytes
+    :rtype: hex digest of token, salted
+    '''
+    return hmac.new(salt, token.encode('utf-8'), hashlib.sha256).hexdigest()
+
+#----------------------------------------------------------------------
+def requestkey(method, url, body=None, salt=b''):
+#----------------------------------------------------------------------
+    '''
+    identify request, ignoring application credentials and the order of query parameters
+
+    :param method: 'GET', 'POST', etc.
+    :param url: url requested
+    :param body: request body, str or bytes, or None
+    :param salt: bytes used to hash user tokens
+    :rtype: (key, url) - key is hex digest, url has credentials removed, user tokens hashed and query sorted
+    '''
+    parts = urlsplit(url)
+    query = []
+    for name, value in parse_qsl(parts.query, keep_blank_values=True):
+        if name.lower() in CREDENTIALPARAMS: continue
+        if name.lower() in USERPARAMS:
+            value = _hashtoken(value, salt)
+        query.append((name, value))
+    query.sort()
+    url = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ''))
+
+    digest = hashlib.sha256()
+    digest.update('{} {}\n'.format(method.upper(), url).encode('utf-8'))
+    digest.update(_bytes(body))
+    return digest.hexdigest(), url
+
+#----------------------------------------------------------------------
+def replayed(headers):
+#----------------------------------------------------------------------
+    '''
+    check whether response was replayed from a cassette
+
+    :param headers: response headers, requests or httplib2
+    :rtype: True if replayed
+    '''
+    return any(name.lower() == REPLAYHEADER for name in headers)
+
+########################################################################
+class Cassette():
+########################################################################
+    '''
+    on-disk store of recorded http responses
+
+    can be shared by threads
+
+    :param directory: directory for the cassette, created if needed
+    :param mode: 'record', 'replay', 'auto' or 'off'
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self, directory, mode='auto'):
+    #----------------------------------------------------------------------
+        if mode not in MODES:
+            raise parameterError('{}: invalid cassette mode, must be one of {}'.format(mode, MODES))
+
+        self.directory = directory
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.recorded = 0
+
+        # salt for user tokens, written with the first recording if the cassette is new
+        self.saltfilename = os.path.join(directory, SALTFILE)
+        self.saltwritten = os.path.isfile(self.saltfilename)
+        if self.saltwritten:
+            with open(self.saltfilename, 'r') as saltfile:
+                self.salt = bytes.fromhex(saltfile.read().strip())
+        else:
+            self.salt = os.urandom(16)
+
+        # index {key: {'method':, 'url':, 'status':, 'headers':, 'body':}, ...}
+        # later recordings of the same request replace earlier ones
+        self.index = {}
+        self.indexfilename = os.path.join(directory, INDEXFILE)
+        if os.path.isfile(self.indexfilename):
+            with open(self.indexfilename, 'r') as indexfile:
+                for line in indexfile:
+                    # a partial line may have been left by an interrupted run
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.index[entry['key']] = entry
+
+    #----------------------------------------------------------------------
+    def _objectpath(self, digest):
+    #----------------------------------------------------------------------
+        return os.path.join(self.directory, OBJECTDIR, digest[:2], digest + '.gz')
+
+    #----------------------------------------------------------------------
+    def _writeobject(self, content):
+    #----------------------------------------------------------------------
+        '''
+        store content, if not already stored
+
+        :param content: bytes
+        :rtype: digest of content
+        '''
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._objectpath(digest)
+        if os.path.isfile(path):
+            return digest
+
+        objectdir = os.path.dirname(path)
+        os.makedirs(objectdir, exist_ok=True)
+        # mtime=0 so the same content always gives the same file
+        with NamedTemporaryFile(dir=objectdir, delete=False) as tempfile:
+            with gzip.GzipFile(fileobj=tempfile, mode='wb', mtime=0) as gz:
+                gz.write(content)
+
+        # another thread may have stored the same content in the meantime
+        try:
+            os.rename(tempfile.name, path)
+        except OSError:
+            os.remove(tempfile.name)
+            if not os.path.isfile(path):
+                raise
+
+        return digest
+
+    #----------------------------------------------------------------------
+    def _writesalt(self):
+    #----------------------------------------------------------------------
+        '''
+        write the salt for user tokens, called with self.lock held
+        '''
+        with NamedTemporaryFile(mode='w', dir=self.directory, delete=False) as tempfile:
+            tempfile.write(self.salt.hex())
+        os.rename(tempfile.name, self.saltfilename)
+        self.saltwritten = True
+
+    #----------------------------------------------------------------------
+    def play(self, method, url, body=None):
+    #----------------------------------------------------------------------
+        '''
+        look up recorded response for request
+
+        :param method: 'GET', 'POST', etc.
+        :param url: url requested
+        :param body: request body, or None
+        :rtype: (status, headers, content), or None if request should be made
+        '''
+        if self.mode not in ('replay', 'auto'):
+            return None
+
+        key, url = requestkey(method, url, body, self.salt)
+        entry = self.index.get(key)
+        if not entry:
+            if self.mode == 'replay':
+                raise cassetteMiss('{} {} not recorded in {}'.format(method, url, self.directory))
+            return None
+
+        with gzip.open(self._objectpath(entry['body']), 'rb') as gz:
+            content = gz.read()
+
+        with self.lock:
+            self.hits += 1
+        headers = dict(entry['headers'])
+        headers[REPLAYHEADER] = '1'
+        return entry['status'], headers, content
+
+    #----------------------------------------------------------------------
+    def record(self, method, url, body, status, headers, content):
+    #----------------------------------------------------------------------
+        '''
+        store response for request
+
+        transient failures (429 and 5xx) aren't recorded, so the response to the
+        retried request is the one which gets replayed
+
+        :param method: 'GET', 'POST', etc.
+        :param url: url requested
+        :param body: request body, or None
+        :param status: response status code
+        :param headers: response headers
+        :param content: response body, bytes
+        '''
+        if self.mode not in ('record', 'auto'):
+            return
+        if status == 429 or status >= 500:
+            return
+
+        key, url = requestkey(method, url, body, self.salt)
+        entry = {
+            'key': key,
+            'method': method.upper(),
+            'url': url,
+            'status': status,
+            'headers': {name: value for name, value in headers.items() if name.lower() not in DROPHEADERS},
+            'body': self._writeobject(_bytes(content)),
+        }
+
+        # index is appended a line at a time, so an interrupted run keeps what it recorded
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if not self.saltwritten:
+                self._writesalt()
+            with open(self.indexfilename, 'a') as indexfile:
+                indexfile.write(json.dumps(entry) + '\n')
+            self.index[key] = entry
+            self.recorded += 1
+
+########################################################################
+class CassetteHttp():
+########################################################################
+    '''
+    httplib2.Http-like object which records and replays through a cassette
+
+    :param http: httplib2.Http-like object used for requests which aren't replayed
+    :param cassette: Cassette
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self, http, cassette):
+    #----------------------------------------------------------------------
+        self.http = http
+        self.cassette = cassette
+
+    #----------------------------------------------------------------------
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+    #----------------------------------------------------------------------
+        '''
+        see httplib2.Http.request
+        '''
+        played = self.cassette.play(method, uri, body)
+        if played:
+            # httplib2 is only needed by the clients which use this
+            import httplib2
+            status, respheaders, content = played
+            respheaders['status'] = str(status)
+            return httplib2.Response(respheaders), content
+
+        resp, content = self.http.request(uri, method, body, headers, *args, **kwargs)
+        self.cassette.record(method, uri, body, resp.status, dict(resp), content)
+        return resp, content
+
+########################################################################
+class CassetteAdapter(HTTPAdapter):
+########################################################################
+    '''
+    requests transport adapter which records and replays through a cassette
+
+    :param cassette: Cassette
+    :param kwargs: see requests.adapters.HTTPAdapter
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self, cassette, **kwargs):
+    #----------------------------------------------------------------------
+        self.cassette = cassette
+        super().__init__(**kwargs)
+
+    #----------------------------------------------------------------------
+    def send(self, request, **kwargs):
+    #----------------------------------------------------------------------
+        played = self.cassette.play(request.method, request.url, request.body)
+        if played:
+            status, headers, content = played
+            response = requests.Response()
+            response.status_code = status
+            response.reason = reasons.get(status, '')
+            response.headers = CaseInsensitiveDict(headers)
+            response.encoding = get_encoding_from_headers(response.headers)
+            response._content = content
+            response.url = request.url
+            response.request = request
+            response.connection = self
+            return response
+
+        response = super().send(request, **kwargs)
+        self.cassette.record(request.method, request.url, request.body,
+                             response.status_code, dict(response.headers), response.content)
+        return response
+
+# cassette used by clients, configured from the environment when first needed
+_current = {}
+_currentlock = threading.Lock()
+
+#----------------------------------------------------------------------
+def install(cassette):
+#----------------------------------------------------------------------
+    '''
+    set cassette used by clients created from now on
+
+    :param cassette: Cassette, or None to stop using a cassette
+    '''
+    with _currentlock:
+        _current['cassette'] = cassette
+
+#----------------------------------------------------------------------
+def current():
+#----------------------------------------------------------------------
+    '''
+    return cassette used by clients
+
+    :rtype: Cassette, or None if no cassette is being used
+    '''
+    with _currentlock:
+        if 'cassette' not in _current:
+            directory = os.environ.get(ENVDIRECTORY)
+            cassette = None
+            if directory:
+                cassette = Cassette(os.path.expanduser(directory), os.environ.get(ENVMODE, 'auto'))
+                thislogger.info('using cassette {} in {} mode'.format(directory, cassette.mode))
+            _current['cassette'] = cassette
+        cassette = _current['cassette']
+
+    if cassette and cassette.mode == 'off':
+        return None
+    return cassette
+
+#----------------------------------------------------------------------
+def wraphttp(http, cassette=None):
+#----------------------------------------------------------------------
+    '''
+    wrap httplib2.Http object so it uses a cassette
+
+    :param http: httplib2.Http object
+    :param cassette: Cassette, default is current()
+    :rtype: CassetteHttp, or http if no cassette is being used
+    '''
+    cassette = cassette or current()
+    if not cassette:
+        return http
+    return CassetteHttp(http, cassette)
+
+#----------------------------------------------------------------------
+def session(cassette=None, **adapterargs):
+#----------------------------------------------------------------------
+    '''
+    create requests.Session which uses a cassette
+
+    :param cassette: Cassette, default is current()
+    :param adapterargs: arguments for the transport adapter, e.g., pool_maxsize
+    :rtype: requests.Session
+    '''
+    cassette = cassette or current()
+    thissession = requests.Session()
+    if cassette:
+        adapter = CassetteAdapter(cassette, **adapterargs)
+    elif adapterargs:
+        adapter = HTTPAdapter(**adapterargs)
+    else:
+        return thissession
+
+    thissession.mount('https://', adapter)
+    thissession.mount('http://', adapter)
+    return thissession
@@ -50,6 +50,9 @@ from loutilities import timeu
 from loutilities import csvu
 from runningclub import render
 from running import accessError, parameterError
+from running.httpretry import RetryPolicy
+from running.racedistance import parseevent
+from running import cassette
 
 # access stuff
 PAGESIZE = 100
@@ -60,6 +63,7 @@ RESULTS_SEARCH = 'firstname={firstname}&lastname={lastname}&bib={bib}&gender={ge
 #PAGING = 'resultsPage={pagenum}&rowCount={pagesize}'.format(pagesize=PAGESIZE)
 
 HTTPTIMEOUT = 10
+RETRIES = 10
 MPERMILE = 1609.344
 
 tindate  = timeu.asctime('%m/%d/%Y %I:%M:%S %p')
@@ -76,59 +80,12 @@ def racenameanddist(soup):
     '''
 
     ensoup = soup.find(class_='event-name')
-    if ensoup:
-        eventstring = ensoup.text
-        rawparts = eventstring.split('-')
-        eventparts = [p.strip() for p in rawparts]
-        distfield = eventparts[-1].strip()
-        # note might have been hyphen in event name
-        racename = '-'.join(rawparts[0:-1]).strip()
-    else:
+    if not ensoup:
         raise EventNotFound
-        
-    # accumulate distance, and figure out where units field starts
-    dist = 0
-    startunits = 0
-    for digit in distfield:
-        if not digit.isdigit():
-            break
-        dist *= 10
-        dist += int(digit)
-        startunits += 1
-    
-    # pull out the units from the distance field, and interpret
-    units = distfield[startunits:].strip()
-    
-    # special cases
-    if distfield == 'Marathon':
-        distmiles = 26.21875    # true marathon
-        distkm = distmiles * (MPERMILE/1000)
-        
-    elif distfield == 'Half Marathon' or distfield == '1/2 Marathon':
-        distmiles = 13.109375   # true half marathon
-        distkm = distmiles * (MPERMILE/1000)
-        
-    # kilometers
-    elif units == 'K':
-        distkm = dist 
-        distmiles = (dist * 1000) / MPERMILE
-    
-    # miles
-    elif units == 'Miler':
-        # some special cases
-        if dist == 13:
-            distmiles = 13.109375   # true half marathon
-        elif dist == 26:
-            distmiles = 26.21875    # true marathon
-        else:
-            distmiles = dist
-        distkm = distmiles * (MPERMILE/1000)
-    
-    else:
-        distmiles = None
-        distkm = None
 
-    return racename,distmiles,distkm
+    # note might have been hyphen in event name
+    event = parseevent(ensoup.text)
+    return event.racename,event.distmiles,event.distkm
 
 #----------------------------------------------------------------------
 def racedate(soup):
@@ -333,16 +290,20 @@ class Competitor():
 ########################################################################
     '''
     access methods for competitor.com
+
+    :param debug: True to enable debug logging
+    :param retry: httpretry.RetryPolicy for failed requests
     '''
 
     #----------------------------------------------------------------------
-    def __init__(self,debug=False):
+    def __init__(self,debug=False,retry=None):
     #----------------------------------------------------------------------
         """
         initialize http 
         """
         # need http object
-        self.http = httplib2.Http(timeout=HTTPTIMEOUT)
+        self.http = cassette.wraphttp(httplib2.Http(timeout=HTTPTIMEOUT))
+        self.retry = retry or RetryPolicy(maxretries=RETRIES, basedelay=0.5, maxdelay=30)
 
         # set up logging level
         self.log = logging.getLogger('running.competitor')
@@ -471,21 +432,17 @@ class Competitor():
         :param url: url to retrieve
         :rtype: content (html)
         '''
-        # loop RETRIES times for timeout
-        retries = 10
-        while retries > 0:
-            retries -= 1
-            try:
-                self.log.debug(url)
-                resp,content = self.http.request(url)
-                self.urlcount += 1
-                break
-            except Exception as e:
-                if retries == 0:
-                    self.log.info('{} requests attempted'.format(self.geturlcount()))
-                    self.log.error('http request failure, retries exceeded: {0}'.format(e))
-                    raise
-                self.log.warning('http request failure: {0}'.format(e))
+        # retry with backoff for timeout
+        def request():
+            self.log.debug(url)
+            return self.http.request(url)
+
+        try:
+            resp,content = self.retry.call(url, request, log=self.log)
+        except Exception:
+            self.log.info('{} requests attempted'.format(self.geturlcount()))
+            raise
+        self.urlcount += 1
         
         if resp.status != 200:
             raise accessError('URL response status = {0}'.format(resp.status))
@@ -0,0 +1,109 @@
+'''
+hostpool - concurrent requests with a limit per host
+===================================================================
+'''
+
+# standard
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# pypi
+
+# github
+
+# other
+
+# home grown
+
+# default maximum number of concurrent requests to a single host
+MAXPERHOST = 4
+
+########################################################################
+class HostLimiter():
+########################################################################
+    '''
+    limit number of concurrent requests to each host
+
+    use as::
+
+        with limiter.limit(url):
+            # make request
+
+    :param maxperhost: maximum number of concurrent requests to a host
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self, maxperhost=MAXPERHOST):
+    #----------------------------------------------------------------------
+        self.maxperhost = maxperhost
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    #----------------------------------------------------------------------
+    def limit(self, url):
+    #----------------------------------------------------------------------
+        '''
+        return semaphore for url's host, to be used as context manager
+
+        :param url: url which is to be requested
+        :rtype: threading.BoundedSemaphore
+        '''
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.maxperhost)
+            return self.semaphores[host]
+
+# all clients share this unless they're given their own
+hostlimiter = HostLimiter()
+
+########################################################################
+class ThreadLocalHttp():
+########################################################################
+    '''
+    httplib2.Http-like object which uses a separate Http object for each thread,
+    as httplib2.Http isn't thread safe, and limits concurrent requests per host
+
+    :param factory: function which returns new Http object, e.g., lambda: httplib2.Http(timeout=60)
+    :param limiter: HostLimiter, default is shared hostlimiter
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self, factory, limiter=None):
+    #----------------------------------------------------------------------
+        self.factory = factory
+        self.limiter = limiter or hostlimiter
+        self.local = threading.local()
+
+    #----------------------------------------------------------------------
+    def request(self, uri, *args, **kwargs):
+    #----------------------------------------------------------------------
+        '''
+        make request using this thread's Http object, see httplib2.Http.request
+        '''
+        if not hasattr(self.local, 'http'):
+            self.local.http = self.factory()
+        with self.limiter.limit(uri):
+            return self.local.http.request(uri, *args, **kwargs)
+
+#----------------------------------------------------------------------
+def orderedmap(func, items, workers=1):
+#----------------------------------------------------------------------
+    '''
+    generator which yields func(item) for each of items, in the order of items
+
+    when workers is more than 1, func is called concurrently from a pool of threads
+
+    :param func: function(item)
+    :param items: iterable of items
+    :param workers: number of threads
+    '''
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(func, items):
+            yield result
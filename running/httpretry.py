@@ -0,0 +1,316 @@
+'''
+httpretry - retry policy and circuit breaker for http clients
+===================================================================
+
+:class:`RetryPolicy` retries a failed request with exponential backoff and
+jitter. Each host has a :class:`CircuitBreaker`, which counts consecutive failed
+attempts across all calls to the host. Once the host has failed a number of times
+in a row, over at least a set time, the circuit opens so the current call stops
+retrying and later requests to the host fail immediately, until the host has had
+some time to recover. A short outage is retried through, and a dead host is given
+up on after about failurewindow seconds, however many retries the caller allows.
+
+Client errors (4xx other than 429 Too Many Requests) show the host is responding,
+so they are neither retried nor counted as failures.
+'''
+
+# standard
+import time
+import random
+import logging
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse
+
+# pypi
+
+# github
+
+# other
+
+# home grown
+from running import accessError
+
+class circuitOpen(accessError): pass
+
+########################################################################
+class httpStatusError(accessError):
+########################################################################
+    '''
+    request got an unexpected http response status
+
+    :param status: http response status
+    :param message: error message
+    '''
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+#----------------------------------------------------------------------
+def isclienterror(e):
+#----------------------------------------------------------------------
+    '''
+    check whether exception was caused by a client error response, e.g., 404 Not Found
+
+    429 Too Many Requests is not considered a client error, as the request may succeed later
+
+    :param e: exception raised by request
+    :rtype: True if client error
+    '''
+    status = getattr(e, 'status', None)
+    return isinstance(status, int) and 400 <= status < 500 and status != 429
+
+# circuit breaker defaults, circuit opens after FAILURETHRESHOLD consecutive failed attempts
+# spanning at least FAILUREWINDOW seconds
+FAILURETHRESHOLD = 5
+FAILUREWINDOW = 30
+RESETTIMEOUT = 60
+
+thislogger = logging.getLogger('running.httpretry')
+
+########################################################################
+class RetryMetrics():
+########################################################################
+    '''
+    counts of requests, retries, failures and circuit breaker activity, per host
+    '''
+
+    COUNTERS = 'requests,retries,failures,circuitopened,rejected'.split(',')
+
+    #----------------------------------------------------------------------
+    def __init__(self):
+    #----------------------------------------------------------------------
+        self.lock = threading.Lock()
+        self.counts = defaultdict(lambda: dict.fromkeys(self.COUNTERS, 0))
+
+    #----------------------------------------------------------------------
+    def count(self, host, counter):
+    #----------------------------------------------------------------------
+        with self.lock:
+            self.counts[host][counter] += 1
+
+    #----------------------------------------------------------------------
+    def snapshot(self):
+    #----------------------------------------------------------------------
+        '''
+        return copy of the counts
+
+        :rtype: {host: {'requests': n, 'retries': n, 'failures': n, 'circuitopened': n, 'rejected': n}, ...}
+        '''
+        with self.lock:
+            return {host: dict(counts) for host, counts in self.counts.items()}
+
+########################################################################
+class CircuitBreaker():
+########################################################################
+    '''
+    circuit breaker for a single host
+
+    after failurethreshold consecutive failed attempts, the first of which was at least
+    failurewindow seconds ago, the circuit opens, and requests are rejected until
+    resettimeout seconds have passed. Then one trial request is allowed, which closes
+    the circuit if it succeeds or opens it again if it fails.
+
+    :param failurethreshold: number of consecutive failed attempts which opens the circuit
+    :param resettimeout: seconds the circuit stays open before a trial request
+    :param clock: function returning epoch time, for testing
+    :param failurewindow: seconds the host must have been failing before the circuit opens
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self, failurethreshold=FAILURETHRESHOLD, resettimeout=RESETTIMEOUT, clock=time.time,
+                 failurewindow=FAILUREWINDOW):
+    #----------------------------------------------------------------------
+        self.failurethreshold = failurethreshold
+        self.resettimeout = resettimeout
+        self.failurewindow = failurewindow
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.firstfailure = None
+        self.openedat = None
+        self.trialinprogress = False
+
+    #----------------------------------------------------------------------
+    def isopen(self):
+    #----------------------------------------------------------------------
+        return self.openedat is not None
+
+    #----------------------------------------------------------------------
+    def allow(self):
+    #----------------------------------------------------------------------
+        '''
+        check whether a request may be made
+
+        :rtype: True if request may be made
+        '''
+        with self.lock:
+            if self.openedat is None:
+                return True
+            if self.clock() - self.openedat >= self.resettimeout and not self.trialinprogress:
+                self.trialinprogress = True
+                return True
+            return False
+
+    #----------------------------------------------------------------------
+    def success(self):
+    #----------------------------------------------------------------------
+        with self.lock:
+            self.failures = 0
+            self.firstfailure = None
+            self.openedat = None
+            self.trialinprogress = False
+
+    #----------------------------------------------------------------------
+    def failure(self):
+    #----------------------------------------------------------------------
+        '''
+        record failed request
+
+        :rtype: True if this failure opened the circuit
+        '''
+        with self.lock:
+            now = self.clock()
+            self.failures += 1
+            if self.firstfailure is None:
+                self.firstfailure = now
+            wasopen = self.openedat is not None
+            if self.trialinprogress or (self.failures >= self.failurethreshold
+                                        and now - self.firstfailure >= self.failurewindow):
+                self.openedat = now
+            self.trialinprogress = False
+            return not wasopen and self.openedat is not None
+
+########################################################################
+class CircuitBreakers():
+########################################################################
+    '''
+    registry of circuit breakers, one per host
+
+    :param failurethreshold: see :class:`CircuitBreaker`
+    :param resettimeout: see :class:`CircuitBreaker`
+    :param clock: function returning epoch time, for testing
+    :param failurewindow: see :class:`CircuitBreaker`
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self, failurethreshold=FAILURETHRESHOLD, resettimeout=RESETTIMEOUT, clock=time.time,
+                 failurewindow=FAILUREWINDOW):
+    #----------------------------------------------------------------------
+        self.failurethreshold = failurethreshold
+        self.resettimeout = resettimeout
+        self.failurewindow = failurewindow
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.breakers = {}
+
+    #----------------------------------------------------------------------
+    def get(self, host):
+    #----------------------------------------------------------------------
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.failurethreshold, self.resettimeout, self.clock,
+                                                     failurewindow=self.failurewindow)
+            return self.breakers[host]
+
+    #----------------------------------------------------------------------
+    def openhosts(self):
+    #----------------------------------------------------------------------
+        '''
+        :rtype: list of hosts whose circuits are open
+        '''
+        with self.lock:
+            return [host for host, breaker in self.breakers.items() if breaker.isopen()]
+
+# all clients share these unless they're given their own
+defaultbreakers = CircuitBreakers()
+defaultmetrics = RetryMetrics()
+
+########################################################################
+class RetryPolicy():
+########################################################################
+    '''
+    retry failed requests with exponential backoff and jitter
+
+    delay before retry n (starting at 0) is random between 0 and
+    min(maxdelay, basedelay * 2**n)
+
+    each failed attempt is counted by the host's circuit breaker, and retries stop
+    early if the circuit opens, whether because of this call's failures or others'.
+    Client errors, see :func:`isclienterror`, are raised without retrying
+
+    :param maxretries: maximum number of retries after the first attempt
+    :param basedelay: seconds to wait before the first retry, before jitter
+    :param maxdelay: maximum seconds to wait between attempts
+    :param breakers: CircuitBreakers, default is shared defaultbreakers
+    :param metrics: RetryMetrics, default is shared defaultmetrics
+    :param sleep: function(seconds) to wait, for testing
+    :param random: function returning random float in [0,1), for testing
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self, maxretries=5, basedelay=1, maxdelay=60, breakers=None, metrics=None,
+                 sleep=time.sleep, random=random.random):
+    #----------------------------------------------------------------------
+        self.maxretries = maxretries
+        self.basedelay = basedelay
+        self.maxdelay = maxdelay
+        self.breakers = breakers or defaultbreakers
+        self.metrics = metrics or defaultmetrics
+        self.sleep = sleep
+        self.random = random
+
+    #----------------------------------------------------------------------
+    def delay(self, retry):
+    #----------------------------------------------------------------------
+        '''
+        :param retry: retry number, starting at 0
+        :rtype: seconds to wait before retry
+        '''
+        return self.random() * min(self.maxdelay, self.basedelay * 2**retry)
+
+    #----------------------------------------------------------------------
+    def call(self, url, func, log=thislogger):
+    #----------------------------------------------------------------------
+        '''
+        call func, retrying if it raises an exception
+
+        :param url: url func requests, used to determine host
+        :param func: function() which makes the request and returns the result
+        :param log: logger for failures
+        :rtype: return value of func
+        '''
+        host = urlparse(url).netloc
+        breaker = self.breakers.get(host)
+
+        retry = 0
+        while True:
+            if not breaker.allow():
+                self.metrics.count(host, 'rejected')
+                raise circuitOpen('{} is not responding, circuit open'.format(host))
+
+            self.metrics.count(host, 'requests')
+            try:
+                result = func()
+                breaker.success()
+                return result
+
+            except Exception as e:
+                # host responded, but request was bad
+                if isclienterror(e):
+                    breaker.success()
+                    raise
+
+                self.metrics.count(host, 'failures')
+                if breaker.failure():
+                    self.metrics.count(host, 'circuitopened')
+                    log.error('{} failing, circuit opened'.format(host))
+
+                if retry >= self.maxretries or breaker.isopen():
+                    log.error('http request failure, retries exceeded: {0}'.format(e))
+                    raise
+
+                log.warning('http request failure: {0}'.format(e))
+                self.metrics.count(host, 'retries')
+                self.sleep(self.delay(retry))
+                retry += 1
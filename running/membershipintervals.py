@@ -0,0 +1,54 @@
+'''
+membershipintervals - remove overlaps between membership records
+===================================================================
+'''
+
+# standard
+
+# pypi
+
+# github
+
+# other
+
+# home grown
+
+#----------------------------------------------------------------------
+def removeoverlaps(intervals, getstart, getend, newstart, setstart, toss=False, onoverlap=None):
+#----------------------------------------------------------------------
+    '''
+    remove overlaps between intervals (e.g., memberships for a single member)
+
+    intervals are sorted by (end, start), then swept once. Any interval which starts
+    on or before the end of the intervals already kept has its start moved after
+    that end, so chains of any number of overlapping intervals are resolved.
+
+    start and end values can be anything which sorts in time order, e.g.,
+    'yyyy-mm-dd' strings
+
+    :param intervals: iterable of intervals, in any order
+    :param getstart: function(interval) returns start of interval
+    :param getend: function(interval) returns end of interval
+    :param newstart: function(lastend) returns start to use for an interval overlapping lastend
+    :param setstart: function(interval, start) updates start of interval
+    :param toss: True to drop intervals which would start after they end, rather than update them
+    :param onoverlap: optional function(lastinterval, interval, start, tossed) called
+        before interval's start is updated
+    :rtype: [interval, ...] sorted, with overlaps removed
+    '''
+    kept = []
+    for interval in sorted(intervals, key=lambda i: (getend(i), getstart(i))):
+        # kept intervals are in end order, so the last one has the latest end
+        if kept and getstart(interval) <= getend(kept[-1]):
+            start = newstart(getend(kept[-1]))
+            tossed = toss and start > getend(interval)
+
+            if onoverlap:
+                onoverlap(kept[-1], interval, start, tossed)
+
+            if tossed: continue
+            setstart(interval, start)
+
+        kept.append(interval)
+
+    return kept
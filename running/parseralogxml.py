@@ -2,15 +2,15 @@
 from argparse import ArgumentParser
 from csv import DictWriter
 from datetime import timedelta
-
-# pypi
-from loutilities.xmldict import ConvertXmlToDict
+from xml.etree.ElementTree import iterparse
 
 class ParameterError(Exception): pass
 
+fieldnames = 'date,time,type,subtype,dist,duration,equipment,route,temp,notes'.split(',')
+
 def dist2miles(distel):
-    dist = float(distel['_text'])
-    distunits = distel['unit']
+    dist = float(distel.text)
+    distunits = distel.get('unit')
     if distunits == 'mi':
         pass
     elif distunits == 'km':
@@ -24,38 +24,95 @@ def dist2miles(distel):
 
 def convertsecs(dur):
     return str(timedelta(seconds = float(dur)))
-    
+
+def localname(name):
+    # remove namespace, if any, from element tag or attribute name
+    return name.rsplit('}', 1)[-1]
+
+def iterevents(xmlfile):
+    '''
+    generator yielding each RunningAHEADLog/EventCollection/Event element from RunningAHEAD export,
+    with namespaces removed from tags and attribute names
+
+    the file is parsed incrementally, and each event is removed from the tree after it
+    has been processed, so memory use doesn't grow with the size of the export
+
+    :param xmlfile: filename or file handle of RunningAHEAD export
+    '''
+    path = []
+    parents = []
+    for event, elem in iterparse(xmlfile, events=('start', 'end')):
+        if event == 'start':
+            path.append(localname(elem.tag))
+            parents.append(elem)
+            continue
+
+        path.pop()
+        parents.pop()
+        if localname(elem.tag) != 'Event' or path[-2:] != ['RunningAHEADLog', 'EventCollection']: continue
+
+        for el in elem.iter():
+            el.tag = localname(el.tag)
+            for name in [name for name in el.attrib if '}' in name]:
+                el.attrib[localname(name)] = el.attrib.pop(name)
+
+        yield elem
+
+        # done with this event
+        parents[-1].remove(elem)
+
+def eltext(el):
+    return el.text.strip() if el is not None and el.text else ''
+
+def eventrow(wo):
+    '''
+    create csv row from Event element
+
+    :param wo: Event element
+    :rtype: dict with fieldnames keys
+    '''
+    datetime = wo.get('time')
+    datetimesplit = datetime.split('T')
+    date = datetimesplit[0]
+    time = datetimesplit[1] if len(datetimesplit) == 2 else ''
+    time = time[:-1] if time and time[-1] == 'Z' else time
+    distance = wo.find('Distance')
+    duration = wo.find('Duration')
+    row = {
+        'date':      date,
+        'time':      time,
+        'type':      wo.get('typeName'),
+        'subtype':   wo.get('subtypeName', ''),
+        'dist':      dist2miles(distance) if distance is not None else '',
+        'duration':  convertsecs(duration.get('seconds')) if duration is not None else '',
+        'equipment': eltext(wo.find('Equipment')),
+        'route':     eltext(wo.find('Route')),
+        'temp':      eltext(wo.find('EnvironmentalConditions/Temperature')),
+        'notes':     eltext(wo.find('Notes')),
+    }
+    return row
+
+def xml2csv(xmlfile, oscsvfile):
+    '''
+    convert RunningAHEAD export to csv, keeping Run, Bike and Walk workouts
+
+    :param xmlfile: filename or file handle of RunningAHEAD export
+    :param oscsvfile: file handle for csv output
+    '''
+    csvfile = DictWriter(oscsvfile, fieldnames=fieldnames)
+    csvfile.writeheader()
+    for wo in iterevents(xmlfile):
+        if wo.get('typeName') not in ['Run', 'Bike', 'Walk']: continue
+        csvfile.writerow(eventrow(wo))
+
 def main():
     parser = ArgumentParser()
     parser.add_argument('-X', '--xmlfile', help='input xml file, from RunningAHEAD export', required=True)
     parser.add_argument('-C', '--csvfile', help='output csv file', required=True)
     args = parser.parse_args()
 
-    fieldnames = 'date,time,type,subtype,dist,duration,equipment,route,temp,notes'.split(',')
-    workouts = ConvertXmlToDict(args.xmlfile)
     with open(args.csvfile, 'w', newline='') as oscsvfile:
-        csvfile = DictWriter(oscsvfile, fieldnames=fieldnames)
-        csvfile.writeheader()
-        for wo in workouts['RunningAHEADLog']['EventCollection']['Event']:
-            if wo['typeName'] not in ['Run', 'Bike', 'Walk']: continue
-            datetime = wo['time']
-            datetimesplit = datetime.split('T')
-            date = datetimesplit[0]
-            time = datetimesplit[1] if len(datetimesplit) == 2 else ''
-            time = time[:-1] if time and time[-1] == 'Z' else time
-            row = {
-                'date':      date,
-                'time':      time,
-                'type':      wo['typeName'],
-                'subtype':   wo['subtypeName'] if 'subtypeName' in wo else '',
-                'dist':      dist2miles(wo['Distance']) if 'Distance' in wo else '',
-                'duration':  convertsecs(wo['Duration']['seconds']) if 'Duration' in wo else '',
-                'equipment': wo['Equipment']['_text'] if 'Equipment' in wo else '',
-                'route':     wo['Route']['_text'] if 'Route' in wo else '',
-                'temp':      wo['EnvironmentalConditions']['Temperature']['_text'] if 'EnvironmentalConditions' in wo and 'Temperature' in wo['EnvironmentalConditions'] else '',
-                'notes':     wo['Notes'] if 'Notes' in wo else '',
-            }
-            csvfile.writerow(row)
+        xml2csv(args.xmlfile, oscsvfile)
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
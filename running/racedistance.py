@@ -0,0 +1,89 @@
+'''
+racedistance - parse race distance from event name
+===================================================================
+
+event names are formatted as <racename> - <distance>, where distance is, e.g.,
+50K, 100 Miler, Marathon, Half Marathon, 1/2 Marathon, or for timed races 24hrs
+
+the same event names appear in the results of many runners, so parsed event
+names are memoized
+'''
+
+# standard
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# pypi
+
+# github
+
+# other
+
+# home grown
+
+MPERMILE = 1609.344
+MARATHONMILES = 26.21875        # true marathon
+HALFMARATHONMILES = 13.109375   # true half marathon
+
+# number of event names remembered
+CACHESIZE = 4096
+
+# distances which are named rather than measured
+NAMEDDISTANCES = {
+    'Marathon': MARATHONMILES,
+    'Half Marathon': HALFMARATHONMILES,
+    '1/2 Marathon': HALFMARATHONMILES,
+}
+
+# 13 and 26 milers are really half marathons and marathons
+MILERDISTANCES = {
+    13: HALFMARATHONMILES,
+    26: MARATHONMILES,
+}
+
+# leading digits, then units
+DISTANCEFIELD = re.compile(r'(\d*)(.*)', re.DOTALL)
+
+# text - whole event name, stripped
+# racename - event name before the distance
+# distfield - distance part of event name
+# distmiles, distkm - distance, or None if not recognized
+# hours - duration of timed race, or None if not recognized
+EventName = namedtuple('EventName', 'text,racename,distfield,distmiles,distkm,hours')
+
+#----------------------------------------------------------------------
+@lru_cache(maxsize=CACHESIZE)
+def parseevent(eventname):
+#----------------------------------------------------------------------
+    '''
+    parse event name into race name and distance or duration
+
+    :param eventname: <racename> - <distance>, there may be hyphens in racename
+    :rtype: EventName
+    '''
+    text = eventname.strip()
+    rawparts = eventname.split('-')
+    racename = '-'.join(rawparts[0:-1]).strip()
+    distfield = rawparts[-1].strip()
+
+    digits, units = DISTANCEFIELD.match(distfield).groups()
+    dist = int(digits) if digits else 0
+
+    distmiles = distkm = None
+    if distfield in NAMEDDISTANCES:
+        distmiles = NAMEDDISTANCES[distfield]
+        distkm = distmiles * (MPERMILE/1000)
+
+    elif units.strip() == 'K':
+        distkm = dist
+        distmiles = (dist * 1000) / MPERMILE
+
+    elif units.strip() == 'Miler':
+        distmiles = MILERDISTANCES.get(dist, dist)
+        distkm = distmiles * (MPERMILE/1000)
+
+    # timed races don't allow space before units
+    hours = dist if units == 'hrs' else None
+
+    return EventName(text, racename, distfield, distmiles, distkm, hours)
@@ -32,6 +32,7 @@ import gpxpy.geo
 # home grown
 from running.running import version
 from running import *
+from running import cassette
 from loutilities import timeu
 from loutilities import apikey
 
@@ -46,8 +47,8 @@ WXPERIOD = 5*60    # number of seconds between weather assessments
 #tgpx = timeu.asctime('%Y-%m-%dT%H:%M:%S%Z')
 
 HTTPTIMEOUT = 5
-HTTPTZ = httplib2.Http(timeout=HTTPTIMEOUT)
-HTTPWX = httplib2.Http(timeout=HTTPTIMEOUT,disable_ssl_certificate_validation=True)
+HTTPTZ = cassette.wraphttp(httplib2.Http(timeout=HTTPTIMEOUT))
+HTTPWX = cassette.wraphttp(httplib2.Http(timeout=HTTPTIMEOUT,disable_ssl_certificate_validation=True))
 
 # dewpoint from http://www.meteo-blog.net/2012-05/dewpoint-calculation-script-in-python/
 # dewpoint constants
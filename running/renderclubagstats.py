@@ -38,20 +38,25 @@ import argparse
 import csv
 import datetime
 import collections
+import itertools
 import time
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 # pypi
+import numpy as np
 from IPython.core.debugger import Tracer; debug_here = Tracer()
 
 # github
 
 # other
-import matplotlib.pyplot as plt
+# matplotlib is imported by render() unless summary only
 
 # home grown
 from loutilities import timeu
 from runningclub import render as ren
 from running.running import ultrasignupresults, analyzeagegrade, athlinksresults, version, runningaheadresults
+from running import rendermanifest
 
 
 class invalidParameter(Exception): pass
@@ -65,6 +70,15 @@ TRENDLIMITS = collections.OrderedDict([
                ((42195.00,200000),   ('Ultra','r')),
               ])
 
+# rendering parameters which are the same for all runners, see render()
+RenderParams = collections.namedtuple('RenderParams','outfile,minagegrade,minraces,mintrend,begindate,enddate,summaryonly')
+
+# when rendering in parallel, each process is given about this many chunks of runners
+RENDERCHUNKS = 4
+
+# figure used for every runner rendered by this process, see getfigure()
+_figure = None
+
 # priorities for deduplication
 # lowest priority value of duplicate entries is kept
 PRIO_CLUBRACES = 1
@@ -73,12 +87,7 @@ PRIO_ATHLINKS = 3
 PRIO_RUNNINGAHEAD = 4
     
 #----------------------------------------------------------------------
-def mean(items):
-#----------------------------------------------------------------------
-    return float(sum(items))/len(items) if len(items) > 0 else float('nan')
-
-#----------------------------------------------------------------------
-def initaagrunner(aag,thisname,gender,dob):
+def initaagrunner(aag,thisname,gender,dob,columnar=False):
 #----------------------------------------------------------------------
     '''
     initializaze :class:`AnalyzeAgeGrade` object, if not already initialized
@@ -87,20 +96,22 @@ def initaagrunner(aag,thisname,gender,dob):
     :param thisname: runner name
     :param gender: M or F
     :param dob: datetime date of birth
+    :param columnar: True to store stats in columns, see :class:`AnalyzeAgeGrade`
     '''
     if thisname not in aag:
-        aag[thisname] = analyzeagegrade.AnalyzeAgeGrade()
+        aag[thisname] = analyzeagegrade.AnalyzeAgeGrade(columnar=columnar)
         aag[thisname].set_runner(thisname,gender,dob)
     
         
 #----------------------------------------------------------------------
-def collectathlinks(aag,athlinksfile):
+def collectathlinks(aag,athlinksfile,columnar=False):
 #----------------------------------------------------------------------
     '''
     Collect club age grade statistics, based on collected athlinks statistics (collectathlinksresults)
     
     :param aag: :class:`AnalyzeAgeGrade` objects, by runner name
     :param athlinksfile: file with athlinks results, output from athlinksresults
+    :param columnar: True to store stats in columns, see :class:`AnalyzeAgeGrade`
     '''
     # reading athlinksfile
     athlf = athlinksresults.AthlinksResultFile(athlinksfile)
@@ -108,14 +119,11 @@ def collectathlinks(aag,athlinksfile):
     
     # read records from athlinksfile
     # gather each individual's result statistics, render later
-    while True:
-        result = next(athlf)
-        if result is None: break
-        
+    for result in athlf:
         thisname = result.name.lower()
 
         # initialize aag data structure, if not already done
-        initaagrunner(aag,thisname,result.gender,result.dob)
+        initaagrunner(aag,thisname,result.gender,result.dob,columnar)
     
         # collect this result
         timesecs = timeu.timesecs(result.resulttime)
@@ -124,14 +132,17 @@ def collectathlinks(aag,athlinksfile):
                                    loc=result.raceloc,fuzzyage=result.fuzzyage,
                                    source='athlinks',priority=PRIO_ATHLINKS)
 
+    athlf.close()
+
 #----------------------------------------------------------------------
-def collectultrasignup(aag,ultrasignupfile):
+def collectultrasignup(aag,ultrasignupfile,columnar=False):
 #----------------------------------------------------------------------
     '''
     Collect club age grade statistics, based on collected ultrasignup statistics (collectultrasignupresults)
     
     :param aag: :class:`AnalyzeAgeGrade` objects, by runner name
     :param ultrasignupfile: file with ultrasignup results, output from ultrasignupresults
+    :param columnar: True to store stats in columns, see :class:`AnalyzeAgeGrade`
     '''
     # reading ultrasignupfile
     ultra = ultrasignupresults.UltraSignupResultFile(ultrasignupfile)
@@ -139,14 +150,11 @@ def collectultrasignup(aag,ultrasignupfile):
     
     # read records from ultrasignupfile
     # gather each individual's result statistics, render later
-    while True:
-        result = next(ultra)
-        if result is None: break
-        
+    for result in ultra:
         thisname = result.name.lower()
 
         # initialize aag data structure, if not already done
-        initaagrunner(aag,thisname,result.gender,result.dob)
+        initaagrunner(aag,thisname,result.gender,result.dob,columnar)
     
         # collect this result
         timesecs = timeu.timesecs(result.time)
@@ -154,14 +162,17 @@ def collectultrasignup(aag,ultrasignupfile):
             aag[thisname].add_stat(result.date,result.km*1000,timesecs,race=result.race,
                                    loc=result.loc,source='ultrasignup',priority=PRIO_ULTRASIGNUP)
 
+    ultra.close()
+
 #----------------------------------------------------------------------
-def collectrunningahead(aag,runningaheadfile):
+def collectrunningahead(aag,runningaheadfile,columnar=False):
 #----------------------------------------------------------------------
     '''
     Collect club age grade statistics, based on collected runningahead statistics (collectrunningaheadresults)
     
     :param aag: :class:`AnalyzeAgeGrade` objects, by runner name
     :param runningaheadfile: file with runningahead results, output from runningaheadresults
+    :param columnar: True to store stats in columns, see :class:`AnalyzeAgeGrade`
     '''
     # reading runningaheadfile
     rafile = runningaheadresults.RunningAheadResultFile(runningaheadfile)
@@ -169,28 +180,28 @@ def collectrunningahead(aag,runningaheadfile):
     
     # read records from runningaheadfile
     # gather each individual's result statistics, render later
-    while True:
-        result = next(rafile)
-        if result is None: break
-        
+    for result in rafile:
         thisname = result.name.lower()
 
         # initialize aag data structure, if not already done
-        initaagrunner(aag,thisname,result.gender,result.dob)
+        initaagrunner(aag,thisname,result.gender,result.dob,columnar)
     
         # collect this result
         timesecs = timeu.timesecs(result.time)
         if timesecs > 0:
             aag[thisname].add_stat(result.date,result.km*1000,timesecs,race=result.race,source='runningahead',priority=PRIO_RUNNINGAHEAD)
+
+    rafile.close()
         
 #----------------------------------------------------------------------
-def collectclub(aag,clubfile):
+def collectclub(aag,clubfile,columnar=False):
 #----------------------------------------------------------------------
     '''
     Collect club age grade statistics, based on collected athlinks statistics (collectathlinksresults)
     
     :param aag: :class:`AnalyzeAgeGrade` objects, by runner name
     :param clubfile: file with club results, output from runningclub.exportresults
+    :param columnar: True to store stats in columns, see :class:`AnalyzeAgeGrade`
     '''
     # reading clubfile
     _clubf = open(clubfile,'r',newline='')
@@ -227,7 +238,7 @@ def collectclub(aag,clubfile):
         thisname = result.name.lower()
 
         # initialize aag data structure, if not already done
-        initaagrunner(aag,thisname,result.gender,result.dob)
+        initaagrunner(aag,thisname,result.gender,result.dob,columnar)
     
         # collect this result
         timesecs = result.resulttime
@@ -236,7 +247,194 @@ def collectclub(aag,clubfile):
         
             
 #----------------------------------------------------------------------
-def render(aag,outfile,summaryfile,detailfile,minagegrade,minraces,mintrend,begindate,enddate):
+def getfigure():
+#----------------------------------------------------------------------
+    '''
+    return the figure used for every runner rendered by this process -- required to save memory
+    '''
+    global _figure
+    if _figure is None:
+        import matplotlib.pyplot as plt
+        _figure = plt.figure()
+    return _figure
+
+#----------------------------------------------------------------------
+def detailrows(runner):
+#----------------------------------------------------------------------
+    '''
+    rows for detail file, for all of a runner's results
+    
+    :param runner: :class:`AnalyzeAgeGrade` for this runner, crunched
+    :rtype: [{detlfield: value, ...}, ...]
+    '''
+    tfile = timeu.asctime('%Y-%m-%d')
+    rendername = runner.who.title()
+    
+    # remove entries less than minagegrade
+    stats = runner.get_stats()
+    #for stat in stats:
+    #    if stat.ag < minagegrade:
+    #        runner.del_stat(stat)
+    
+    detlrows = []
+    name,gender,dob = runner.get_runner()
+    detlout = {'name':rendername,'gender':gender,'dob':tfile.dt2asc(dob)}
+    for stat in stats:
+        for attr in analyzeagegrade.AgeGradeStat.attrs:
+            detlout[attr] = getattr(stat,attr)
+            if attr == 'date':
+                detlout[attr] = tfile.dt2asc(detlout[attr])
+        # interpret some of the data from the raw stat
+        detlout['distkm'] = detlout['dist'] / 1000.0
+        detlout['distmiles'] = detlout['dist']/METERSPERMILE
+        rendertime = ren.rendertime(detlout['time'],0)
+        while len(rendertime.split(':')) < 3:
+            rendertime = '0:'+rendertime
+        detlout['rendertime'] = rendertime
+        detlrows.append(dict(detlout))
+    return detlrows
+
+#----------------------------------------------------------------------
+def runnerdigest(runner,params):
+#----------------------------------------------------------------------
+    '''
+    hash of everything which determines a runner's summary row and chart
+    
+    :param runner: :class:`AnalyzeAgeGrade` for this runner, crunched
+    :param params: :class:`RenderParams`, summaryonly is ignored
+    :rtype: hex string
+    '''
+    return rendermanifest.runnerdigest(runner.get_runner(),params,runner.get_columns().digest())
+
+#----------------------------------------------------------------------
+def renderrunner(runner,params):
+#----------------------------------------------------------------------
+    '''
+    render a single runner's results, saving chart if required
+
+    runner must already be deduplicated and crunched. This may be called in a
+    worker process, so output rows are returned rather than written
+
+    :param runner: :class:`AnalyzeAgeGrade` for this runner
+    :param params: :class:`RenderParams`
+    :rtype: (detlrows, summout, chart) - detail file rows, summary file row or None if runner filtered out,
+        chart file name or None if not rendered
+    '''
+    tfile = timeu.asctime('%Y-%m-%d')
+    lastyear = params.enddate.year
+    yearrange = list(range(params.begindate.year,lastyear+1))
+    
+    thisname = runner.who
+    rendername = thisname.title()
+    
+    # write detailed file before filtering
+    detlrows = detailrows(runner)
+    name,gender,dob = runner.get_runner()
+        
+    jan1 = tfile.asc2dt('{}-1-1'.format(lastyear))
+    runnerage = timeu.age(jan1,dob)
+    
+    # filter out runners younger than 14
+    if runnerage < 14: return detlrows,None,None
+
+    # filter out runners who have not run enough races
+    allstats = runner.get_columns()
+    years = allstats.years()
+    if params.enddate:
+        lastyear = params.enddate.year
+    else:
+        lastyear = timeu.epoch2dt(time.time()).year
+    if np.count_nonzero(years==lastyear) < params.minraces: return detlrows,None,None
+    
+    # set up output file name template
+    if params.outfile:
+        runner.set_renderfname(params.outfile)
+
+    # trend statistics for overall, each distance category, and the last year of each, in one pass
+    distcategories = ['overall']
+    subsets = collections.OrderedDict()
+    subsets['overall'] = np.ones(len(allstats), dtype=bool)
+    for tlimit in TRENDLIMITS:
+        distcategory,distcolor = TRENDLIMITS[tlimit]
+        distcategories.append(distcategory)
+        subsets[distcategory] = (allstats.dist >= tlimit[0]) & (allstats.dist <= tlimit[1])
+    for distcategory in distcategories:
+        subsets[distcategory,lastyear] = subsets[distcategory] & (years == lastyear)
+    trends = runner.regress(subsets)
+
+    # set up to collect averages
+    avg = collections.OrderedDict()
+
+    # retrieve output filename for hyperlink
+    # must be called after set_runner and set_renderfname
+    thisoutfile = runner.get_outfilename()
+   
+    summout = {}
+    summout['name'] = '=HYPERLINK("{}","{}")'.format(thisoutfile,rendername)
+    summout['age'] = runnerage
+    summout['gender'] = gender
+    for distcategory in distcategories:
+        trend = trends[distcategory]
+        # overall is always reported, distance categories only with enough races for trendline
+        if distcategory != 'overall' and trend.n < params.mintrend: continue
+        avg[distcategory] = trend.mean
+        
+        oneyrtrend = trends[distcategory,lastyear]
+        if oneyrtrend.n > 0:
+            summout['1yr agegrade\n{}'.format(distcategory)] = oneyrtrend.mean
+        summout['avg agegrade\n{}'.format(distcategory)] = avg[distcategory]
+        if trend.n >= params.mintrend:
+            summout['trend\n{}'.format(distcategory)] = trend.slope
+            summout['stderr\n{}'.format(distcategory)] = trend.stderr
+            summout['r-squared\n{}'.format(distcategory)] = trend.rvalue**2
+            summout['pvalue\n{}'.format(distcategory)] = trend.pvalue
+        summout['numraces\n{}'.format(distcategory)] = trend.n
+    for year in yearrange:
+        summout['numraces\n{}'.format(year)] = int(np.count_nonzero(years==year))
+    
+    # summary only, so no chart
+    if params.summaryonly: return detlrows,summout,None
+
+    # set up rendering parameters
+    runner.set_xlim(params.begindate,params.enddate)
+    runner.set_ylim(params.minagegrade,100)
+    runner.set_colormap([200,100*METERSPERMILE])
+
+    # clear figure, set up axes
+    fig = getfigure()
+    fig.clear()
+    ax = fig.add_subplot(111)
+    
+    # render the results
+    runner.render_stats(fig)    # plot statistics
+
+    # draw trendlines
+    runner.plot_trendline(fig,'overall',trends['overall'],color='k')
+    for tlimit in TRENDLIMITS:
+        distcategory,distcolor = TRENDLIMITS[tlimit]
+        if distcategory not in avg: continue
+        runner.plot_trendline(fig,distcategory,trends[distcategory],color=distcolor)
+    
+    # annotate with averages
+    avgstr = 'averages\n'
+    for lab in avg:
+        thisavg = int(round(avg[lab]))
+        avgstr += '  {}: {}%\n'.format(lab,thisavg)
+    avgstr += 'age (1/1/{}): {}'.format(lastyear,runnerage)
+    
+    # TODO: add get_*lim() to aag -- xlim and ylim are currently side-effect of aag.render_stats()
+    x1,xn = ax.get_xlim()
+    y1,yn = ax.get_ylim()
+    xy = (x1+10,y1+10)
+    runner.render_annotate(fig,avgstr,xy)
+    
+    # save file
+    runner.save(fig)
+
+    return detlrows,summout,thisoutfile
+
+#----------------------------------------------------------------------
+def render(aag,outfile,summaryfile,detailfile,minagegrade,minraces,mintrend,begindate,enddate,summaryonly=False,processes=1,manifestfile=None):
 #----------------------------------------------------------------------
     '''
     render collected results
@@ -249,6 +447,10 @@ def render(aag,outfile,summaryfile,detailfile,minagegrade,minraces,mintrend,begi
     :param mintrend: minimum races over the full period for trendline
     :param begindate: render races between begindate and enddate, datetime
     :param enddate: render races between begindate and enddate, datetime
+    :param summaryonly: True to write summary and detail files without rendering charts
+    :param processes: number of processes to render runners in parallel
+    :param manifestfile: file recording what was rendered for each runner, runners unchanged since
+        the last run with the same manifest are not rendered again, None to render all runners
     '''
     firstyear = begindate.year
     lastyear = enddate.year
@@ -276,133 +478,52 @@ def render(aag,outfile,summaryfile,detailfile,minagegrade,minraces,mintrend,begi
     DETL = csv.DictWriter(_DETL,detlfields,extrasaction='ignore')
     DETL.writeheader()
     
-    # create a figure used for everyone -- required to save memory
-    fig = plt.figure()
-    
-    # loop through each member we've recorded information about
+    # remove duplicate entries
     for thisname in aag:
-        rendername = thisname.title()
-        
-        # remove duplicate entries
         aag[thisname].deduplicate()   
-        
-        # crunch the numbers, and remove entries less than minagegrade
-        aag[thisname].crunch()    # calculate age grade for each result
-        stats = aag[thisname].get_stats()
-        #for stat in stats:
-        #    if stat.ag < minagegrade:
-        #        aag[thisname].del_stat(stat)
-        
-        # write detailed file before filtering
-        name,gender,dob = aag[thisname].get_runner()
-        detlout = {'name':rendername,'gender':gender,'dob':tfile.dt2asc(dob)}
-        for stat in stats:
-            for attr in analyzeagegrade.AgeGradeStat.attrs:
-                detlout[attr] = getattr(stat,attr)
-                if attr == 'date':
-                    detlout[attr] = tfile.dt2asc(detlout[attr])
-            # interpret some of the data from the raw stat
-            detlout['distkm'] = detlout['dist'] / 1000.0
-            detlout['distmiles'] = detlout['dist']/METERSPERMILE
-            rendertime = ren.rendertime(detlout['time'],0)
-            while len(rendertime.split(':')) < 3:
-                rendertime = '0:'+rendertime
-            detlout['rendertime'] = rendertime
-            DETL.writerow(detlout)
-            
-        jan1 = tfile.asc2dt('{}-1-1'.format(lastyear))
-        runnerage = timeu.age(jan1,dob)
-        
-        # filter out runners younger than 14
-        if runnerage < 14: continue
-
-        # filter out runners who have not run enough races
-        stats = aag[thisname].get_stats()
-        if enddate:
-            lastyear = enddate.year
-        else:
-            lastyear = timeu.epoch2dt(time.time()).year
-        lastyearstats = [s for s in stats if s.date.year==lastyear]
-        if len(lastyearstats) < minraces: continue
-        
-        # set up output file name template
-        if outfile:
-            aag[thisname].set_renderfname(outfile)
-
-        # set up rendering parameters
-        aag[thisname].set_xlim(begindate,enddate)
-        aag[thisname].set_ylim(minagegrade,100)
-        aag[thisname].set_colormap([200,100*METERSPERMILE])
-
-        # clear figure, set up axes
-        fig.clear()
-        ax = fig.add_subplot(111)
-        
-        # render the results
-        aag[thisname].render_stats(fig)    # plot statistics
-
-        # set up to collect averages
-        avg = collections.OrderedDict()
-
-        # draw trendlines, write output
-        allstats = aag[thisname].get_stats()
-        avg['overall'] = mean([s.ag for s in allstats])
-        trend = aag[thisname].render_trendline(fig,'overall',color='k')
-
-        # retrieve output filename for hyperlink
-        # must be called after set_runner and set_renderfname
-        thisoutfile = aag[thisname].get_outfilename()
-       
-        summout = {}
-        summout['name'] = '=HYPERLINK("{}","{}")'.format(thisoutfile,rendername)
-        summout['age'] = runnerage
-        summout['gender'] = gender
-        oneyrstats = [s.ag for s in allstats if s.date.year == lastyear]
-        if len(oneyrstats) > 0:
-            summout['1yr agegrade\noverall'] = mean(oneyrstats)
-        summout['avg agegrade\noverall'] = avg['overall']
-        if len(allstats) >= mintrend:
-            summout['trend\noverall'] = trend.slope
-            summout['stderr\noverall'] = trend.stderr
-            summout['r-squared\noverall'] = trend.rvalue**2
-            summout['pvalue\noverall'] = trend.pvalue
-        summout['numraces\noverall'] = len(allstats)
-        for year in yearrange:
-            summout['numraces\n{}'.format(year)] = len([s for s in allstats if s.date.year==year])
-        for tlimit in TRENDLIMITS:
-            distcategory,distcolor = TRENDLIMITS[tlimit]
-            tstats = [s for s in allstats if s.dist >= tlimit[0] and s.dist <= tlimit[1]]
-            if len(tstats) < mintrend: continue
-            avg[distcategory] = mean([s.ag for s in tstats])
-            trend = aag[thisname].render_trendline(fig,distcategory,thesestats=tstats,color=distcolor)
-            
-            oneyrcategory = [s.ag for s in tstats if s.date.year == lastyear]
-            if len(oneyrcategory) > 0:
-                summout['1yr agegrade\n{}'.format(distcategory)] = mean(oneyrcategory)
-            summout['avg agegrade\n{}'.format(distcategory)] = avg[distcategory]
-            summout['trend\n{}'.format(distcategory)] = trend.slope
-            summout['stderr\n{}'.format(distcategory)] = trend.stderr
-            summout['r-squared\n{}'.format(distcategory)] = trend.rvalue**2
-            summout['pvalue\n{}'.format(distcategory)] = trend.pvalue
-            summout['numraces\n{}'.format(distcategory)] = len(tstats)
-        SUMM.writerow(summout)
-        
-        # annotate with averages
-        avgstr = 'averages\n'
-        for lab in avg:
-            thisavg = int(round(avg[lab]))
-            avgstr += '  {}: {}%\n'.format(lab,thisavg)
-        avgstr += 'age (1/1/{}): {}'.format(lastyear,runnerage)
-        
-        # TODO: add get_*lim() to aag -- xlim and ylim are currently side-effect of aag.render_stats()
-        x1,xn = ax.get_xlim()
-        y1,yn = ax.get_ylim()
-        xy = (x1+10,y1+10)
-        aag[thisname].render_annotate(fig,avgstr,xy)
-        
-        # save file
-        aag[thisname].save(fig)
-         
+    
+    # crunch the numbers -- calculate age grade for everyone's results at once
+    analyzeagegrade.crunchall(list(aag.values()))
+    
+    # render each member we've recorded information about, in name order
+    # rows are written here as they come back, in the same order whether rendered serially or in parallel
+    params = RenderParams(outfile,minagegrade,minraces,mintrend,begindate,enddate,summaryonly)
+    names = sorted(aag)
+    runners = [aag[thisname] for thisname in names]
+    
+    # runners which haven't changed since the manifest was written reuse the previous summary and chart
+    manifest = rendermanifest.readmanifest(manifestfile) if manifestfile else {}
+    digests = {thisname: runnerdigest(aag[thisname],params) if manifestfile else None for thisname in names}
+    newmanifest,torendernames = rendermanifest.plan(names,manifest,digests,summaryonly)
+    torender = [aag[thisname] for thisname in torendernames]
+    
+    if processes <= 1:
+        rendered = (renderrunner(runner,params) for runner in torender)
+    else:
+        chunksize = max(1, len(torender) // (processes*RENDERCHUNKS))
+        executor = ProcessPoolExecutor(max_workers=processes)
+        rendered = executor.map(renderrunner,torender,itertools.repeat(params),chunksize=chunksize)
+    
+    # write rows in name order, whether reused or rendered
+    try:
+        for runner in runners:
+            thisname = runner.who
+            if thisname in newmanifest:
+                detlrows = detailrows(runner)
+                summout = newmanifest[thisname]['summary']
+            else:
+                detlrows,summout,chart = next(rendered)
+                newmanifest[thisname] = rendermanifest.makeentry(thisname,digests[thisname],summout,chart)
+            DETL.writerows(detlrows)
+            if summout:
+                SUMM.writerow(summout)
+    finally:
+        if processes > 1:
+            executor.shutdown()
+    
+    if manifestfile:
+        rendermanifest.writemanifest(manifestfile,newmanifest)
+    
     _SUMM.close()
     _DETL.close()
     
@@ -427,6 +548,10 @@ def main():
     parser.add_argument('-t','--mintrend', help="minimum races between BEGINDATE and ENDDATE for trendline, default=%(default)s",default=5)
     parser.add_argument('-b','--begindate', help="render races between begindate and enddate, yyyy-mm-dd",default=None)
     parser.add_argument('-e','--enddate', help="render races between begindate and enddate, yyyy-mm-dd",default=None)
+    parser.add_argument('-p','--processes', help="number of processes to render runners in parallel, default=%(default)s",type=int,default=1)
+    parser.add_argument('-m','--manifest', help="file to record what was rendered, so unchanged runners are skipped next time, default=%(default)s",default=None)
+    parser.add_argument('--summaryonly', help="write summary and detail files only, without charts", action='store_true')
+    parser.add_argument('--columnar', help="store each runner's stats in columns, rather than objects", action='store_true')
     args = parser.parse_args()
 
     athlinksfile = args.athlinksfile
@@ -460,22 +585,22 @@ def main():
 
     # collect data from athlinks, if desired
     if athlinksfile:
-        collectathlinks(aag,athlinksfile)
+        collectathlinks(aag,athlinksfile,args.columnar)
         
     # collect data from ultrasignup, if desired
     if ultrasignupfile:
-        collectultrasignup(aag,ultrasignupfile)
+        collectultrasignup(aag,ultrasignupfile,args.columnar)
         
     # collect data from runningahead, if desired
     if runningaheadfile:
-        collectrunningahead(aag,runningaheadfile)
+        collectrunningahead(aag,runningaheadfile,args.columnar)
         
     # collect data from results database, if desired
     if clubfile:
-        collectclub(aag,clubfile)
+        collectclub(aag,clubfile,args.columnar)
         
     # render all the data
-    render(aag,outfile,summaryfile,detailfile,minagegrade,minraces,mintrend,begindate,enddate)
+    render(aag,outfile,summaryfile,detailfile,minagegrade,minraces,mintrend,begindate,enddate,args.summaryonly,args.processes,args.manifest)
         
 # ##########################################################################################
 #	__main__
@@ -0,0 +1,141 @@
+'''
+rendermanifest - record what was rendered for each runner, so unchanged runners can be skipped
+=================================================================================================
+
+the manifest has a json line per runner, with a hash of everything which determines the
+runner's summary row and chart, the summary row, and the chart file name. A later run
+with the same hash reuses the summary row, and the chart if it still exists
+
+if the manifest can't be read, all runners are rendered
+'''
+
+# standard
+import os
+import json
+import hashlib
+import logging
+from tempfile import NamedTemporaryFile
+
+# pypi
+
+# github
+
+# other
+
+# home grown
+
+# change when rendering changes, so all runners in the manifest are rendered again
+MANIFESTVERSION = 1
+
+# fields of each manifest entry
+ENTRYFIELDS = ('name', 'hash', 'summary', 'chart')
+
+thislogger = logging.getLogger('running.rendermanifest')
+
+#----------------------------------------------------------------------
+def runnerdigest(runnerinfo, params, statsdigest):
+#----------------------------------------------------------------------
+    '''
+    hash of everything which determines a runner's summary row and chart
+
+    :param runnerinfo: (name, gender, dob) as returned by AnalyzeAgeGrade.get_runner()
+    :param params: renderclubagstats.RenderParams, summaryonly is ignored
+    :param statsdigest: digest of the runner's crunched stats, see AgeGradeColumns.digest()
+    :rtype: hex string
+    '''
+    hashed = hashlib.sha256()
+    hashed.update(repr((MANIFESTVERSION, tuple(runnerinfo), params._replace(summaryonly=None))).encode('utf-8'))
+    hashed.update(statsdigest.encode('utf-8'))
+    return hashed.hexdigest()
+
+#----------------------------------------------------------------------
+def makeentry(name, digest, summout, chart):
+#----------------------------------------------------------------------
+    '''
+    :param name: runner name
+    :param digest: :func:`runnerdigest` for this run
+    :param summout: summary file row, or None if runner was filtered out
+    :param chart: chart file name, or None if not rendered
+    :rtype: manifest entry
+    '''
+    return {'name': name, 'hash': digest, 'summary': summout, 'chart': chart}
+
+#----------------------------------------------------------------------
+def readmanifest(manifestfile):
+#----------------------------------------------------------------------
+    '''
+    read manifest of runners rendered by a previous run
+
+    :param manifestfile: manifest file name, one json line per runner
+    :rtype: {name: entry, ...} see :func:`makeentry`, empty if file is missing or can't be read
+    '''
+    manifest = {}
+    if not os.path.exists(manifestfile):
+        return manifest
+
+    try:
+        with open(manifestfile) as manifestf:
+            for line in manifestf:
+                entry = json.loads(line)
+                manifest[entry['name']] = {field: entry[field] for field in ENTRYFIELDS}
+    except (ValueError, KeyError, TypeError) as e:
+        thislogger.warning('{}: could not read manifest, rendering all runners: {}'.format(manifestfile, e))
+        return {}
+
+    return manifest
+
+#----------------------------------------------------------------------
+def writemanifest(manifestfile, manifest):
+#----------------------------------------------------------------------
+    '''
+    replace manifest with runners rendered by this run
+
+    :param manifestfile: manifest file name
+    :param manifest: {name: entry, ...} as returned by :func:`readmanifest`
+    '''
+    # get full path for manifestfile to assure manifestdir isn't relative
+    manifestdir = os.path.dirname(os.path.abspath(manifestfile))
+    with NamedTemporaryFile(mode='w', suffix='.manifest', delete=False, dir=manifestdir) as tempmanifest:
+        tempmanifestfile = tempmanifest.name
+        for name in sorted(manifest):
+            tempmanifest.write('{}\n'.format(json.dumps(manifest[name])))
+    os.replace(tempmanifestfile, manifestfile)
+
+#----------------------------------------------------------------------
+def unchanged(entry, digest, summaryonly):
+#----------------------------------------------------------------------
+    '''
+    check whether runner can be skipped, because nothing has changed since the manifest entry was made
+
+    :param entry: manifest entry from previous run, or None
+    :param digest: :func:`runnerdigest` for this run
+    :param summaryonly: True if charts are not being rendered
+    :rtype: True if previous summary row and chart can be reused
+    '''
+    if not entry or entry['hash'] != digest: return False
+
+    # no chart needed if runner was filtered out, or if not rendering charts
+    if entry['summary'] is None or summaryonly: return True
+    return entry['chart'] is not None and os.path.exists(entry['chart'])
+
+#----------------------------------------------------------------------
+def plan(names, manifest, digests, summaryonly):
+#----------------------------------------------------------------------
+    '''
+    decide which runners need to be rendered
+
+    :param names: runner names, in the order they're to be rendered
+    :param manifest: {name: entry, ...} from previous run, see :func:`readmanifest`
+    :param digests: {name: :func:`runnerdigest`, ...} for this run
+    :param summaryonly: True if charts are not being rendered
+    :rtype: (reused, torender) - reused is {name: entry, ...} for runners whose previous summary
+        row and chart can be reused, torender is [name, ...] in names order
+    '''
+    reused = {}
+    torender = []
+    for name in names:
+        if unchanged(manifest.get(name), digests[name], summaryonly):
+            reused[name] = manifest[name]
+        else:
+            torender.append(name)
+    return reused, torender
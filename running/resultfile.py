@@ -0,0 +1,234 @@
+'''
+resultfile - read result files using a declared schema
+===================================================================
+
+each column of a result file is declared with the attribute it sets and its kind.
+When the file is opened, a converter is compiled for each column from the file's
+header, so reading a row is a single pass through the converters, without trying
+each possible conversion on every field.
+
+column kinds are
+
+* text - text, passed through textfn
+* int, float - number, or if the field isn't a number, text passed through textfn
+* num - int if possible, else float if possible, else text passed through textfn
+* date - datetime, parsed with the schema's dateformat
+* gender - first character of field
+'''
+
+# standard
+import csv
+import datetime
+
+# pypi
+
+# github
+
+# other
+
+# home grown
+from loutilities.csvu import unicode2ascii
+from running import parameterError
+
+#----------------------------------------------------------------------
+def asciitext(text):
+#----------------------------------------------------------------------
+    '''
+    textfn which treats text the way csvu.str2num does
+    '''
+    return unicode2ascii(text).strip()
+
+#----------------------------------------------------------------------
+def _num(text, textfn):
+#----------------------------------------------------------------------
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return textfn(text)
+
+#----------------------------------------------------------------------
+def _numconverter(numtype, textfn):
+#----------------------------------------------------------------------
+    '''
+    return converter which tries numtype first, then falls back to _num
+    '''
+    def convert(text):
+        try:
+            return numtype(text)
+        except ValueError:
+            return _num(text, textfn)
+    return convert
+
+########################################################################
+class ResultSchema():
+########################################################################
+    '''
+    declaration of result file columns
+
+    :param columns: [(header, attr, kind), ...], see module description for kinds
+    :param textfn: function(text) applied to text fields, default leaves them as is
+    :param dateformat: strptime format of date columns
+    '''
+
+    KINDS = ('text', 'int', 'float', 'num', 'date', 'gender')
+
+    #----------------------------------------------------------------------
+    def __init__(self, columns, textfn=None, dateformat='%Y-%m-%d'):
+    #----------------------------------------------------------------------
+        for header, attr, kind in columns:
+            if kind not in self.KINDS:
+                raise parameterError('{}: invalid kind for column {}'.format(kind, header))
+        self.columns = list(columns)
+        self.textfn = textfn or (lambda text: text)
+        self.dateformat = dateformat
+
+    #----------------------------------------------------------------------
+    def _converter(self, kind, dates):
+    #----------------------------------------------------------------------
+        textfn = self.textfn
+        dateformat = self.dateformat
+
+        if kind == 'text':
+            return textfn
+        if kind == 'int':
+            return _numconverter(int, textfn)
+        if kind == 'float':
+            return _numconverter(float, textfn)
+        if kind == 'num':
+            return lambda text: _num(text, textfn)
+        if kind == 'gender':
+            return lambda text: text[:1]
+
+        # the same few dates (birth dates, race dates) appear many times, so parse each once
+        def todate(text):
+            try:
+                return dates[text]
+            except KeyError:
+                dates[text] = datetime.datetime.strptime(text, dateformat)
+                return dates[text]
+        return todate
+
+    #----------------------------------------------------------------------
+    def compile(self, header):
+    #----------------------------------------------------------------------
+        '''
+        compile function which converts a row of a file to record attributes
+
+        :param header: list of column headers in the file
+        :rtype: function(row) returns {attr: value, ...}
+        '''
+        missing = [column[0] for column in self.columns if column[0] not in header]
+        if missing:
+            raise parameterError('missing columns {}'.format(missing))
+
+        # dates parsed while reading this file
+        dates = {}
+        converters = [(header.index(column), attr, self._converter(kind, dates))
+                      for column, attr, kind in self.columns]
+        numfields = len(header)
+
+        def convert(row):
+            # short rows are filled with empty fields, like csv.DictReader does
+            if len(row) < numfields:
+                row = row + [''] * (numfields - len(row))
+            return {attr: converter(row[index]) for index, attr, converter in converters}
+
+        return convert
+
+########################################################################
+class ResultFile():
+########################################################################
+    '''
+    base class for result files, read according to a :class:`ResultSchema`
+
+    subclasses set schema, and resultclass which has an attribute for each attr in
+    schema. Records are created without calling resultclass.__init__, as the schema
+    sets every attribute.
+
+    use as::
+
+        resultfile.open()
+        for result in resultfile:
+            # process result
+        resultfile.close()
+
+    :param filename: name of file
+    '''
+    schema = None
+    resultclass = None
+
+    #----------------------------------------------------------------------
+    def __init__(self, filename):
+    #----------------------------------------------------------------------
+        self.filename = filename
+
+    #----------------------------------------------------------------------
+    def open(self, mode='r'):
+    #----------------------------------------------------------------------
+        '''
+        open result file
+
+        :param mode: 'r' -- TODO: support 'w'
+        '''
+        if mode[0] not in 'r':
+            raise parameterError('mode {} not currently supported'.format(mode))
+
+        self._fh = open(self.filename, mode, newline='')
+        self._csv = csv.reader(self._fh)
+        # empty file has no header, and no rows to convert
+        header = next(self._csv, None)
+        self._convert = self.schema.compile(header) if header else None
+
+    #----------------------------------------------------------------------
+    def close(self):
+    #----------------------------------------------------------------------
+        '''
+        close result file
+        '''
+        if hasattr(self, '_fh'):
+            self._fh.close()
+            delattr(self, '_fh')
+            delattr(self, '_csv')
+            delattr(self, '_convert')
+
+    #----------------------------------------------------------------------
+    def _record(self, row):
+    #----------------------------------------------------------------------
+        record = self.resultclass.__new__(self.resultclass)
+        record.__dict__.update(self._convert(row))
+        return record
+
+    #----------------------------------------------------------------------
+    def __iter__(self):
+    #----------------------------------------------------------------------
+        return self
+
+    #----------------------------------------------------------------------
+    def __next__(self):
+    #----------------------------------------------------------------------
+        '''
+        get next result
+
+        :rtype: instance of resultclass
+        '''
+        # blank lines are skipped, like csv.DictReader does
+        row = next(self._csv)
+        while not row:
+            row = next(self._csv)
+        return self._record(row)
+
+    #----------------------------------------------------------------------
+    def readbatch(self, n):
+    #----------------------------------------------------------------------
+        '''
+        get up to n results
+
+        :param n: maximum number of results to return
+        :rtype: list of resultclass instances, empty at end of file
+        '''
+        record = self._record
+        # range is first so no row is read past n, blank lines are skipped
+        return [record(row) for _, row in zip(range(n), filter(None, self._csv))]
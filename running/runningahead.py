@@ -31,6 +31,7 @@ import pdb
 import os.path
 import logging
 import json
+from datetime import date, timedelta
 from tempfile import NamedTemporaryFile
 
 # pypi
@@ -45,6 +46,7 @@ from oauthlib.oauth2 import BackendApplicationClient
 # home grown
 # from running import *
 from loutilities import apikey
+from running import cassette
 
 class parameterError(Exception): pass
 
@@ -63,8 +65,52 @@ FIELD['workout'] = {
     }
 KMPERMILE = 1.609344
 
+# number of days before last synced date which are retrieved again when syncing the workout cache,
+# to pick up workouts which were logged after the fact
+WORKOUTSYNCOVERLAP = 7
+
+# number of days between full syncs of a user's workout cache. A full sync drops workouts which
+# were deleted in RunningAHEAD, and picks up workouts logged more than WORKOUTSYNCOVERLAP days late
+WORKOUTFULLSYNCDAYS = 28
+
 class accessError(Exception): pass
 
+#----------------------------------------------------------------------
+def _writecachefile(cachefilename, records, suffix):
+#----------------------------------------------------------------------
+    '''
+    write cache records to cachefilename, one json record per line
+
+    the file is written to a temporary file first, then renamed so the update is atomic
+
+    :param cachefilename: name of cache file
+    :param records: iterable of json serializable records
+    :param suffix: suffix for temporary file
+    '''
+    # get full path for cachefilename to assure cachedir isn't relative
+    cachedir = os.path.dirname(os.path.abspath(cachefilename))
+
+    # save temporary file with cache
+    with NamedTemporaryFile(mode='w', suffix=suffix, delete=False, dir=cachedir) as tempcache:
+        tempcachefilename = tempcache.name
+        for record in records:
+            tempcache.write('{}\n'.format(json.dumps(record)))
+
+    # set mode of temp file to be same as current cache file (see https://stackoverflow.com/questions/5337070/how-can-i-get-a-files-permission-mask)
+    if os.path.isfile(cachefilename):
+        cachemode = os.stat(cachefilename).st_mode & 0o777
+        os.chmod(tempcachefilename, cachemode)
+
+    # now overwrite the previous version of the cachefile with the new cachefile
+    try:
+        # atomic operation in Linux
+        os.rename(tempcachefilename, cachefilename)
+
+    # should only happen under windows
+    except OSError:
+        os.remove(cachefilename)
+        os.rename(tempcachefilename, cachefilename)
+
 #----------------------------------------------------------------------
 def dist2miles(distance):
 #----------------------------------------------------------------------
@@ -129,10 +175,11 @@ class RunningAhead():
     :param debug: set to True for debug logging of http requests, default False
     :param key: ra key for oauth, if omitted retrieved from apikey
     :param secret: ra secret for oauth, if omitted retrieved from apikey
+    :param workoutcachefilename: name of optional file to cache workouts for each user
     '''
 
     #----------------------------------------------------------------------
-    def __init__(self, membercachefilename=None, debug=False, key=None, secret=None):
+    def __init__(self, membercachefilename=None, debug=False, key=None, secret=None, workoutcachefilename=None):
     #----------------------------------------------------------------------
         """
         initialize oauth authentication, and load member cache
@@ -170,7 +217,7 @@ class RunningAhead():
         self.client_credentials = data['access_token']
 
         # set up session for multiple requests
-        self.rasession = requests.Session()
+        self.rasession = cassette.session()
 
         # bring in cache file, if requested
         self.membercache = {}
@@ -186,6 +233,24 @@ class RunningAhead():
         # optimization - no write on close if not updated
         self.membercacheupdated = False
 
+        # bring in workout cache file, if requested
+        # self.workoutcache = {token: {'token':token, 'synced':yyyy-mm-dd, 'fullsynced':yyyy-mm-dd, 'workouts':{id:workout, ...}}, ...}
+        self.workoutcache = {}
+        self.workoutcachefilename = workoutcachefilename
+        if self.workoutcachefilename:
+            # only read cache if file exists
+            if os.path.isfile(workoutcachefilename):
+                with open(workoutcachefilename,'r') as workoutcachefile:
+                    # users are stored one per line, in json format
+                    for line in workoutcachefile:
+                        usercache = json.loads(line)
+                        self.workoutcache[usercache['token']] = usercache
+        # optimization - no write on close if not updated
+        self.workoutcacheupdated = False
+
+        # users synced during this session don't need to be synced again
+        self.workoutcachesynced = set()
+
     #----------------------------------------------------------------------
     def close(self):
     #----------------------------------------------------------------------
@@ -195,31 +260,12 @@ class RunningAhead():
         # done here
         self.rasession.close()
 
-        # save the cache in a temporary file, if requested and it's been updated
+        # save the caches, if requested and they've been updated
         if self.membercachefilename and self.membercacheupdated:
-            # get full path for self.membercachefilename to assure cachedir isn't relative
-            cachedir = os.path.dirname(os.path.abspath(self.membercachefilename))
-
-            # save temporary file with cache
-            with NamedTemporaryFile(mode='w', suffix='.racache', delete=False, dir=cachedir) as tempcache:
-                tempmembercachefilename = tempcache.name
-                for id in self.membercache:
-                    tempcache.write('{}\n'.format(json.dumps(self.membercache[id])))
-
-            # set mode of temp file to be same as current cache file (see https://stackoverflow.com/questions/5337070/how-can-i-get-a-files-permission-mask)
-            cachemode = os.stat(self.membercachefilename).st_mode & 0o777
-            os.chmod(tempmembercachefilename, cachemode)
-
-            # now overwrite the previous version of the membercachefile with the new membercachefile
-            try:
-                # atomic operation in Linux
-                os.rename(tempmembercachefilename, self.membercachefilename)
-
-            # should only happen under windows
-            except OSError:
-                os.remove(self.membercachefilename)
-                os.rename(tempmembercachefilename, self.membercachefilename)
+            _writecachefile(self.membercachefilename, iter(self.membercache.values()), '.racache')
 
+        if self.workoutcachefilename and self.workoutcacheupdated:
+            _writecachefile(self.workoutcachefilename, iter(self.workoutcache.values()), '.rawocache')
 
     #----------------------------------------------------------------------
     def listusers(self):
@@ -325,6 +371,79 @@ class RunningAhead():
         
         return workouts  
         
+    #----------------------------------------------------------------------
+    def syncworkouts(self,accesstoken,full=False):
+    #----------------------------------------------------------------------
+        """
+        bring the workout cache for this user up to date
+
+        usually only workouts dated on or after the last synced date (less WORKOUTSYNCOVERLAP
+        days, to pick up workouts logged after the fact) are retrieved from RunningAHEAD. Such
+        an incremental sync can't see workouts which were deleted in RunningAHEAD, or workouts
+        which were logged more than WORKOUTSYNCOVERLAP days after their date.
+
+        so all workouts are retrieved, replacing the cache for this user, the first time, if
+        requested, or if the last full sync was WORKOUTFULLSYNCDAYS or more days ago
+        
+        :param accesstoken: access_token to use for api call
+        :param full: True to retrieve all workouts
+        :rtype: number of workouts retrieved
+        """
+        usercache = self.workoutcache.setdefault(accesstoken, {'token':accesstoken, 'synced':None, 'fullsynced':None, 'workouts':{}})
+        today = date.today()
+
+        # caches written before full syncs were tracked have no fullsynced date, so get a full sync
+        fullsynced = usercache.get('fullsynced')
+        if not fullsynced or (today - date(*[int(f) for f in fullsynced.split('-')])).days >= WORKOUTFULLSYNCDAYS:
+            full = True
+
+        begindate = None
+        if not full:
+            lastsynced = date(*[int(f) for f in usercache['synced'].split('-')])
+            begindate = (lastsynced - timedelta(WORKOUTSYNCOVERLAP)).isoformat()
+
+        # workout id is used as the key, so workouts retrieved again replace the cached version
+        # full sync starts over, to drop workouts deleted in RunningAHEAD
+        workouts = self.listworkouts(accesstoken,begindate=begindate,getfields=list(FIELD['workout'].keys()))
+        if full:
+            usercache['workouts'] = {}
+            usercache['fullsynced'] = today.isoformat()
+        for workout in workouts:
+            usercache['workouts'][str(workout['id'])] = workout
+
+        usercache['synced'] = today.isoformat()
+        self.workoutcacheupdated = True
+        self.workoutcachesynced.add(accesstoken)
+
+        return len(workouts)
+
+    #----------------------------------------------------------------------
+    def listcachedworkouts(self,accesstoken,begindate=None,enddate=None):
+    #----------------------------------------------------------------------
+        """
+        return run workouts within date range from the workout cache, syncing the
+        cache for this user first if that hasn't been done yet in this session
+
+        all fields in runningahead.FIELD['workout'] are available in the returned workouts
+        
+        :param accesstoken: access_token to use for api call
+        :param begindate: date in format yyyy-mm-dd
+        :param enddate: date in format yyyy-mm-dd
+        :rtype: list of workouts, sorted by date
+        """
+        if accesstoken not in self.workoutcachesynced:
+            self.syncworkouts(accesstoken)
+
+        # dates are yyyy-mm-dd so string comparison works
+        workouts = []
+        for workout in self.workoutcache[accesstoken]['workouts'].values():
+            if begindate and workout['date'] < begindate: continue
+            if enddate and workout['date'] > enddate: continue
+            workouts.append(workout)
+
+        workouts.sort(key=lambda wo: wo['date'])
+        return workouts
+
     #----------------------------------------------------------------------
     def getworkout(self,accesstoken,id):
     #----------------------------------------------------------------------
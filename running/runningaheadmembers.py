@@ -24,13 +24,16 @@
 
 # standard
 import csv
+import io
 from datetime import datetime
-import difflib
+from sys import intern
 
 # home grown
 from loutilities import timeu
 ymd = timeu.asctime('%Y-%m-%d')
 from loutilities.csvwt import wlist
+from .trigramindex import TrigramIndex
+from .membershipintervals import removeoverlaps
 
 class unsupportedFileType(): pass
 
@@ -73,6 +76,24 @@ class RunningAheadMember():
 
 
 
+########################################################################
+class _MembershipRecord():
+########################################################################
+    '''
+    Compact storage for a single membership record from RunningAHEAD export file
+
+    :param row: tuple of field values, in RunningAheadMembers.filefields order
+    :param join: join date, may be adjusted later to remove overlaps
+    '''
+    __slots__ = ('row','join','tossed')
+
+    #----------------------------------------------------------------------
+    def __init__(self,row,join):
+    #----------------------------------------------------------------------
+        self.row = row
+        self.join = join
+        self.tossed = ''
+
 ########################################################################
 class RunningAheadMembers():
 ########################################################################
@@ -95,6 +116,9 @@ class RunningAheadMembers():
         self.closematches = None
         self.names = {}
         self.dobnames = {}
+        self.normnames = {}
+        self.nameindex = TrigramIndex()
+        self.dobdays = {}
 
         # check for type of memberfile, assume not opened here
         openedhere = False
@@ -105,7 +129,7 @@ class RunningAheadMembers():
             openedhere = True
 
         # if file, remember handle
-        elif isinstance(memberfile, file):
+        elif isinstance(memberfile, io.IOBase):
             memberfileh = memberfile
 
         # if list, it works like a handle
@@ -116,24 +140,32 @@ class RunningAheadMembers():
         else:
             raise unsupportedFileType
 
-        # input is csv file
-        INCSV = csv.DictReader(memberfileh)
-        
+        # input is csv file, header is kept once and shared by all the records
+        INCSV = csv.reader(memberfileh)
+        self.filefields = [intern(field) for field in next(INCSV)]
+        self.fieldindex = {field:i for i,field in enumerate(self.filefields)}
+        JOINDATE = self.fieldindex['JoinDate']
+        EXPIRATIONDATE = self.fieldindex['ExpirationDate']
+        GIVENNAME = self.fieldindex['GivenName']
+        FAMILYNAME = self.fieldindex['FamilyName']
+        DOB = self.fieldindex['DOB']
+        numfields = len(self.filefields)
+
         ## preprocess file to remove overlaps between join date and expiration date across records
         # each member's records are appended to a list of records in dict keyed by (lname,fname,dob)
-        for membership in INCSV:
-            asc_joindate = membership['JoinDate']
-            asc_expdate = membership['ExpirationDate']
-            fname = membership['GivenName']
-            lname = membership['FamilyName']
-            dob = membership['DOB']
-            memberid = membership['MemberID']
-            fullname = '{}, {}'.format(lname,fname)
-
-            # get list of records associated with each member, pulling out significant fields
-            thisrec = {'MemberID':memberid,'name':fullname,'join':asc_joindate,'expiration':asc_expdate,'dob':dob,'fullrec':membership,'RunningAheadMember':RunningAheadMember(membership)}
+        for row in INCSV:
+            # skip blank lines, as csv.DictReader would
+            if not row: continue
+
+            # many values repeat across records (dates, names, membership types), so intern them
+            if len(row) < numfields:
+                row += [''] * (numfields - len(row))
+            row = tuple(intern(value) for value in row[:numfields])
+
+            # RunningAheadMember object and raw dict are created from this when needed
+            thisrec = _MembershipRecord(row, row[JOINDATE])
             # careful - this tuple order is assumed in several places
-            thisname = (lname,fname,dob)
+            thisname = (row[FAMILYNAME],row[GIVENNAME],row[DOB])
             if not thisname in self.names:
                 self.names[thisname] = []
             self.names[thisname].append(thisrec)
@@ -144,50 +176,46 @@ class RunningAheadMembers():
             OVRLP = csv.DictWriter(_OVRLP,['MemberID','name','dob','renewal','join','expiration','tossed'],extrasaction='ignore')
             OVRLP.writeheader()
 
+        # helpers for overlap removal
+        def nextjan1(lastexp):
+            return ymd.dt2asc(datetime(ymd.asc2dt(lastexp).year+1,1,1))
+
+        def setjoin(membership, join):
+            membership.join = join
+
+        def logoverlap(lastmembership, membership, join, tossed):
+            if tossed:
+                membership.tossed = 'Y'
+
+            # debug
+            if overlapfile:
+                OVRLP.writerow(self._overlaprow(lastmembership))    # this could get written multiple times, I suppose
+                OVRLP.writerow(self._overlaprow(membership))
+
         # sort list of records under each name, and remove overlaps between records
         # create dobnames access from self.names
-        # self.dobnames allows access to self.names -- self.dobnames[dob] can be used to find key for self.names[lname,fname,dob]
+        # self.dobnames allows access to self.names -- self.dobnames[dob] is set of keys for self.names[lname,fname,dob]
         for thisname in self.names:
             # self.dobnames allows access to self.names key based on dob
             lname,fname,dob = thisname
-            if dob not in self.dobnames:
-                self.dobnames[dob] = []
-            if (lname,fname) not in self.dobnames[dob]:
-                self.dobnames[dob].append({'lname':lname,'fname':fname})
-
-            # sort should result so records within a name are by join date within expiration year
-            # see http://stackoverflow.com/questions/72899/how-do-i-sort-a-list-of-dictionaries-by-values-of-the-dictionary-in-python
-            self.names[thisname] = sorted(self.names[thisname],key=lambda k: (k['expiration'],k['join']))
-            toss = []
-            for i in range(1,len(self.names[thisname])):
-                # if overlapped record detected, push this record's join date after last record's expiration
-                # note this only works for overlaps across two records -- if overlaps occur across three or more records that isn't detected
-                # this seems ok as only two record problems have been seen so far
-                if self.names[thisname][i]['join'] <= self.names[thisname][i-1]['expiration']:
-                    lastexp_dt = ymd.asc2dt(self.names[thisname][i-1]['expiration'])
-                    thisexp_dt = ymd.asc2dt(self.names[thisname][i]['expiration'])
-                    jan1_dt = datetime(lastexp_dt.year+1,1,1)
-                    jan1_asc = ymd.dt2asc(jan1_dt)
-            
-                    # ignore weird record anomalies where this record duration is fully within last record's
-                    if jan1_dt > thisexp_dt:
-                        toss.append(i)
-                        self.names[thisname][i]['tossed'] = 'Y'
-            
-                    # debug
-                    if overlapfile:
-                        OVRLP.writerow(self.names[thisname][i-1])    # this could get written multiple times, I suppose
-                        OVRLP.writerow(self.names[thisname][i])
-            
-                    # update this record's join dates
-                    self.names[thisname][i]['join'] = jan1_asc
-                    self.names[thisname][i]['fullrec']['JoinDate'] = jan1_asc
-                    self.names[thisname][i]['RunningAheadMember'].join = jan1_asc
-            
-            # throw out anomalous records. reverse toss first so the pops don't change the indexes.
-            toss.reverse()
-            for i in toss:
-                self.names[thisname].pop(i)
+            self.dobnames.setdefault(dob,set()).add(thisname)
+
+            # self.normnames allows access to self.names key based on normalized name
+            self.normnames.setdefault(self._normname(lname,fname),set()).add(thisname)
+
+            # self.nameindex allows fuzzy access to self.names key based on name
+            self.nameindex.add('{} {}'.format(fname,lname),thisname)
+
+            # sort records within a name by expiration date, then push join dates of records
+            # overlapping earlier records to after the earlier expiration year
+            # ignore weird record anomalies where record duration is fully within earlier records
+            self.names[thisname] = removeoverlaps(self.names[thisname],
+                                                  getstart=lambda k: k.join,
+                                                  getend=lambda k: k.row[EXPIRATIONDATE],
+                                                  newstart=nextjan1,
+                                                  setstart=setjoin,
+                                                  toss=True,
+                                                  onoverlap=logoverlap)
 
         # close the debug file if present
         if overlapfile:
@@ -209,9 +237,9 @@ class RunningAheadMembers():
         for thisname in self.names:
             for thismembership in self.names[thisname]:
                 if not raw:
-                    yield thismembership['RunningAheadMember']
+                    yield self._member(thismembership)
                 else:
-                    yield thismembership['fullrec']
+                    yield self._fullrec(thismembership)
 
     #----------------------------------------------------------------------
     def member_iter(self,raw=False):
@@ -225,13 +253,9 @@ class RunningAheadMembers():
         '''
         for thisname in self.names:
             if not raw:
-                thismembership = self.names[thisname][-1]['RunningAheadMember']
-                thismembership.join = self.names[thisname][0]['join']
-                yield thismembership
+                yield self._member(self.names[thisname][-1], join=self.names[thisname][0].join)
             else:
-                thismembership = self.names[thisname][-1]['fullrec']
-                thismembership['JoinDate'] = self.names[thisname][0]['join']
-                yield thismembership
+                yield self._fullrec(self.names[thisname][-1], join=self.names[thisname][0].join)
 
     #----------------------------------------------------------------------
     def getmember(self, memberkey):
@@ -244,9 +268,7 @@ class RunningAheadMembers():
         :rtype: RunningAheadMember object
         '''
 
-        thismembership = self.names[memberkey][-1]['RunningAheadMember']
-        thismembership.join = self.names[memberkey][0]['join']
-        return thismembership
+        return self._member(self.names[memberkey][-1], join=self.names[memberkey][0].join)
 
     #----------------------------------------------------------------------
     def getmemberships(self, memberkey):
@@ -260,50 +282,137 @@ class RunningAheadMembers():
 
         thesememberships = []
         for thismembership in self.names[memberkey]:
-            thesememberships.append(thismembership['RunningAheadMember'])
+            thesememberships.append(self._member(thismembership))
         return thesememberships
 
     #----------------------------------------------------------------------
-    def getmemberkey(self, lname, fname, dob, cutoff=0.6, n=10):
+    def _fullrec(self, membership, join=None):
+    #----------------------------------------------------------------------
+        '''
+        create raw dict for membership, as read from the export file
+
+        :param membership: _MembershipRecord
+        :param join: JoinDate to use, default is membership's (possibly adjusted) join date
+        :rtype: {field: value, ...}
+        '''
+        fullrec = dict(zip(self.filefields, membership.row))
+        fullrec['JoinDate'] = join or membership.join
+        return fullrec
+
+    #----------------------------------------------------------------------
+    def _member(self, membership, join=None):
+    #----------------------------------------------------------------------
+        '''
+        create RunningAheadMember object for membership
+
+        :param membership: _MembershipRecord
+        :param join: JoinDate to use, default is membership's (possibly adjusted) join date
+        :rtype: RunningAheadMember object
+        '''
+        return RunningAheadMember(self._fullrec(membership, join=join))
+
+    #----------------------------------------------------------------------
+    def _overlaprow(self, membership):
+    #----------------------------------------------------------------------
+        '''
+        create overlap debug file row for membership
+
+        :param membership: _MembershipRecord
+        :rtype: dict for overlap file csv.DictWriter
+        '''
+        row = membership.row
+        return {
+            'MemberID': row[self.fieldindex['MemberID']],
+            'name': '{}, {}'.format(row[self.fieldindex['FamilyName']],row[self.fieldindex['GivenName']]),
+            'dob': row[self.fieldindex['DOB']],
+            'join': membership.join,
+            'expiration': row[self.fieldindex['ExpirationDate']],
+            'tossed': membership.tossed,
+        }
+
+    #----------------------------------------------------------------------
+    def getmemberkey(self, lname, fname, dob, cutoff=0.6, n=10, dobtolerance=0):
     #----------------------------------------------------------------------
         '''
         retrieve member key based on name, dob
 
         if name wasn't found, None is returned
-        if None is returned, check close matches using getclosematches()
+        if None is returned, check close matches using getclosematchkeys()
+
+        closeness is determined by the fraction of name trigrams in common, see
+        :class:`trigramindex.TrigramIndex`
         
         :param lname: last name
         :param fname: first name
         :param dob: date of birth yyyy-mm-dd
         :param cutoff: float in range (0,1] ratio of closeness to match name
-        :param n: number of names checked for closeness (most similar)
+        :param n: maximum number of close matches to collect (most similar)
+        :param dobtolerance: number of days dob of close matches may differ from dob, None means any dob
         :rtype: (lname,fname,dob) or None if not found
         '''
         # no matches missed yet
         self.closematches = []
 
-        # check dob
-        if dob not in self.dobnames:
-            return None
-
-        # make list of members with this dob
-        nameskeys = [('{} {}'.format(n['fname'],n['lname']).lower(),n) for n in self.dobnames[dob]]
-        possiblenames = [nk[0] for nk in nameskeys]
-        possiblekeys  = [(nk[1]['lname'],nk[1]['fname'],dob) for nk in nameskeys]
+        # check for exact match
+        searchname = self._normname(lname,fname)
+        exactkeys = self.normnames.get(searchname, set()) & self.dobnames.get(dob, set())
+        if exactkeys:
+            # names differing only in case or spacing are rare, but pick the same one every time
+            return min(exactkeys)
+
+        # only consider names with a dob close enough to the requested dob
+        candidates = None
+        keyfilter = None
+        if dobtolerance == 0:
+            # nothing to match if no one has this dob, else only compare names with this dob
+            if dob not in self.dobnames:
+                return None
+            candidates = self.dobnames[dob]
+
+        # any dob is ok if dobtolerance is None
+        elif dobtolerance is not None:
+            searchdays = self._dobdays(dob)
+            if searchdays is None:
+                return None
+            def keyfilter(key):
+                keydays = self._dobdays(key[2])
+                return keydays is not None and abs(keydays - searchdays) <= dobtolerance
 
         # make list of close matches
-        searchname = '{} {}'.format(fname,lname).lower()
-        closematches = difflib.get_close_matches(searchname,possiblenames,n=10,cutoff=cutoff)
-        for match in closematches:
-            # this should be first time through loop, so self.closematches will be empty list
-            if match == searchname:
-                return possiblekeys[possiblenames.index(match)]
-            else:
-                self.closematches.append(possiblekeys[possiblenames.index(match)])
+        for similarity,key in self.nameindex.search(searchname,cutoff=cutoff,n=n,keyfilter=keyfilter,candidates=candidates):
+            self.closematches.append(key)
 
         # didn't find exact match
         return None
 
+    #----------------------------------------------------------------------
+    def _normname(self, lname, fname):
+    #----------------------------------------------------------------------
+        '''
+        normalize name for exact matching
+
+        :param lname: last name
+        :param fname: first name
+        :rtype: 'fname lname' lower cased, with whitespace collapsed
+        '''
+        return ' '.join('{} {}'.format(fname,lname).lower().split())
+
+    #----------------------------------------------------------------------
+    def _dobdays(self, dob):
+    #----------------------------------------------------------------------
+        '''
+        convert dob to days, remembering conversions already done
+
+        :param dob: date of birth yyyy-mm-dd
+        :rtype: day number, or None if dob couldn't be interpreted
+        '''
+        if dob not in self.dobdays:
+            try:
+                self.dobdays[dob] = ymd.asc2dt(dob).toordinal()
+            except ValueError:
+                self.dobdays[dob] = None
+        return self.dobdays[dob]
+
 
     #----------------------------------------------------------------------
     def getclosematchkeys(self):
@@ -24,9 +24,12 @@
 
 # standard
 import csv
+import io
 
 # home grown
 
+class unsupportedFileType(Exception): pass
+
 ########################################################################
 class RunningAheadParticipant():
 ########################################################################
@@ -77,6 +80,9 @@ class RunningAheadParticipants():
 
     Provide access functions to gain access to these registration records.
 
+    Registrations are indexed by status and by dob when loaded. A newer export
+    can be applied using :meth:`reload`.
+
     :param participantfile: participant filename, filehandle or string of file records
     :param overlapfile: debug file to test for overlaps between records
     '''
@@ -85,6 +91,26 @@ class RunningAheadParticipants():
     def __init__(self,participantfile,overlapfile=None):
     #----------------------------------------------------------------------
 
+        # {(lname,fname,dob): registration record, ...}
+        self.registrations = {}
+
+        # indexes into self.registrations, {status: {(lname,fname,dob): None, ...}, ...}, and same for dob
+        # inner dicts are used as sets which remember the order registrations were added
+        self.statuses = {}
+        self.dobs = {}
+
+        for thisname, thisrec in self._readfile(participantfile).items():
+            self._add(thisname, thisrec)
+
+    #----------------------------------------------------------------------
+    def _readfile(self, participantfile):
+    #----------------------------------------------------------------------
+        '''
+        read registrations from participant file
+
+        :param participantfile: participant filename, filehandle or list of file records
+        :rtype: {(lname,fname,dob): registration record, ...}
+        '''
         # check for type of participantfile, assume not opened here
         openedhere = False
 
@@ -93,8 +119,8 @@ class RunningAheadParticipants():
             participantfileh = open(participantfile, 'r', newline='')
             openedhere = True
 
-        # if file, reparticipant handle
-        elif isinstance(participantfile, file):
+        # if file, remember handle
+        elif isinstance(participantfile, io.IOBase):
             participantfileh = participantfile
 
         # if list, it works like a handle
@@ -103,13 +129,13 @@ class RunningAheadParticipants():
 
         # otherwise, not handled
         else:
-            raise unsupportedFileType
+            raise unsupportedFileType('participantfile must be filename, file handle or list')
 
         # input is csv file
         INCSV = csv.DictReader(participantfileh)
         
         # pull in each record in the file
-        self.registrations = {}
+        registrations = {}
         for registration in INCSV:
             thisparticipant = RunningAheadParticipant(registration)
             lname = thisparticipant.lname
@@ -119,7 +145,72 @@ class RunningAheadParticipants():
             # get list of records associated with each participant, pulling out significant fields
             thisrec = {'lname':lname,'fname':fname,'dob':dob,'fullrec':registration,'RunningAheadParticipant':thisparticipant}
             thisname = (thisparticipant.lname,thisparticipant.fname,thisparticipant.dob)
-            self.registrations[thisname] = thisrec
+            registrations[thisname] = thisrec
+
+        # close the file if opened here
+        if openedhere:
+            participantfileh.close()
+
+        return registrations
+
+    #----------------------------------------------------------------------
+    def _add(self, thisname, thisrec):
+    #----------------------------------------------------------------------
+        '''
+        add or replace registration, updating indexes
+
+        :param thisname: (lname,fname,dob)
+        :param thisrec: registration record
+        '''
+        if thisname in self.registrations:
+            self._remove(thisname)
+        self.registrations[thisname] = thisrec
+        self.statuses.setdefault(thisrec['RunningAheadParticipant'].status, {})[thisname] = None
+        self.dobs.setdefault(thisrec['dob'], {})[thisname] = None
+
+    #----------------------------------------------------------------------
+    def _remove(self, thisname):
+    #----------------------------------------------------------------------
+        '''
+        remove registration, updating indexes
+
+        :param thisname: (lname,fname,dob)
+        '''
+        thisrec = self.registrations.pop(thisname)
+        status = thisrec['RunningAheadParticipant'].status
+        del self.statuses[status][thisname]
+        if not self.statuses[status]:
+            del self.statuses[status]
+        del self.dobs[thisrec['dob']][thisname]
+        if not self.dobs[thisrec['dob']]:
+            del self.dobs[thisrec['dob']]
+
+    #----------------------------------------------------------------------
+    def reload(self, participantfile):
+    #----------------------------------------------------------------------
+        '''
+        apply a newer export file, updating only the registrations which changed
+
+        :param participantfile: participant filename, filehandle or list of file records
+        :rtype: {'added': [(lname,fname,dob), ...], 'changed': [...], 'removed': [...]}
+        '''
+        newregistrations = self._readfile(participantfile)
+        delta = {'added': [], 'changed': [], 'removed': []}
+
+        for thisname in list(self.registrations):
+            if thisname not in newregistrations:
+                self._remove(thisname)
+                delta['removed'].append(thisname)
+
+        for thisname, thisrec in newregistrations.items():
+            if thisname not in self.registrations:
+                self._add(thisname, thisrec)
+                delta['added'].append(thisname)
+            elif thisrec['fullrec'] != self.registrations[thisname]['fullrec']:
+                self._add(thisname, thisrec)
+                delta['changed'].append(thisname)
+
+        return delta
 
     #----------------------------------------------------------------------
     def allregistrations_iter(self):
@@ -136,7 +227,19 @@ class RunningAheadParticipants():
         '''
         generator function that yields full record for each registrations
         '''
-        for thisregistration in self.registrations:
-            if self.registrations[thisregistration]['RunningAheadParticipant'].status == 'Registered':
-                yield self.registrations[thisregistration]['RunningAheadParticipant']
+        for thisregistration in self.statuses.get('Registered', {}):
+            yield self.registrations[thisregistration]['RunningAheadParticipant']
 
+    #----------------------------------------------------------------------
+    def dobregistrations_iter(self, dob, status=None):
+    #----------------------------------------------------------------------
+        '''
+        generator function that yields full record for each registration with dob
+
+        :param dob: date of birth, as in export file
+        :param status: optional status registrations must have, e.g., 'Registered'
+        '''
+        for thisregistration in self.dobs.get(dob, {}):
+            thisparticipant = self.registrations[thisregistration]['RunningAheadParticipant']
+            if status is None or thisparticipant.status == status:
+                yield thisparticipant
@@ -26,7 +26,7 @@ runningaheadresults - manage race results data from runningahead
 ===================================================================
 
 Usage::
-    runningaheadresults.py [-h] [-v] [-b BEGINDATE] [-e ENDDATE]
+    runningaheadresults.py [-h] [-v] [-b BEGINDATE] [-e ENDDATE] [-c WORKOUTCACHE]
                                      searchfile outfile
     
         collect race results from runningahead
@@ -53,6 +53,9 @@ Usage::
                             choose races between begindate and enddate, yyyy-mm-dd
       -e ENDDATE, --enddate ENDDATE
                             choose races between begindate and enddate, yyyy-mm-dd
+      -c WORKOUTCACHE, --workoutcache WORKOUTCACHE
+                            file to cache workouts, so only new workouts are
+                            retrieved from runningahead
                         
 '''
 
@@ -80,6 +83,7 @@ from runningclub import agegrade
 from runningclub import render
 from .runningahead import FIELD
 from running.running import version, runningahead
+from running import resultfile
 
 ag = agegrade.AgeGrade()
 class invalidParameter(Exception): pass
@@ -88,7 +92,7 @@ fdate = timeu.asctime('%Y-%m-%d')
 METERSPERMILE = 1609.344
 
 #----------------------------------------------------------------------
-def collect(searchfile,outfile,begindate,enddate):
+def collect(searchfile,outfile,begindate,enddate,workoutcachefilename=None):
 #----------------------------------------------------------------------
     '''
     collect race results from runningahead
@@ -97,6 +101,7 @@ def collect(searchfile,outfile,begindate,enddate):
     :param outfile: output file path
     :param begindate: epoch time - choose races between begindate and enddate
     :param enddate: epoch time - choose races between begindate and enddate
+    :param workoutcachefilename: optional file to cache workouts, so only new workouts are retrieved from runningahead
     '''
     
     outfilehdr = 'GivenName,FamilyName,name,DOB,Gender,race,date,age,miles,km,time'.split(',')
@@ -112,7 +117,7 @@ def collect(searchfile,outfile,begindate,enddate):
     commonfields = 'GivenName,FamilyName,DOB,Gender'.split(',')
 
     # create runningahead access, grab users who have used the steeplechasers.org portal to RA
-    ra = runningahead.RunningAhead()
+    ra = runningahead.RunningAhead(workoutcachefilename=workoutcachefilename)
     users = ra.listusers()
     rausers = []
     for user in users:
@@ -164,7 +169,10 @@ def collect(searchfile,outfile,begindate,enddate):
         #if todayage < 14: continue
         
         # if we're here, found the right user, now let's look at the workouts
-        workouts = ra.listworkouts(user['token'],begindate=a_begindate,enddate=a_enddate,getfields=list(FIELD['workout'].keys()))
+        if workoutcachefilename:
+            workouts = ra.listcachedworkouts(user['token'],begindate=a_begindate,enddate=a_enddate)
+        else:
+            workouts = ra.listworkouts(user['token'],begindate=a_begindate,enddate=a_enddate,getfields=list(FIELD['workout'].keys()))
 
         # save race workouts, if any found
         results = []
@@ -207,6 +215,9 @@ def collect(searchfile,outfile,begindate,enddate):
         
     _OUT.close()
     _IN.close()
+
+    # saves the workout cache, if requested
+    ra.close()
     
     finish = time.time()
     print('elapsed time (min) = {}'.format((finish-start)/60))
@@ -273,7 +284,7 @@ class RunningAheadFileResult():
             setattr(self,attr,val)
 
 ########################################################################
-class RunningAheadResultFile():
+class RunningAheadResultFile(resultfile.ResultFile):
 ########################################################################
     '''
     represents file of runningahead results collected from runningahead
@@ -284,73 +295,10 @@ class RunningAheadResultFile():
     # RunningAheadResultFile.filehdr needs to associate 1:1 with RunningAheadFileResult.attrs
     hdrtransform = dict(list(zip(filehdr,RunningAheadFileResult.attrs)))
 
-    resultdates = 'dob,date'.split(',')
+    filekinds = 'text,text,text,date,gender,text,date,int,float,float,text'.split(',')
+    schema = resultfile.ResultSchema(list(zip(filehdr,RunningAheadFileResult.attrs,filekinds)),textfn=resultfile.asciitext)
+    resultclass = RunningAheadFileResult
 
-    #----------------------------------------------------------------------
-    def __init__(self,filename):
-    #----------------------------------------------------------------------
-        self.filename = filename
-        
-    #----------------------------------------------------------------------
-    def open(self,mode='r'):
-    #----------------------------------------------------------------------
-        '''
-        open runningahead result file
-        
-        :param mode: 'r' or 'w' -- TODO: support 'w'
-        '''
-        if mode[0] not in 'r':
-            raise invalidParameter('mode {} not currently supported'.format(mode))
-    
-        self._fh = open(self.filename,mode,newline='')
-        if mode[0] == 'r':
-            self._csv = csv.DictReader(self._fh)
-        else:
-            pass
-        
-    #----------------------------------------------------------------------
-    def close(self):
-    #----------------------------------------------------------------------
-        '''
-        close runningahead result file
-        '''
-        if hasattr(self,'_fh'):
-            self._fh.close()
-            delattr(self,'_fh')
-            delattr(self,'_csv')
-        
-    #----------------------------------------------------------------------
-    def __next__(self):
-    #----------------------------------------------------------------------
-        '''
-        get next :class:`RunningAheadFileResult`
-        
-        :rtype: :class:`RunningAheadFileResult`, or None when end of file reached
-        '''
-        try:
-            fresult = next(self._csv)
-            
-        except StopIteration:
-            return None
-        
-        aresultargs = {}
-        for fattr in self.hdrtransform:
-            aattr = self.hdrtransform[fattr]
-            
-            # special handling for gender
-            if aattr == 'gender':
-                aresultargs[aattr] = fresult[fattr][0]
-                
-            # special handling for dates
-            elif aattr in self.resultdates:
-                aresultargs[aattr] = fdate.asc2dt(fresult[fattr])
-                
-            else:
-                # convert numbers
-                aresultargs[aattr] = csvu.str2num(fresult[fattr])
-                
-        return RunningAheadFileResult(**aresultargs)
-    
 #----------------------------------------------------------------------
 def main(): 
 #----------------------------------------------------------------------
@@ -373,6 +321,7 @@ def main():
     parser.add_argument('outfile', help="output file contains race results")
     parser.add_argument('-b','--begindate', help="choose races between begindate and enddate, yyyy-mm-dd",default=None)
     parser.add_argument('-e','--enddate', help="choose races between begindate and enddate, yyyy-mm-dd",default=None)
+    parser.add_argument('-c','--workoutcache', help="file to cache workouts, so only new workouts are retrieved from runningahead",default=None)
     args = parser.parse_args()
 
     searchfile = args.searchfile
@@ -389,7 +338,7 @@ def main():
         enddate = argtime.asc2epoch('2030-12-31')
         
     # collect all the data
-    collect(searchfile,outfile,begindate,enddate)
+    collect(searchfile,outfile,begindate,enddate,workoutcachefilename=args.workoutcache)
         
 ########################################################################
 #	__main__
@@ -25,6 +25,8 @@ from loutilities.timeu import asctime
 from loutilities.transform import Transform
 from loutilities.csvwt import record2csv
 from loutilities.nicknames import NameDenormalizer
+from .membershipintervals import removeoverlaps
+from . import cassette
 names = NameDenormalizer()
 
 # use api.runsignup.com per https://info.runsignup.com/2025/08/06/upgrading-our-api-infrastructure-for-ai-api-runsignup-com/
@@ -110,7 +112,7 @@ class RunSignupBase():
     def open(self):
 
         # set up session for multiple requests
-        self.session = requests.Session()
+        self.session = cassette.session()
 
         # per https://info.runsignup.com/2026/07/17/new-api-registration-requirements/, registration
         # secret is sent as a header, applies regardless of credentials_type
@@ -446,43 +448,34 @@ def updatemembercache(club_id, membercachefilename, key=None, secret=None,
         return memberkey
 
     # add record to cache, return key
+    # overlaps are removed by normalizemembers() once all records are added
     def add2cache(memberrec):
         memberkey = getmemberkey(memberrec)
-        members.setdefault(memberkey,[])
-
-        # replace any records having same expiration date
-        recordlist = [mr for mr in members[memberkey] if mr['ExpirationDate'] != memberrec['ExpirationDate']] + [memberrec]
-        members[memberkey] = recordlist
-
-        # keep list sorted
-        sortby = 'ExpirationDate'
-        members[memberkey].sort(key=lambda item: item[sortby])
-
-        # remove any overlaps
-        for i in range(1, len(members[memberkey])):
-            lastrec = members[memberkey][i-1]
-            thisrec = members[memberkey][i]
-            # if there's an overlap, change join date to expiration date + 1 day
-            if thisrec['JoinDate'] <= lastrec['ExpirationDate']:
-                exp = thisrec['ExpirationDate']
-                oldstart = thisrec['JoinDate']
-                newstart = dt.dt2asc( dt.asc2dt(lastrec['ExpirationDate']) + timedelta(1) )
-                thislogger.error('overlap detected: {} end={} was start={} now start={}'.format(memberkey, exp, oldstart, newstart))
-                thisrec['JoinDate'] = newstart
+
+        # replace any record having same expiration date
+        members.setdefault(memberkey,{})[memberrec['ExpirationDate']] = memberrec
 
         return memberkey
 
     # test if in cache
     def incache(memberrec):
         memberkey = getmemberkey(memberrec)
-        if memberkey not in members:
-            cachedmember = False
-        elif memberrec['ExpirationDate'] in [m['ExpirationDate'] for m in members[memberkey]]:
-            cachedmember = True
-        else:
-            cachedmember = False
-
-        return cachedmember
+        return memberkey in members and memberrec['ExpirationDate'] in members[memberkey]
+
+    # sort each member's records by expiration date, removing any overlaps
+    # if there's an overlap, change join date to expiration date + 1 day
+    def normalizemembers():
+        for memberkey in members:
+            def logoverlap(lastrec, thisrec, newstart, tossed):
+                thislogger.error('overlap detected: {} end={} was start={} now start={}'.format(
+                    memberkey, thisrec['ExpirationDate'], thisrec['JoinDate'], newstart))
+
+            members[memberkey] = removeoverlaps(members[memberkey].values(),
+                                                getstart=lambda mr: mr['JoinDate'],
+                                                getend=lambda mr: mr['ExpirationDate'],
+                                                newstart=lambda lastexp: dt.dt2asc(dt.asc2dt(lastexp) + timedelta(1)),
+                                                setstart=lambda mr, start: mr.update(JoinDate=start),
+                                                onoverlap=logoverlap)
 
     # lock cache update during execution
     rlock = RLock()
@@ -492,7 +485,8 @@ def updatemembercache(club_id, membercachefilename, key=None, secret=None,
 
         # import current cache
         # records in cache are organized in members dict with 'last,first,dob' key
-        # within is list of memberships ordered by expiration date
+        # within is dict of memberships keyed by expiration date, which normalizemembers()
+        # turns into list of memberships ordered by expiration date
         with open(membercachefilename, newline='') as memfile:
             # members maintains the current cache through this processing
             # currmemberrecs maintains the records for current members as of today
@@ -540,9 +534,12 @@ def updatemembercache(club_id, membercachefilename, key=None, secret=None,
         for memberkey in currmemberrecs:
             removedrec = currmemberrecs[memberkey]
             memberkey = getmemberkey(removedrec)
-            members[memberkey] = [mr for mr in members[memberkey] if mr != removedrec]
+            members[memberkey] = {exp: mr for exp, mr in members[memberkey].items() if mr != removedrec}
             thislogger.debug('membership removed from cache: {}'.format(removedrec))
 
+        # now that all the records are known, get them in order without overlaps
+        normalizemembers()
+
         # recreate cache file
         # start with temporary file
         # sort members keys for ease of debugging
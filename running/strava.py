@@ -49,6 +49,8 @@ from loutilities import apikey
 from loutilities import timeu
 from loutilities.csvwt import record2csv
 from loutilities.csvu import unicode2ascii
+from running import stravaquota
+from running import cassette
 
 stravatime = timeu.asctime('%Y-%m-%dT%H:%M:%SZ')
 
@@ -56,6 +58,12 @@ KMPERMILE = 1.609344
 
 DATEFIELD = 'start_date'
 
+# rewrite club activity cache to remove duplicates weekly
+CACHECOMPACTINTERVAL = 7*24*60*60
+
+# number of times to retry request after 429 Too Many Requests
+MAXRATERETRIES = 3
+
 # from https://strava.github.io/api/v3/activities/
 xworkout_type = {
     None : 'default',
@@ -67,7 +75,7 @@ xworkout_type = {
     11   : 'race',
     12   : 'workout',
 }
-workout_type = defaultdict(lambda: 'unknown',**xworkout_type)
+workout_type = defaultdict(lambda: 'unknown',xworkout_type)
 
 #----------------------------------------------------------------------
 def dist2miles(distance):
@@ -84,17 +92,43 @@ def dist2miles(distance):
     
     return distmiles
 
+#----------------------------------------------------------------------
+def _replacefile(tempfilename, filename):
+#----------------------------------------------------------------------
+    '''
+    overwrite filename with tempfilename
+
+    :param tempfilename: name of new version of file
+    :param filename: name of file to be replaced
+    '''
+    try:
+        # atomic operation in Linux
+        os.rename(tempfilename, filename)
+
+    # should only happen under windows
+    except OSError:
+        os.remove(filename)
+        os.rename(tempfilename, filename)
+
 ########################################################################
 class Strava():
 ########################################################################
     '''
     access methods for Strava.com
 
-    :param cachefilename: name of cache file
+    new activities are appended to the club activity cache file, and an id index is
+    kept alongside it in <clubactivitycachefilename>.ids so that duplicates can be
+    checked without reading the activities
+
+    :param clubactivitycachefilename: name of cache file
+    :param debug: True to log requests
+    :param key: strava access token, if not configured using apikey
+    :param compactinterval: seconds between rewrites of the cache file to remove duplicates
+    :param quota: StravaQuota used to pace requests, default is new StravaQuota()
     '''
 
     #----------------------------------------------------------------------
-    def __init__(self, clubactivitycachefilename=None, debug=False, key=None):
+    def __init__(self, clubactivitycachefilename=None, debug=False, key=None, compactinterval=CACHECOMPACTINTERVAL, quota=None):
     #----------------------------------------------------------------------
         """
         initialize 
@@ -122,23 +156,40 @@ class Strava():
             requests_log.setLevel(logging.DEBUG)
             requests_log.propagate = True
 
-        # bring in clubactivitycache file, if requested
-        self.clubactivitycache = {}
+        # reuse connections across requests, and stay within strava's rate limits
+        self.session = cassette.session(pool_connections=1, pool_maxsize=4)
+        self.quota = quota or stravaquota.StravaQuota()
+
+        # bring in clubactivitycache id index, if requested
+        # the activities themselves are only read if self.clubactivitycache is used
+        # self.clubactivityids is {id: start time epoch, ...}
+        self._clubactivitycache = None
+        self._clubactivitycolumns = None
+        self.clubactivityids = {}
+        self.clubactivitypending = []
+        self.clubactivitycachecompacted = time.time()
+        self.newestcachedtime = None
+        self.compactinterval = compactinterval
         self.clubactivitycachefilename = clubactivitycachefilename
         if self.clubactivitycachefilename:
+            self.clubactivityidsfilename = '{}.ids'.format(clubactivitycachefilename)
             # only read clubactivitycache if file exists
             if os.path.isfile(clubactivitycachefilename):
-                with open(clubactivitycachefilename,'r') as clubactivitycachefile:
-                    # members are stored one per line, in json format
-                    for line in clubactivitycachefile:
-                        activity = json.loads(line)
-                        id = activity['id']
-                        # make sure there are no duplicates initially
-                        if id not in self.clubactivitycache:
-                            self.clubactivitycache[id] = activity
-        
+                if not self._readidindex():
+                    # index missing or out of date with cache, so read all the activities and rebuild it
+                    self.clubactivityids = {}
+                    for activity in self.clubactivitycache.values():
+                        self.clubactivityids[activity['id']] = stravatime.asc2epoch(activity[DATEFIELD])
+                    self._writeidindex(self.clubactivitycachecompacted)
+                if self.clubactivityids:
+                    self.newestcachedtime = max(self.clubactivityids.values())
+
+            # index without cache is stale
+            elif os.path.isfile(self.clubactivityidsfilename):
+                os.remove(self.clubactivityidsfilename)
+
         # keep track of size of cache and number of activities added
-        self.clubactivitycachesize = len(self.clubactivitycache)
+        self.clubactivitycachesize = len(self.clubactivityids)
         self.clubactivitycacheadded = 0
         
     #----------------------------------------------------------------------
@@ -147,24 +198,209 @@ class Strava():
         '''
         close the connection when we're done, and save the cache
         '''
-        # save the cache in a temporary file, if requested and it's been updated
-        if self.clubactivitycachefilename and self.clubactivitycacheadded > 0:
-            # get full path for self.clubactivitycachefilename to assure cachedir isn't relative
-            cachedir = os.path.dirname(os.path.abspath(self.clubactivitycachefilename))
-            with NamedTemporaryFile(mode='w', suffix='.stravacache', delete=False, dir=cachedir) as tempcache:
-                tempclubactivitycachefilename = tempcache.name
-                for id in self.clubactivitycache:
-                    tempcache.write('{}\n'.format(json.dumps(self.clubactivitycache[id])))
-
-            # now overwrite the previous version of the clubactivitycachefile with the new clubactivitycachefile
-            try:
-                # atomic operation in Linux
-                os.rename(tempclubactivitycachefilename, self.clubactivitycachefilename)
+        self.session.close()
+
+        if not self.clubactivitycachefilename: return
+
+        # append the new activities to the cache, if it's been updated
+        if self.clubactivitypending:
+            self._appendcache()
+
+        # rewrite the cache without duplicates every so often
+        if os.path.isfile(self.clubactivitycachefilename) and time.time() - self.clubactivitycachecompacted >= self.compactinterval:
+            self.compactcache()
+
+    #----------------------------------------------------------------------
+    def _get(self, url, params):
+    #----------------------------------------------------------------------
+        '''
+        get url from strava, waiting if necessary to stay within rate limits
+
+        :param url: url to get
+        :param params: query parameters
+        :rtype: requests.Response
+        '''
+        for retry in range(MAXRATERETRIES+1):
+            self.quota.wait()
+            r = self.session.get(url, params=params)
+            # replayed responses don't use quota
+            if not cassette.replayed(r.headers):
+                self.quota.update(r.headers)
+
+            # too many requests, try again after quota resets
+            if r.status_code == 429 and retry < MAXRATERETRIES:
+                self.quota.exhausted()
+                continue
+
+            r.raise_for_status()
+            return r
+
+    #----------------------------------------------------------------------
+    @property
+    def clubactivitycache(self):
+    #----------------------------------------------------------------------
+        '''
+        club activities {id: activity, ...}, read from the cache file when first used
+        '''
+        if self._clubactivitycache is None:
+            self._clubactivitycache = {}
+            if self.clubactivitycachefilename and os.path.isfile(self.clubactivitycachefilename):
+                with open(self.clubactivitycachefilename,'r') as clubactivitycachefile:
+                    # activities are stored one per line, in json format
+                    for line in clubactivitycachefile:
+                        activity = json.loads(line)
+                        id = activity['id']
+                        # make sure there are no duplicates
+                        if id not in self._clubactivitycache:
+                            self._clubactivitycache[id] = activity
+
+            # activities which haven't been written yet
+            for activity in self.clubactivitypending:
+                self._clubactivitycache.setdefault(activity['id'], activity)
+
+        return self._clubactivitycache
+
+    #----------------------------------------------------------------------
+    @property
+    def clubactivitycolumns(self):
+    #----------------------------------------------------------------------
+        '''
+        columnar view of club activity cache for aggregation queries, built when first used
+        and rebuilt after activities are added
+
+        :rtype: stravacolumns.ActivityColumns
+        '''
+        if self._clubactivitycolumns is None:
+            # numpy is only needed if columns are used
+            from running import stravacolumns
+            self._clubactivitycolumns = stravacolumns.ActivityColumns(self.clubactivitycache.values())
+        return self._clubactivitycolumns
+
+    #----------------------------------------------------------------------
+    def _addactivity(self, activity):
+    #----------------------------------------------------------------------
+        '''
+        add activity to the cache, if not already there
+
+        :param activity: activity from strava
+        '''
+        id = activity['id']
+        if id in self.clubactivityids: return
+
+        starttime = stravatime.asc2epoch(activity[DATEFIELD])
+        self.clubactivityids[id] = starttime
+        self.clubactivitypending.append(activity)
+        if self._clubactivitycache is not None:
+            self._clubactivitycache[id] = activity
+        self._clubactivitycolumns = None
+        if self.newestcachedtime is None or starttime > self.newestcachedtime:
+            self.newestcachedtime = starttime
+        self.clubactivitycacheadded += 1
+        self.clubactivitycachesize = len(self.clubactivityids)
 
-            # should only happen under windows
-            except OSError:
-                os.remove(self.clubactivitycachefilename)
-                os.rename(tempclubactivitycachefilename, self.clubactivitycachefilename)
+    #----------------------------------------------------------------------
+    def _readidindex(self):
+    #----------------------------------------------------------------------
+        '''
+        read the id index sidecar file into self.clubactivityids
+
+        first line of the index is json header {"compacted": epoch}, followed by
+        a line per cached activity with id,start time epoch,offset of end of the activity
+        in the cache file
+
+        :rtype: True if index read and matches the cache file, else False
+        '''
+        if not os.path.isfile(self.clubactivityidsfilename):
+            return False
+
+        try:
+            with open(self.clubactivityidsfilename,'r') as idsfile:
+                header = json.loads(next(idsfile))
+                endoffset = 0
+                for line in idsfile:
+                    id, starttime, endoffset = [int(f) for f in line.split(',')]
+                    self.clubactivityids.setdefault(id, starttime)
+        except (StopIteration, ValueError):
+            return False
+
+        # index is only good if last activity in index is at end of cache file
+        if endoffset != os.path.getsize(self.clubactivitycachefilename):
+            return False
+
+        self.clubactivitycachecompacted = header['compacted']
+        return True
+
+    #----------------------------------------------------------------------
+    def _writeidindex(self, compacted):
+    #----------------------------------------------------------------------
+        '''
+        write the id index sidecar file from the cache file
+
+        :param compacted: epoch time cache file was last compacted
+        '''
+        cachedir = os.path.dirname(os.path.abspath(self.clubactivitycachefilename))
+        with NamedTemporaryFile(mode='w', suffix='.stravaids', delete=False, dir=cachedir) as tempids:
+            tempidsfilename = tempids.name
+            tempids.write('{}\n'.format(json.dumps({'compacted':compacted})))
+            with open(self.clubactivitycachefilename,'rb') as clubactivitycachefile:
+                endoffset = 0
+                for line in clubactivitycachefile:
+                    endoffset += len(line)
+                    activity = json.loads(line)
+                    tempids.write('{},{},{}\n'.format(activity['id'], self.clubactivityids[activity['id']], endoffset))
+
+        _replacefile(tempidsfilename, self.clubactivityidsfilename)
+
+    #----------------------------------------------------------------------
+    def _appendcache(self):
+    #----------------------------------------------------------------------
+        '''
+        append pending activities to the cache file, and their ids to the id index
+        '''
+        # cache first, so if interrupted the index won't match and will be rebuilt
+        idlines = []
+        with open(self.clubactivitycachefilename,'ab') as clubactivitycachefile:
+            endoffset = clubactivitycachefile.tell()
+            for activity in self.clubactivitypending:
+                line = '{}\n'.format(json.dumps(activity)).encode('utf-8')
+                clubactivitycachefile.write(line)
+                endoffset += len(line)
+                idlines.append('{},{},{}\n'.format(activity['id'], self.clubactivityids[activity['id']], endoffset))
+
+        # new index file needs header
+        if not os.path.isfile(self.clubactivityidsfilename):
+            idlines.insert(0, '{}\n'.format(json.dumps({'compacted':self.clubactivitycachecompacted})))
+        with open(self.clubactivityidsfilename,'a') as idsfile:
+            idsfile.writelines(idlines)
+
+        self.clubactivitypending = []
+
+    #----------------------------------------------------------------------
+    def compactcache(self):
+    #----------------------------------------------------------------------
+        '''
+        rewrite the cache file without any duplicate activities, and rewrite the id index
+
+        a single Strava instance never appends an activity which is already in the id index,
+        but the cache file can still collect duplicates, e.g., when two processes share the
+        cache file and append the same new activities, or from cache files written by
+        earlier versions. Duplicates are ignored when the cache is read, so this only keeps
+        the file from growing
+        '''
+        # save the cache in a temporary file
+        # get full path for self.clubactivitycachefilename to assure cachedir isn't relative
+        cachedir = os.path.dirname(os.path.abspath(self.clubactivitycachefilename))
+        with NamedTemporaryFile(mode='w', suffix='.stravacache', delete=False, dir=cachedir) as tempcache:
+            tempclubactivitycachefilename = tempcache.name
+            for id in self.clubactivitycache:
+                tempcache.write('{}\n'.format(json.dumps(self.clubactivitycache[id])))
+
+        # now overwrite the previous version of the clubactivitycachefile with the new clubactivitycachefile
+        _replacefile(tempclubactivitycachefilename, self.clubactivitycachefilename)
+        self.clubactivitypending = []
+
+        self.clubactivitycachecompacted = time.time()
+        self._writeidindex(self.clubactivitycachecompacted)
 
     #----------------------------------------------------------------------
     def getathleteclubs(self):
@@ -181,8 +417,7 @@ class Strava():
         # payload['per_page'] = perpage
         # payload['page'] = 1
 
-        r = requests.get(url, params=payload)
-        r.raise_for_status()
+        r = self._get(url, payload)
 
         return r.json()
 
@@ -203,22 +438,25 @@ class Strava():
         # payload['per_page'] = perpage
         # payload['page'] = 1
 
-        r = requests.get(url, params=payload)
-        r.raise_for_status()
+        r = self._get(url, payload)
 
         return r.json()
 
     #----------------------------------------------------------------------
-    def getclubactivities(self,clubid,before=None,after=None,perpage=200,maxactivities=None,**filters):
+    def getclubactivities(self,clubid,before=None,after=None,perpage=200,maxactivities=None,incremental=False,**filters):
     #----------------------------------------------------------------------
         """
         retrieve activities for a club
 
+        in incremental mode, paging stops after a page which has only activities already
+        in the club activity cache, or which reaches back before the newest cached activity
+
         :param clubid: strava id for club
         :param before: epoch time activities should be before
         :param after: epoch time activities should be after
         :param perpage: (debug) how many activities per request, max 200 per strava api docs
         :param maxactivities: (debug) max number of activities to return, None means all
+        :param incremental: True to only retrieve activities newer than those in the cache
         :param filters: additional filters to compare against returned activities {'field1':value, 'field2':[list,of,values]}
         """
 
@@ -232,13 +470,15 @@ class Strava():
         payload['page'] = 1
         #payload['before'] = before
 
+        # in incremental mode, need to know when we've reached the activities already cached
+        newestcachedtime = self.newestcachedtime
+
         # activities are returned in a list, most recent activity first
         # loop getting activities until oldest one is older than 'after' argument
         activities = []
         more = True
         while more:
-            r = requests.get(url, params=payload)
-            r.raise_for_status()
+            r = self._get(url, payload)
 
             theseactivities = r.json()
             if len(theseactivities) > 0:
@@ -261,6 +501,13 @@ class Strava():
                 #payload['before'] = earliesttime
                 payload['page'] += 1
 
+                # in incremental mode, we're done when we get to activities we already have
+                if incremental and self.clubactivityids:
+                    if all(activity['id'] in self.clubactivityids for activity in theseactivities):
+                        more = False
+                    elif stravatime.asc2epoch(theseactivities[-1][DATEFIELD]) < newestcachedtime:
+                        more = False
+
 
             # we're done if theseactivities is empty
             else:
@@ -274,11 +521,7 @@ class Strava():
 
         # update activity cache
         for activity in activities:
-            id = activity['id']
-            if id not in self.clubactivitycache:
-                self.clubactivitycache[id] = activity
-                self.clubactivitycacheadded += 1
-        self.clubactivitycachesize = len(self.clubactivitycache)
+            self._addactivity(activity)
 
         # we're outta here
         return activities
@@ -298,8 +541,7 @@ class Strava():
         # payload['per_page'] = perpage
         # payload['page'] = 1
 
-        r = requests.get(url, params=payload)
-        r.raise_for_status()
+        r = self._get(url, payload)
 
         return r.json()
 
@@ -339,7 +581,7 @@ def updatestravaclubactivitycache():
     '''
     script to update the strava club activity cache
 
-    usage: updatestravaclubactivitycache [-h] [-v] cachefile clubname
+    usage: updatestravaclubactivitycache [-h] [-v] [--configfile CONFIGFILE] [--full] cachefile clubname
 
         script to update the strava club activity cache
 
@@ -351,6 +593,9 @@ def updatestravaclubactivitycache():
     optional arguments:
       -h, --help     show this help message and exit
       -v, --version  show program's version number and exit
+      --configfile CONFIGFILE
+                     optional configuration filename
+      --full         retrieve all activities, rather than only those newer than the cache
     '''
 
     descr = '''
@@ -362,6 +607,7 @@ def updatestravaclubactivitycache():
     parser.add_argument('cachefile', help="pathname of file in which cache is saved")
     parser.add_argument('clubname', help="full name of club as known to strava")
     parser.add_argument('--configfile', help='optional configuration filename', default=None)
+    parser.add_argument('--full', help='retrieve all activities, rather than only those newer than the cache', action='store_true')
     args = parser.parse_args()
 
     # let user know what is going on
@@ -392,8 +638,8 @@ def updatestravaclubactivitycache():
     if not clubid:
         sys.exit('ERROR: club "{}" not found'.format(args.clubname))
 
-    # retrieve all the latest activities
-    activities = ss.getclubactivities(clubid)
+    # retrieve the latest activities, stopping when we reach what's in the cache unless full update requested
+    activities = ss.getclubactivities(clubid, incremental=not args.full)
     numadded = ss.clubactivitycacheadded
     cachesize = ss.clubactivitycachesize
 
@@ -0,0 +1,213 @@
+'''
+stravacolumns - columnar view of strava club activities
+===================================================================
+
+activities are held as numpy arrays, one array per field, so club statistics
+can be aggregated without looping through the activities
+'''
+
+# standard
+
+# pypi
+import numpy as np
+
+# github
+
+# other
+
+# home grown
+
+# day index of epoch 1970-01-01 (Thursday) is 3 days after Monday
+EPOCHWEEKDAY = 3
+
+#----------------------------------------------------------------------
+def _isotime(timestamp):
+#----------------------------------------------------------------------
+    '''
+    strava times end with Z, which numpy won't parse without warning
+    '''
+    return timestamp[:-1] if timestamp and timestamp[-1] == 'Z' else timestamp
+
+#----------------------------------------------------------------------
+def _day(date):
+#----------------------------------------------------------------------
+    '''
+    convert date to day number
+
+    :param date: 'yyyy-mm-dd', datetime.date or numpy.datetime64
+    :rtype: days since 1970-01-01
+    '''
+    return np.datetime64(date, 'D').astype(np.int64)
+
+#----------------------------------------------------------------------
+def athletename(activity):
+#----------------------------------------------------------------------
+    '''
+    return athlete's name for activity
+
+    :param activity: strava activity
+    :rtype: 'firstname lastname'
+    '''
+    athlete = activity['athlete']
+    return '{} {}'.format(athlete.get('firstname', ''), athlete.get('lastname', '')).strip()
+
+########################################################################
+class ActivityColumns():
+########################################################################
+    '''
+    columnar view of strava club activities
+
+    athletes and activity types are encoded as integers, indexing into
+    self.athletenames and self.types. Days are days since 1970-01-01, using
+    start_date_local if available.
+
+    date windows for the queries are inclusive, and dates can be given as
+    'yyyy-mm-dd', datetime.date or numpy.datetime64
+
+    :param activities: iterable of strava activities, e.g., Strava.clubactivitycache.values()
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self, activities):
+    #----------------------------------------------------------------------
+        activities = list(activities)
+
+        # club activities may not include athlete id, so use name if needed
+        athletecodes = {}
+        self.athletenames = []
+        typecodes = {}
+        self.types = []
+        athletes = []
+        types = []
+        for activity in activities:
+            athletekey = activity['athlete'].get('id') or athletename(activity)
+            if athletekey not in athletecodes:
+                athletecodes[athletekey] = len(self.athletenames)
+                self.athletenames.append(athletename(activity))
+            athletes.append(athletecodes[athletekey])
+
+            if activity['type'] not in typecodes:
+                typecodes[activity['type']] = len(self.types)
+                self.types.append(activity['type'])
+            types.append(typecodes[activity['type']])
+
+        self.ids = np.array([activity['id'] for activity in activities], dtype=np.int64)
+        self.athlete = np.array(athletes, dtype=np.int32)
+        self.type = np.array(types, dtype=np.int16)
+        self.starttime = np.array([_isotime(activity['start_date']) for activity in activities],
+                                  dtype='datetime64[s]').astype(np.int64)
+        self.day = np.array([_isotime(activity.get('start_date_local') or activity['start_date'])
+                             for activity in activities], dtype='datetime64[D]').astype(np.int64)
+        self.distance = np.array([activity.get('distance') or 0 for activity in activities], dtype=np.float64)
+        self.elapsed_time = np.array([activity.get('elapsed_time') or 0 for activity in activities], dtype=np.float64)
+
+    #----------------------------------------------------------------------
+    def __len__(self):
+    #----------------------------------------------------------------------
+        return len(self.ids)
+
+    #----------------------------------------------------------------------
+    def _mask(self, begin=None, end=None, type=None):
+    #----------------------------------------------------------------------
+        '''
+        return boolean array selecting activities within date window and of type
+
+        :param begin: first date to include, None for no limit
+        :param end: last date to include, None for no limit
+        :param type: activity type, e.g., 'Run', None for all types
+        :rtype: numpy boolean array
+        '''
+        mask = np.ones(len(self), dtype=bool)
+        if begin is not None:
+            mask &= self.day >= _day(begin)
+        if end is not None:
+            mask &= self.day <= _day(end)
+        if type is not None:
+            if type not in self.types:
+                mask[:] = False
+            else:
+                mask &= self.type == self.types.index(type)
+        return mask
+
+    #----------------------------------------------------------------------
+    def totals(self, begin=None, end=None, type=None):
+    #----------------------------------------------------------------------
+        '''
+        total activities, distance and time within date window
+
+        :param begin: first date to include, None for no limit
+        :param end: last date to include, None for no limit
+        :param type: activity type, e.g., 'Run', None for all types
+        :rtype: {'activities': count, 'athletes': count, 'distance': meters, 'elapsed_time': seconds}
+        '''
+        mask = self._mask(begin, end, type)
+        return {
+            'activities':   int(mask.sum()),
+            'athletes':     len(np.unique(self.athlete[mask])),
+            'distance':     float(self.distance[mask].sum()),
+            'elapsed_time': float(self.elapsed_time[mask].sum()),
+        }
+
+    #----------------------------------------------------------------------
+    def weeklydistance(self, begin=None, end=None, type=None):
+    #----------------------------------------------------------------------
+        '''
+        distance per athlete per week, weeks starting Monday
+
+        only weeks and athletes with activities are included
+
+        :param begin: first date to include, None for no limit
+        :param end: last date to include, None for no limit
+        :param type: activity type, e.g., 'Run', None for all types
+        :rtype: (weeks, athletenames, distance) - weeks is numpy datetime64 array of Mondays,
+            distance is numpy array of meters, shape (len(athletenames), len(weeks))
+        '''
+        mask = self._mask(begin, end, type)
+        days = self.day[mask]
+        weekstart = days - (days + EPOCHWEEKDAY) % 7
+        weeks, weekindex = np.unique(weekstart, return_inverse=True)
+        athletes, athleteindex = np.unique(self.athlete[mask], return_inverse=True)
+
+        distance = np.zeros((len(athletes), len(weeks)))
+        np.add.at(distance, (athleteindex, weekindex), self.distance[mask])
+
+        return weeks.astype('datetime64[D]'), [self.athletenames[a] for a in athletes], distance
+
+    #----------------------------------------------------------------------
+    def leaderboard(self, type=None, begin=None, end=None, n=10, field='distance'):
+    #----------------------------------------------------------------------
+        '''
+        athletes with highest total of field within date window
+
+        :param type: activity type, e.g., 'Run', None for all types
+        :param begin: first date to include, None for no limit
+        :param end: last date to include, None for no limit
+        :param n: number of athletes to return, None for all
+        :param field: 'distance', 'elapsed_time' or 'activities'
+        :rtype: [(athletename, total, activities), ...] highest total first
+        '''
+        mask = self._mask(begin, end, type)
+        numathletes = len(self.athletenames)
+        counts = np.bincount(self.athlete[mask], minlength=numathletes)
+        if field == 'activities':
+            totals = counts.astype(np.float64)
+        else:
+            totals = np.bincount(self.athlete[mask], weights=getattr(self, field)[mask], minlength=numathletes)
+
+        # ties are in order athletes were first seen
+        order = [a for a in np.argsort(-totals, kind='stable') if counts[a] > 0][:n]
+        return [(self.athletenames[a], float(totals[a]), int(counts[a])) for a in order]
+
+    #----------------------------------------------------------------------
+    def leaderboards(self, begin=None, end=None, n=10, field='distance'):
+    #----------------------------------------------------------------------
+        '''
+        leaderboard for each activity type
+
+        :param begin: first date to include, None for no limit
+        :param end: last date to include, None for no limit
+        :param n: number of athletes to return per type, None for all
+        :param field: 'distance', 'elapsed_time' or 'activities'
+        :rtype: {type: [(athletename, total, activities), ...], ...}
+        '''
+        return {type: self.leaderboard(type=type, begin=begin, end=end, n=n, field=field) for type in self.types}
@@ -0,0 +1,200 @@
+'''
+stravaquota - pace requests to stay within strava rate limits
+===================================================================
+
+strava limits requests per 15 minutes and per day. Both limits, and the usage
+so far, are returned in the headers of each response, e.g.::
+
+    X-RateLimit-Limit: 600,30000
+    X-RateLimit-Usage: 314,27536
+
+The 15 minute windows start at 0, 15, 30 and 45 minutes past the hour, and the
+daily window starts at midnight UTC.
+
+Requests aren't held back until a fraction (burst) of a window's quota is used, so
+short jobs run at full speed. After that the rest of the quota is spread evenly over
+the rest of the window, so a long backfill slows down gradually rather than using
+up the quota and then stopping until the window ends.
+'''
+
+# standard
+import time
+import logging
+
+# pypi
+
+# github
+
+# other
+
+# home grown
+
+SHORTWINDOW = 15*60
+DAILYWINDOW = 24*60*60
+
+# default limits, until strava tells us otherwise
+SHORTLIMIT = 200
+DAILYLIMIT = 2000
+
+# fraction of each window's quota which can be used without pacing
+PACEBURST = 0.5
+
+thislogger = logging.getLogger('running.stravaquota')
+
+#----------------------------------------------------------------------
+def _parsepair(value):
+#----------------------------------------------------------------------
+    '''
+    parse 'short,daily' header value
+
+    :param value: header value, or None
+    :rtype: (short, daily) ints, or None if value is missing or malformed
+    '''
+    if not value:
+        return None
+    try:
+        short, daily = [int(v) for v in value.split(',')[:2]]
+    except ValueError:
+        return None
+    return short, daily
+
+########################################################################
+class StravaQuota():
+########################################################################
+    '''
+    track strava's 15 minute and daily request quotas, pace requests once a burst of
+    each quota has been used, and wait when they're used up
+
+    call :meth:`wait` before each request, and :meth:`update` with the response
+    headers after each request
+
+    :param reserve: number of requests to leave unused in each window, e.g., for other applications
+    :param burst: fraction of each window's quota which can be used without pacing, 1 to only wait when used up
+    :param clock: function returning epoch time, for testing
+    :param sleep: function(seconds) to wait, for testing
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self, reserve=0, burst=PACEBURST, clock=time.time, sleep=time.sleep):
+    #----------------------------------------------------------------------
+        self.reserve = reserve
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+
+        self.shortlimit = SHORTLIMIT
+        self.dailylimit = DAILYLIMIT
+        self.shortusage = 0
+        self.dailyusage = 0
+
+        # windows the usage applies to
+        now = self.clock()
+        self.shortwindow = self._windowstart(now, SHORTWINDOW)
+        self.dailywindow = self._windowstart(now, DAILYWINDOW)
+
+    #----------------------------------------------------------------------
+    def _windowstart(self, now, window):
+    #----------------------------------------------------------------------
+        return now - (now % window)
+
+    #----------------------------------------------------------------------
+    def _rollwindows(self, now):
+    #----------------------------------------------------------------------
+        '''
+        reset usage for any window which has ended
+        '''
+        shortwindow = self._windowstart(now, SHORTWINDOW)
+        if shortwindow != self.shortwindow:
+            self.shortwindow = shortwindow
+            self.shortusage = 0
+
+        dailywindow = self._windowstart(now, DAILYWINDOW)
+        if dailywindow != self.dailywindow:
+            self.dailywindow = dailywindow
+            self.dailyusage = 0
+
+    #----------------------------------------------------------------------
+    def _resume(self, usage, limit, windowstart, window):
+    #----------------------------------------------------------------------
+        '''
+        earliest time the next request can be made within one window's quota
+
+        :param usage: requests used in this window
+        :param limit: requests allowed in this window
+        :param windowstart: epoch time window started
+        :param window: length of window in seconds
+        :rtype: (epoch time, True if quota is used up)
+        '''
+        budget = limit - self.reserve
+        if usage >= budget:
+            return windowstart + window, True
+
+        # no pacing within the burst
+        burst = self.burst * budget
+        if self.burst >= 1 or usage + 1 <= burst:
+            return windowstart, False
+
+        # spread the rest of the budget evenly over the window
+        return windowstart + (usage + 1 - burst) * window / (budget - burst), False
+
+    #----------------------------------------------------------------------
+    def update(self, headers):
+    #----------------------------------------------------------------------
+        '''
+        update limits and usage from response headers
+
+        :param headers: response headers
+        '''
+        self._rollwindows(self.clock())
+
+        limits = _parsepair(headers.get('X-RateLimit-Limit'))
+        if limits:
+            self.shortlimit, self.dailylimit = limits
+
+        usage = _parsepair(headers.get('X-RateLimit-Usage'))
+        if usage:
+            self.shortusage, self.dailyusage = usage
+        else:
+            self.shortusage += 1
+            self.dailyusage += 1
+
+    #----------------------------------------------------------------------
+    def exhausted(self):
+    #----------------------------------------------------------------------
+        '''
+        mark the current windows as used up, e.g., after 429 Too Many Requests response
+
+        the daily window is only marked if its usage is close to the daily limit, otherwise
+        it's assumed the 15 minute limit was hit
+        '''
+        self._rollwindows(self.clock())
+        self.shortusage = self.shortlimit
+        if self.dailyusage >= self.dailylimit - self.shortlimit:
+            self.dailyusage = self.dailylimit
+
+    #----------------------------------------------------------------------
+    def wait(self):
+    #----------------------------------------------------------------------
+        '''
+        wait until a request can be made without going over either quota, or getting ahead
+        of the pace once the burst has been used
+
+        :rtype: number of seconds waited
+        '''
+        waited = 0
+        while True:
+            now = self.clock()
+            self._rollwindows(now)
+
+            resume, usedup = max(self._resume(self.dailyusage, self.dailylimit, self.dailywindow, DAILYWINDOW),
+                                 self._resume(self.shortusage, self.shortlimit, self.shortwindow, SHORTWINDOW))
+            if resume <= now:
+                return waited
+
+            delay = resume - now
+            if usedup:
+                thislogger.info('strava quota used up, pausing {:.0f} seconds'.format(delay))
+            else:
+                thislogger.debug('pacing strava requests, pausing {:.1f} seconds'.format(delay))
+            self.sleep(delay)
+            waited += delay
@@ -0,0 +1,119 @@
+'''
+trigramindex - fuzzy name lookup using a trigram index
+===================================================
+'''
+
+# standard
+from collections import defaultdict
+from heapq import nsmallest
+
+# pypi
+
+# github
+
+# other
+
+# home grown
+
+#----------------------------------------------------------------------
+def trigrams(name):
+#----------------------------------------------------------------------
+    '''
+    return the set of trigrams for a name
+
+    name is lower cased and whitespace is collapsed. The name is padded so the start
+    and end of the name are represented in the trigrams
+
+    :param name: name to split into trigrams
+    :rtype: set of three character strings
+    '''
+    padded = '  {} '.format(' '.join(name.lower().split()))
+    return set(padded[i:i+3] for i in range(len(padded)-2))
+
+########################################################################
+class TrigramIndex():
+########################################################################
+    '''
+    index of names by trigram, used to find names similar to a search name
+
+    similarity between two names is the Dice coefficient of their trigram sets,
+    2 * common / (trigrams in name1 + trigrams in name2), between 0 and 1. Only
+    names which share at least one trigram with the search name are looked at,
+    so a search does not compare against every name in the index. If the caller
+    already knows a small set of candidate keys, the search can be restricted to
+    those, and the postings aren't consulted at all.
+    '''
+
+    #----------------------------------------------------------------------
+    def __init__(self):
+    #----------------------------------------------------------------------
+        # entry number is position in these lists
+        self.keys = []
+        self.trigrams = []
+        self.numtrigrams = []
+
+        # {key: [entry, ...], ...}
+        self.entries = defaultdict(list)
+
+        # {trigram: [entry, ...], ...}
+        self.postings = defaultdict(list)
+
+    #----------------------------------------------------------------------
+    def __len__(self):
+    #----------------------------------------------------------------------
+        return len(self.keys)
+
+    #----------------------------------------------------------------------
+    def add(self, name, key):
+    #----------------------------------------------------------------------
+        '''
+        add name to the index
+
+        :param name: name to index
+        :param key: key returned from :meth:`search` when this name matches
+        '''
+        entry = len(self.keys)
+        self.keys.append(key)
+        self.entries[key].append(entry)
+        thesetrigrams = trigrams(name)
+        self.trigrams.append(thesetrigrams)
+        self.numtrigrams.append(len(thesetrigrams))
+        for trigram in thesetrigrams:
+            self.postings[trigram].append(entry)
+
+    #----------------------------------------------------------------------
+    def search(self, name, cutoff=0.6, n=10, keyfilter=None, candidates=None):
+    #----------------------------------------------------------------------
+        '''
+        find names in the index which are similar to name
+
+        :param name: name to search for
+        :param cutoff: float in range (0,1], minimum similarity for a name to be returned
+        :param n: maximum number of matches to return
+        :param keyfilter: optional function(key) which returns False if key should not be considered
+        :param candidates: optional iterable of keys, only names added with these keys are considered
+        :rtype: [(similarity, key), ...] most similar first
+        '''
+        searchtrigrams = trigrams(name)
+        numsearch = len(searchtrigrams)
+
+        # count trigrams in common with each entry
+        common = defaultdict(int)
+        if candidates is not None:
+            for key in candidates:
+                for entry in self.entries.get(key, []):
+                    common[entry] = len(searchtrigrams & self.trigrams[entry])
+        else:
+            for trigram in searchtrigrams:
+                for entry in self.postings.get(trigram, []):
+                    common[entry] += 1
+
+        scored = []
+        for entry, numcommon in common.items():
+            similarity = 2.0 * numcommon / (numsearch + self.numtrigrams[entry])
+            if similarity < cutoff: continue
+            if keyfilter and not keyfilter(self.keys[entry]): continue
+            scored.append((-similarity, entry))
+
+        # most similar first, ties in the order names were added
+        return [(-negsimilarity, self.keys[entry]) for negsimilarity, entry in nsmallest(n, scored)]
@@ -33,6 +33,9 @@ import urllib.request, urllib.parse, urllib.error
 import unicodedata
 import logging
 import json
+import time
+import threading
+from collections import OrderedDict
 logging.basicConfig(format='%(asctime)s %(levelname)s:%(message)s')
 
 # pypi
@@ -48,17 +51,36 @@ from loutilities import timeu
 from loutilities import csvu
 from loutilities import renderrun as render
 from running import accessError, parameterError
+from running.httpretry import RetryPolicy
+from running.hostpool import ThreadLocalHttp
+from running.racedistance import parseevent
+from running import cassette
 
 # access stuff
 ULTRASIGNUP_URL = 'http://ultrasignup.com'
 RESULTS_SEARCH = 'service/events.svc/history/{fname}/{lname}'
 
 HTTPTIMEOUT = 10
+RETRIES = 10
+# seconds search results are kept, for runners searched for more than once
+RESULTSTTL = 10*60
 MPERMILE = 1609.344
 
 tindate  = timeu.asctime('%m/%d/%Y %I:%M:%S %p')
 toutdate = timeu.asctime('%Y-%m-%d')
 
+#----------------------------------------------------------------------
+def normname(fname,lname):
+#----------------------------------------------------------------------
+    '''
+    normalize name for use as key, ignoring case and extra whitespace
+
+    :param fname: first name
+    :param lname: last name
+    :rtype: (fname, lname)
+    '''
+    return ' '.join(fname.split()).lower(), ' '.join(lname.split()).lower()
+
 #----------------------------------------------------------------------
 def racenameanddist(eventname):
 #----------------------------------------------------------------------
@@ -70,56 +92,9 @@ def racenameanddist(eventname):
     '''
 
     # eventname is formatted as <racename> - <dist><units>
-    racetext = eventname.strip()
-    fields = racetext.split('-')
-    
     # include distance in racename, as sometimes it's missing
-    racename = racetext
-    distfield = fields[-1].strip()
-    
-    # accumulate distance, and figure out where units field starts
-    dist = 0
-    startunits = 0
-    for digit in distfield:
-        if not digit.isdigit():
-            break
-        dist *= 10
-        dist += int(digit)
-        startunits += 1
-    
-    # pull out the units from the distance field, and interpret
-    units = distfield[startunits:].strip()
-    
-    # special cases
-    if distfield == 'Marathon':
-        distmiles = 26.21875    # true marathon
-        distkm = distmiles * (MPERMILE/1000)
-        
-    elif distfield == '1/2 Marathon':
-        distmiles = 13.109375   # true half marathon
-        distkm = distmiles * (MPERMILE/1000)
-        
-    # kilometers
-    elif units == 'K':
-        distkm = dist 
-        distmiles = (dist * 1000) / MPERMILE
-    
-    # miles
-    elif units == 'Miler':
-        # some special cases
-        if dist == 13:
-            distmiles = 13.109375   # true half marathon
-        elif dist == 26:
-            distmiles = 26.21875    # true marathon
-        else:
-            distmiles = dist
-        distkm = distmiles * (MPERMILE/1000)
-    
-    else:
-        distmiles = None
-        distkm = None
-
-    return racename,distmiles,distkm
+    event = parseevent(eventname)
+    return event.text,event.distmiles,event.distkm
 
 #----------------------------------------------------------------------
 def racenameanddur(eventname):
@@ -131,35 +106,9 @@ def racenameanddur(eventname):
     :rtype: racename, duration
     '''
 
-    # eventname is formatted as <racename> - <dist><units>
-    racetext = eventname.strip()
-    fields = racetext.split('-')
-    
-    # include distance in racename, as sometimes it's missing
-    racename = racetext
-    durfield = fields[-1].strip()
-    
-    # accumulate duration, and figure out where units field starts
-    dur = 0
-    startunits = 0
-    for digit in durfield:
-        if not digit.isdigit():
-            break
-        dur *= 10
-        dur += int(digit)
-        startunits += 1
-    
-    # pull out the units from the durance field, and interpret
-    units = durfield[startunits:]
-    
-    # hours
-    if units == 'hrs':
-        duration = dur
-    
-    else:
-        duration = None
-
-    return racename,duration
+    # eventname is formatted as <racename> - <dur>hrs
+    event = parseevent(eventname)
+    return event.text,event.hours
 
 ########################################################################
 class UltraSignupResult():
@@ -235,23 +184,41 @@ class UltraSignup():
 ########################################################################
     '''
     access methods for ultrasignup.com
+
+    can be used concurrently from several threads
+
+    :param debug: True to enable debug logging
+    :param retry: httpretry.RetryPolicy for failed requests
+    :param resultsttl: seconds search results are kept for repeated searches
+    :param clock: function returning epoch time, for testing
     '''
 
     #----------------------------------------------------------------------
-    def __init__(self,debug=False):
+    def __init__(self,debug=False,retry=None,resultsttl=RESULTSTTL,clock=time.time):
     #----------------------------------------------------------------------
         """
         initialize http 
         """
-        # need http object
-        self.http = httplib2.Http(timeout=HTTPTIMEOUT)
+        # need http object, one per thread if used concurrently
+        self.http = ThreadLocalHttp(lambda: cassette.wraphttp(httplib2.Http(timeout=HTTPTIMEOUT)))
+        self.retry = retry or RetryPolicy(maxretries=RETRIES, basedelay=0.5, maxdelay=30)
 
         # set up logging level
         self.log = logging.getLogger('running.ultrasignup')
         self.setdebug(debug)
         
-        # count how many pages have been retrieved
+        # count how many pages have been retrieved, requests may be made from several threads
         self.urlcount = 0
+        self.urlcountlock = threading.Lock()
+
+        # search results cache {normname(fname,lname): (expires, content), ...}, oldest first
+        # resultsinflight {normname(fname,lname): threading.Event, ...} for searches being made
+        self.resultsttl = resultsttl
+        self.clock = clock
+        self.resultscache = OrderedDict()
+        self.resultscachehits = 0
+        self.resultslock = threading.Lock()
+        self.resultsinflight = {}
         
     #----------------------------------------------------------------------
     def setdebug(self,debugval):
@@ -290,13 +257,7 @@ class UltraSignup():
         '''
         
         # get the data for this athlete
-        races = []
-        data = self._get(RESULTS_SEARCH.format(
-                           fname=urllib.parse.quote(fname),
-                           lname=urllib.parse.quote(lname))
-                           )
-        
-        content = json.loads(data)
+        content = self.gethistory(fname,lname)
         
         results = []
         
@@ -351,6 +312,55 @@ class UltraSignup():
         results = list(filter(_checkfilter,results))
         return results
         
+    #----------------------------------------------------------------------
+    def gethistory(self,fname,lname):
+    #----------------------------------------------------------------------
+        '''
+        get results history for athlete's name, from ultrasignup or recent searches
+
+        if another thread is already searching for this name, wait for it rather
+        than searching again.
+
+        :param fname: first name of athlete
+        :param lname: last name of athlete
+        :rtype: decoded json response, list with entry for each runner of the same name
+        '''
+        key = normname(fname,lname)
+        while True:
+            with self.resultslock:
+                # cache is in expiry order
+                now = self.clock()
+                while self.resultscache and next(iter(self.resultscache.values()))[0] <= now:
+                    self.resultscache.popitem(last=False)
+
+                if key in self.resultscache:
+                    self.resultscachehits += 1
+                    return self.resultscache[key][1]
+
+                inflight = self.resultsinflight.get(key)
+                if not inflight:
+                    inflight = self.resultsinflight[key] = threading.Event()
+                    break
+
+            # if the other thread fails, loop around and try it ourselves
+            inflight.wait()
+
+        try:
+            data = self._get(RESULTS_SEARCH.format(
+                               fname=urllib.parse.quote(fname),
+                               lname=urllib.parse.quote(lname))
+                               )
+            content = json.loads(data)
+            with self.resultslock:
+                self.resultscache[key] = (self.clock() + self.resultsttl, content)
+
+        finally:
+            with self.resultslock:
+                del self.resultsinflight[key]
+            inflight.set()
+
+        return content
+
     #----------------------------------------------------------------------
     def _get(self,method,**params):
     #----------------------------------------------------------------------
@@ -364,21 +374,18 @@ class UltraSignup():
         body = urllib.parse.urlencode(params)
         url = '{}/{}?{}'.format(ULTRASIGNUP_URL,method,body)
         
-        # loop RETRIES times for timeout
-        retries = 10
-        while retries > 0:
-            retries -= 1
-            try:
-                self.log.debug(url)
-                resp,content = self.http.request(url)
-                self.urlcount += 1
-                break
-            except Exception as e:
-                if retries == 0:
-                    self.log.info('{} requests attempted'.format(self.geturlcount()))
-                    self.log.error('http request failure, retries exceeded: {0}'.format(e))
-                    raise
-                self.log.warning('http request failure: {0}'.format(e))
+        # retry with backoff for timeout
+        def request():
+            self.log.debug(url)
+            return self.http.request(url)
+
+        try:
+            resp,content = self.retry.call(url, request, log=self.log)
+        except Exception:
+            self.log.info('{} requests attempted'.format(self.geturlcount()))
+            raise
+        with self.urlcountlock:
+            self.urlcount += 1
         
         if resp.status != 200:
             raise accessError('URL response status = {0}'.format(resp.status))
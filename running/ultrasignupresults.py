@@ -26,7 +26,7 @@ ultrasignupresults - manage race results data from ultrasignup
 ===================================================================
 
 Usage::
-    ultrasignupresults.py [-h] [-v] [-b BEGINDATE] [-e ENDDATE]
+    ultrasignupresults.py [-h] [-v] [-b BEGINDATE] [-e ENDDATE] [-w WORKERS]
                                      searchfile outfile
     
         collect race results from ultrasignup
@@ -53,6 +53,8 @@ Usage::
                             choose races between begindate and enddate, yyyy-mm-dd
       -e ENDDATE, --enddate ENDDATE
                             choose races between begindate and enddate, yyyy-mm-dd
+      -w WORKERS, --workers WORKERS
+                            number of names to search for concurrently, default 1
                         
 '''
 
@@ -61,6 +63,7 @@ import argparse
 import csv
 import datetime
 import time
+from collections import OrderedDict
 
 # pypi
 #from IPython.core.debugger import Tracer; debug_here = Tracer()
@@ -74,6 +77,8 @@ from loutilities import timeu
 from loutilities import csvu
 from runningclub import agegrade
 from running.running import version, ultrasignup
+from running import resultfile
+from running import hostpool
 
 # see http://api.ultrasignup.com/Enums/RaceCategories
 ag = agegrade.AgeGrade()
@@ -82,7 +87,7 @@ class invalidParameter(Exception): pass
 ftime = timeu.asctime('%Y-%m-%d')
 
 #----------------------------------------------------------------------
-def collect(searchfile,outfile,begindate,enddate):
+def collect(searchfile,outfile,begindate,enddate,workers=1):
 #----------------------------------------------------------------------
     '''
     collect race results from ultrasignup
@@ -91,6 +96,7 @@ def collect(searchfile,outfile,begindate,enddate):
     :param outfile: output file path
     :param begindate: epoch time - choose races between begindate and enddate
     :param enddate: epoch time - choose races between begindate and enddate
+    :param workers: number of names to search for concurrently
     '''
     
     # open files
@@ -100,9 +106,6 @@ def collect(searchfile,outfile,begindate,enddate):
     OUT = csv.DictWriter(_OUT,UltraSignupResultFile.filehdr)
     OUT.writeheader()
 
-    # common fields between input and output
-    commonfields = 'GivenName,FamilyName,DOB,Gender'.split(',')
-
     # create ultrasignup access
     ultra = ultrasignup.UltraSignup(debug=True)
 
@@ -118,88 +121,118 @@ def collect(searchfile,outfile,begindate,enddate):
     start = time.time()
     today = timeu.epoch2dt(start)
     
-    # loop through runners in the input file
-    for runner in IN:
-        fname,lname = runner['GivenName'],runner['FamilyName']
-        e_dob = ftime.asc2epoch(runner['DOB'])
-        dt_dob = ftime.asc2dt(runner['DOB'])
-        gender = runner['Gender'][0]
-        
-        ## skip getting results if participant too young
-        #todayage = timeu.age(today,dt_dob)
-        #if todayage < 14: continue
-        
-        # get results for this athlete
-        results = ultra.listresults(fname,lname)
-        
-        # loop through each result
-        for result in results:
-            e_racedate = ftime.asc2epoch(result.racedate)
-            
-            # skip result if outside the desired time window
-            if e_racedate < begindate or e_racedate > enddate: continue
-            
-            # skip result if runner's age doesn't match the age within the result
-            dt_racedate = timeu.epoch2dt(e_racedate)
-            racedateage = timeu.age(dt_racedate,dt_dob)
-            if result.age != racedateage: continue
-            
-            # skip result if runner's gender doesn't match gender within the result
-            resultgen = result.gender
-            if resultgen != runner['Gender'][0]: continue
-            
-            # create output record and copy common fields
-            outrec = {}
-            for field in commonfields:
-                outrec[field] = runner[field]
-                
-            # fill in output record fields from runner, result
-            # combine name, get age
-            outrec['name'] = '{} {}'.format(runner['GivenName'],runner['FamilyName'])
-            outrec['age'] = result.age
-
-            # race name, location; convert from unicode if necessary
-            racename = result.racename
-            outrec['race'] = racename
-            outrec['date'] = ftime.epoch2asc(e_racedate)
-            outrec['loc'] = '{}, {}'.format(result.racecity, result.racestate)
-            
-            # distance, category, time
-            distmiles = result.distmiles
-            distkm = result.distkm
-            if distkm is None or distkm < 0.050: continue # should already be filtered within ultrasignup, but just in case
-
-            outrec['miles'] = distmiles
-            outrec['km'] = distkm
-            resulttime = result.racetime
+    # runners with the same name share a single search
+    runners = list(IN)
+    byname = OrderedDict()
+    for position,runner in enumerate(runners):
+        byname.setdefault(ultrasignup.normname(runner['GivenName'],runner['FamilyName']),[]).append(position)
 
-            # int resulttime means DNF, most likely -- skip this result
-            if isinstance(resulttime, int): continue
-            
-            # strange case of TicksString = ':00'
-            if resulttime[0] == ':':
-                resulttime = '0'+resulttime
-            while resulttime.count(':') < 2:
-                resulttime = '0:'+resulttime
-            outrec['time'] = resulttime
-
-            # just leave out age grade if exception occurs
-            try:
-                agpercent,agresult,agfactor = ag.agegrade(racedateage,gender,distmiles,timeu.timesecs(resulttime))
-                outrec['ag'] = agpercent
-                if agpercent < 15 or agpercent >= 100: continue # skip obvious outliers
-            except:
-                pass
+    def collectname(positions):
+        runner = runners[positions[0]]
+        results = ultra.listresults(runner['GivenName'],runner['FamilyName'])
+        return [(position,collectrunner(runners[position],results,begindate,enddate)) for position in positions]
 
-            OUT.writerow(outrec)
+    # search for names, possibly concurrently, writing results in input file order
+    # as soon as all earlier runners have been written
+    pending = {}
+    nextposition = 0
+    for collected in hostpool.orderedmap(collectname, byname.values(), workers):
+        pending.update(collected)
+        while nextposition in pending:
+            for outrec in pending.pop(nextposition):
+                OUT.writerow(outrec)
+            nextposition += 1
         
     _OUT.close()
     _IN.close()
     
     finish = time.time()
     print('number of URLs retrieved = {}'.format(ultra.geturlcount()))
+    print('number of searches found in cache = {}'.format(ultra.resultscachehits))
     print('elapsed time (min) = {}'.format((finish-start)/60))
     
+#----------------------------------------------------------------------
+def collectrunner(runner,results,begindate,enddate):
+#----------------------------------------------------------------------
+    '''
+    collect race results from ultrasignup for a single runner
+    
+    :param runner: record from searchfile
+    :param results: UltraSignup.listresults() for runner's name
+    :param begindate: epoch time, beginning of day - choose races between begindate and enddate
+    :param enddate: epoch time, end of day - choose races between begindate and enddate
+    :rtype: list of output records
+    '''
+    # common fields between input and output
+    commonfields = 'GivenName,FamilyName,DOB,Gender'.split(',')
+
+    dt_dob = ftime.asc2dt(runner['DOB'])
+    gender = runner['Gender'][0]
+    outrecs = []
+    
+    # loop through each result
+    for result in results:
+        e_racedate = ftime.asc2epoch(result.racedate)
+        
+        # skip result if outside the desired time window
+        if e_racedate < begindate or e_racedate > enddate: continue
+        
+        # skip result if runner's age doesn't match the age within the result
+        dt_racedate = timeu.epoch2dt(e_racedate)
+        racedateage = timeu.age(dt_racedate,dt_dob)
+        if result.age != racedateage: continue
+        
+        # skip result if runner's gender doesn't match gender within the result
+        resultgen = result.gender
+        if resultgen != gender: continue
+        
+        # create output record and copy common fields
+        outrec = {}
+        for field in commonfields:
+            outrec[field] = runner[field]
+            
+        # fill in output record fields from runner, result
+        # combine name, get age
+        outrec['name'] = '{} {}'.format(runner['GivenName'],runner['FamilyName'])
+        outrec['age'] = result.age
+
+        # race name, location; convert from unicode if necessary
+        racename = result.racename
+        outrec['race'] = racename
+        outrec['date'] = ftime.epoch2asc(e_racedate)
+        outrec['loc'] = '{}, {}'.format(result.racecity, result.racestate)
+        
+        # distance, category, time
+        distmiles = result.distmiles
+        distkm = result.distkm
+        if distkm is None or distkm < 0.050: continue # should already be filtered within ultrasignup, but just in case
+
+        outrec['miles'] = distmiles
+        outrec['km'] = distkm
+        resulttime = result.racetime
+
+        # int resulttime means DNF, most likely -- skip this result
+        if isinstance(resulttime, int): continue
+        
+        # strange case of TicksString = ':00'
+        if resulttime[0] == ':':
+            resulttime = '0'+resulttime
+        while resulttime.count(':') < 2:
+            resulttime = '0:'+resulttime
+        outrec['time'] = resulttime
+
+        # just leave out age grade if exception occurs
+        try:
+            agpercent,agresult,agfactor = ag.agegrade(racedateage,gender,distmiles,timeu.timesecs(resulttime))
+            outrec['ag'] = agpercent
+            if agpercent < 15 or agpercent >= 100: continue # skip obvious outliers
+        except:
+            pass
+
+        outrecs.append(outrec)
+
+    return outrecs
+    
 ########################################################################
 class UltraSignupFileResult():
 ########################################################################
@@ -267,7 +300,7 @@ class UltraSignupFileResult():
             setattr(self,attr,val)
 
 ########################################################################
-class UltraSignupResultFile():
+class UltraSignupResultFile(resultfile.ResultFile):
 ########################################################################
     '''
     represents file of ultrasignup results collected from ultrasignup
@@ -278,73 +311,10 @@ class UltraSignupResultFile():
     # UltraSignupResultFile.filehdr needs to associate 1:1 with UltraSignupFileResult.attrs
     hdrtransform = dict(list(zip(filehdr,UltraSignupFileResult.attrs)))
 
-    resultdates = 'dob,date'.split(',')
+    filekinds = 'text,text,text,date,gender,text,date,text,int,float,float,text,float'.split(',')
+    schema = resultfile.ResultSchema(list(zip(filehdr,UltraSignupFileResult.attrs,filekinds)),textfn=resultfile.asciitext)
+    resultclass = UltraSignupFileResult
 
-    #----------------------------------------------------------------------
-    def __init__(self,filename):
-    #----------------------------------------------------------------------
-        self.filename = filename
-        
-    #----------------------------------------------------------------------
-    def open(self,mode='r'):
-    #----------------------------------------------------------------------
-        '''
-        open ultrasignup result file
-        
-        :param mode: 'r' or 'w' -- TODO: support 'w'
-        '''
-        if mode[0] not in 'r':
-            raise invalidParameter('mode {} not currently supported'.format(mode))
-    
-        self._fh = open(self.filename,mode,newline='')
-        if mode[0] == 'r':
-            self._csv = csv.DictReader(self._fh)
-        else:
-            pass
-        
-    #----------------------------------------------------------------------
-    def close(self):
-    #----------------------------------------------------------------------
-        '''
-        close ultrasignup result file
-        '''
-        if hasattr(self,'_fh'):
-            self._fh.close()
-            delattr(self,'_fh')
-            delattr(self,'_csv')
-        
-    #----------------------------------------------------------------------
-    def __next__(self):
-    #----------------------------------------------------------------------
-        '''
-        get next :class:`UltraSignupFileResult`
-        
-        :rtype: :class:`UltraSignupFileResult`, or None when end of file reached
-        '''
-        try:
-            fresult = next(self._csv)
-            
-        except StopIteration:
-            return None
-        
-        aresultargs = {}
-        for fattr in self.hdrtransform:
-            aattr = self.hdrtransform[fattr]
-            
-            # special handling for gender
-            if aattr == 'gender':
-                aresultargs[aattr] = fresult[fattr][0]
-                
-            # special handling for dates
-            elif aattr in self.resultdates:
-                aresultargs[aattr] = ftime.asc2dt(fresult[fattr])
-                
-            else:
-                # convert numbers
-                aresultargs[aattr] = csvu.str2num(fresult[fattr])
-                
-        return UltraSignupFileResult(**aresultargs)
-    
 #----------------------------------------------------------------------
 def main(): 
 #----------------------------------------------------------------------
@@ -367,6 +337,7 @@ def main():
     parser.add_argument('outfile', help="output file contains race results")
     parser.add_argument('-b','--begindate', help="choose races between begindate and enddate, yyyy-mm-dd",default=None)
     parser.add_argument('-e','--enddate', help="choose races between begindate and enddate, yyyy-mm-dd",default=None)
+    parser.add_argument('-w','--workers', help="number of names to search for concurrently, default 1",type=int,default=1)
     args = parser.parse_args()
 
     searchfile = args.searchfile
@@ -383,7 +354,7 @@ def main():
         enddate = argtime.asc2epoch('2030-12-31')
         
     # collect all the data
-    collect(searchfile,outfile,begindate,enddate)
+    collect(searchfile,outfile,begindate,enddate,workers=args.workers)
         
 ########################################################################
 #	__main__
@@ -0,0 +1,85 @@
+'''
+tests for running.agegradebatch, compared with loutilities.agegrade.AgeGrade
+'''
+
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+from loutilities.agegrade import AgeGrade, parameterError
+
+from running.agegradebatch import AgeGradeBatch, MPERMILE
+
+ROADDISTS = [5000, 8047, 10000, 15000, 21098, 42195, 100000]
+TRACKDISTS = [100, 400, 1500, 1609, 3000, 5000, 10000]
+
+
+def _table(dists, rand):
+    table = {}
+    for dist in dists:
+        table[dist] = {'OC': dist * 0.16}
+        for age in range(5, 100):
+            table[dist][age] = 1 - abs(age - 28) / 150 - rand.random() / 50
+    return table
+
+
+@pytest.fixture(scope='module')
+def agegradedata():
+    rand = random.Random(1)
+    return {surface: {gen: _table(dists, rand) for gen in 'FMX'}
+            for surface, dists in (('road', ROADDISTS), ('track', TRACKDISTS))}
+
+
+class TestAgeGradeBatch:
+    def test_matches_agegrade(self, agegradedata):
+        ag = AgeGrade(agegradedata=agegradedata)
+        batch = AgeGradeBatch(agegradedata)
+
+        rand = random.Random(2)
+        ages = [rand.choice([3, 5, 17.6, 40, 64, 99, 104]) for i in range(500)]
+        gens = [rand.choice('FMXmQ') for i in range(500)]
+        distmiles = [rand.choice([0.01, 0.25, 1, 3.10686, 5000/MPERMILE, 6.2, 13.1, 26.2, 50, 62, 100]) for i in range(500)]
+        times = [rand.uniform(60, 30000) for i in range(500)]
+
+        percentages, results, factors = batch.agegrade(ages, gens, distmiles, times)
+        ungraded = 0
+        for i in range(500):
+            try:
+                expected = ag.agegrade(ages[i], gens[i], distmiles[i], times[i])
+            except parameterError:
+                ungraded += 1
+                assert np.isnan([percentages[i], results[i], factors[i]]).all()
+                continue
+            assert (percentages[i], results[i], factors[i]) == pytest.approx(expected, rel=1e-12)
+        assert 0 < ungraded < 500
+
+    def test_surface(self, agegradedata):
+        ag = AgeGrade(agegradedata=agegradedata)
+        batch = AgeGradeBatch(agegradedata)
+        percentages, results, factors = batch.agegrade([40, 50], 'F', [3.10686, 6.2], [1200, 2700], surface='track')
+        for i, (age, miles, time) in enumerate([(40, 3.10686, 1200), (50, 6.2, 2700)]):
+            assert percentages[i] == pytest.approx(ag.agegrade(age, 'F', miles, time, surface='track')[0])
+
+    def test_interpolation_cached(self, agegradedata):
+        batch = AgeGradeBatch(agegradedata)
+        batch.agegrade([40, 41, 42], 'M', [6.2, 6.2, 6.2], [2400, 2500, 2600])
+        assert list(batch.interpolated) == [('road', 'M', round(6.2 * MPERMILE))]
+
+    def test_distance_out_of_range(self, agegradedata):
+        percentages, results, factors = AgeGradeBatch(agegradedata).agegrade([40, 40, 40], 'M', [6.2, 100, 0.01], [2400, 36000, 10])
+        assert not np.isnan(percentages[0])
+        assert np.isnan(percentages[1:]).all() and np.isnan(results[1:]).all() and np.isnan(factors[1:]).all()
+
+    def test_invalid_gender(self, agegradedata):
+        percentages, results, factors = AgeGradeBatch(agegradedata).agegrade([40, 40], ['Q', 'F'], [3.1, 3.1], [1200, 1200])
+        assert np.isnan(percentages[0]) and not np.isnan(percentages[1])
+
+    def test_empty(self, agegradedata):
+        percentages, results, factors = AgeGradeBatch(agegradedata).agegrade([], 'F', [], [])
+        assert len(percentages) == len(results) == len(factors) == 0
+
+    def test_without_surfaces(self, agegradedata):
+        flat = AgeGradeBatch(agegradedata['road'])
+        surfaced = AgeGradeBatch(agegradedata)
+        assert flat.agegrade([40], 'M', [6.2], [2400])[0] == pytest.approx(surfaced.agegrade([40], 'M', [6.2], [2400])[0])
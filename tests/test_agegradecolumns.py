@@ -0,0 +1,126 @@
+'''
+tests for running.agegradecolumns.AgeGradeColumns
+'''
+
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip('numpy')
+stats = pytest.importorskip('scipy.stats')
+
+from running.agegradecolumns import AgeGradeColumns, ATTRS, datenum
+
+
+def _row(date, dist, priority=1, **kwargs):
+    row = {'date': datetime.strptime(date, '%Y-%m-%d'), 'dist': dist, 'time': dist / 4, 'priority': priority}
+    row.update(kwargs)
+    return row
+
+
+ROWS = [
+    _row('2025-05-03', 10000, priority=2, race='Spring 10K', source='athlinks'),
+    _row('2024-11-28', 5000, race='Turkey Trot', source='clubraces'),
+    _row('2025-05-03', 10200, priority=1, race='Spring 10K', source='clubraces'),
+    _row('2025-05-03', 5000, race='Kids Dash', source='athlinks'),
+    _row('2025-09-14', 21097, ag=61.5, race='Half', source='ultrasignup'),
+]
+
+
+class TestAgeGradeColumns:
+    def test_rows_roundtrip(self):
+        rows = AgeGradeColumns(ROWS).rows()
+        assert [row['race'] for row in rows] == [row['race'] for row in ROWS]
+        assert rows[0] == {'race': 'Spring 10K', 'date': datetime(2025, 5, 3), 'loc': None, 'dist': 10000,
+                           'time': 2500.0, 'ag': None, 'source': 'athlinks', 'fuzzyage': None, 'priority': 2}
+        assert rows[4]['ag'] == 61.5
+
+    def test_rows_keep_original_values(self):
+        rows = [_row('2025-05-03', 10000, race='a'), _row('2025-05-04', 5000.0, race='b')]
+        rows[0]['time'] = 2400
+        columns = AgeGradeColumns(rows).extend([_row('2025-05-05', 8047, race='c')])
+        deduped = columns.take([2, 0, 1]).deduplicate()
+        assert [(repr(row['dist']), repr(row['time'])) for row in deduped.rows()] == \
+            [('10000', '2400'), ('5000.0', '1250.0'), ('8047', '2011.75')]
+        assert deduped.dist.dtype == np.float64
+
+    def test_categories(self):
+        columns = AgeGradeColumns(ROWS)
+        assert columns.categories['source'] == ['athlinks', 'clubraces', 'ultrasignup']
+        assert columns.codes['source'].tolist() == [0, 1, 1, 0, 2]
+
+    def test_fromstats(self):
+        stats = [SimpleNamespace(**dict({attr: None for attr in ATTRS}, **row)) for row in ROWS]
+        assert AgeGradeColumns.fromstats(stats).rows() == AgeGradeColumns(ROWS).rows()
+
+    def test_take_and_extend(self):
+        columns = AgeGradeColumns(ROWS[:2]).extend(ROWS[2:])
+        assert columns.rows() == AgeGradeColumns(ROWS).rows()
+        selected = columns.take(columns.years() == 2025)
+        assert selected.values('race').tolist() == ['Spring 10K', 'Spring 10K', 'Kids Dash', 'Half']
+
+    def test_ages(self):
+        columns = AgeGradeColumns(ROWS)
+        assert columns.ages(datetime(1970, 5, 3)).tolist() == [55, 54, 55, 55, 55]
+        assert columns.ages(datetime(1970, 5, 4)).tolist() == [54, 54, 54, 54, 55]
+
+    def test_deduplicate(self):
+        deduped = AgeGradeColumns(ROWS).deduplicate()
+        assert [(row['race'], row['source']) for row in deduped.rows()] == [
+            ('Turkey Trot', 'clubraces'), ('Kids Dash', 'athlinks'), ('Spring 10K', 'clubraces'), ('Half', 'ultrasignup')]
+
+    def test_deduplicate_tie_keeps_first(self):
+        rows = [_row('2025-05-03', 10000, race='a'), _row('2025-05-03', 10000, race='b')]
+        assert AgeGradeColumns(rows).deduplicate().values('race').tolist() == ['a']
+
+    def test_deduplicate_groups_from_first_stat(self):
+        # 10900 is within 10% of 10000, 11500 is not, even though it is within 10% of 10900
+        rows = [_row('2025-05-03', dist, race=str(dist)) for dist in [11500, 10900, 10000]]
+        assert AgeGradeColumns(rows).deduplicate().values('race').tolist() == ['10000', '11500']
+
+    def test_digest(self):
+        columns = AgeGradeColumns(ROWS)
+        assert columns.digest() == AgeGradeColumns(ROWS).digest()
+        # same values with categories first seen in a different order
+        assert columns.take([1, 0, 2, 3, 4]).take([1, 0, 2, 3, 4]).digest() == columns.digest()
+        assert AgeGradeColumns(ROWS[1:2] + ROWS[0:1] + ROWS[2:]).take([1, 0, 2, 3, 4]).digest() == columns.digest()
+        assert columns.take([0, 1, 2, 3]).digest() != columns.digest()
+        changed = [dict(row) for row in ROWS]
+        changed[4]['race'] = 'Half Marathon'
+        assert AgeGradeColumns(changed).digest() != columns.digest()
+
+    def test_empty(self):
+        columns = AgeGradeColumns()
+        assert len(columns) == 0
+        assert len(columns.deduplicate()) == 0
+        assert columns.rows() == []
+
+
+class TestRegress:
+    @pytest.fixture
+    def columns(self):
+        rand = random.Random(1)
+        return AgeGradeColumns([{'date': datetime(2010, 1, 1) + timedelta(days=rand.randrange(3000), hours=rand.randrange(24)),
+                                 'dist': rand.choice([5000, 10000, 42195]), 'time': 1000, 'ag': rand.uniform(50, 80)}
+                                for i in range(300)])
+
+    def test_matches_linregress(self, columns):
+        subsets = {'overall': np.ones(len(columns), dtype=bool), '5K': columns.dist == 5000,
+                   ('5K', 2012): (columns.dist == 5000) & (columns.years() == 2012)}
+        trends = columns.regress(subsets)
+        for label, mask in subsets.items():
+            expected = stats.linregress(datenum(columns.date[mask]), columns.ag[mask])
+            assert trends[label].n == mask.sum()
+            assert trends[label].mean == pytest.approx(columns.ag[mask].mean())
+            assert trends[label][2:] == pytest.approx(tuple(expected)[:5], rel=1e-9)
+
+    def test_datenum_matches_matplotlib(self, columns):
+        mdates = pytest.importorskip('matplotlib.dates')
+        assert datenum(columns.date) == pytest.approx(mdates.date2num(columns.date))
+
+    def test_too_few(self, columns):
+        trends = columns.regress({'one': np.arange(len(columns)) == 0, 'none': np.zeros(len(columns), dtype=bool)})
+        assert trends['one'].n == 1 and np.isnan(trends['one'].slope)
+        assert trends['none'].n == 0 and np.isnan(trends['none'].mean)
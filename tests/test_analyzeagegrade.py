@@ -0,0 +1,93 @@
+'''
+tests for running.analyzeagegrade batch age grading, compared with AgeGrade.agegrade() for each result
+'''
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+# analyzeagegrade needs runningclub and the running.running package
+analyzeagegrade = pytest.importorskip('running.analyzeagegrade', exc_type=ImportError)
+from runningclub.agegrade import parameterError
+
+# ages below 5 and above 99 at race time, both genders
+RUNNERS = [('amy', 'F', datetime(1980, 5, 3)), ('bob', 'M', datetime(1975, 11, 30)),
+           ('tot', 'F', datetime(2016, 7, 4)), ('old', 'M', datetime(1918, 2, 28))]
+
+# track and road distances (meters), and some outside of the factor tables
+DISTS = [400, 1609, 3000, 5000, 10000, 21097, 42195]
+BADDISTS = [10, 500000]
+
+
+def _club(columnar, dists=DISTS + BADDISTS):
+    rand = random.Random(4)
+    aags = []
+    for name, gender, dob in RUNNERS:
+        aag = analyzeagegrade.AnalyzeAgeGrade(columnar=columnar)
+        aag.set_runner(name, gender, dob)
+        for i in range(30):
+            aag.add_stat(datetime(2020, 1, 1) + timedelta(days=rand.randrange(3*365)), rand.choice(dists),
+                         rand.uniform(60, 20000))
+        aags.append(aag)
+    return aags
+
+
+def _expected(aag):
+    '''
+    age grade each result as crunch() originally did, skipping results which can't be graded
+    '''
+    expected = []
+    for stat in aag.get_stats():
+        age = stat.date.year - aag.dob.year - int((stat.date.month, stat.date.day) < (aag.dob.month, aag.dob.day))
+        try:
+            agpercentage = analyzeagegrade.ag.agegrade(age, aag.gender, stat.dist/analyzeagegrade.METERSPERMILE, stat.time)[0]
+        except parameterError:
+            continue
+        expected.append((stat.date, stat.dist, stat.time, agpercentage))
+    return expected
+
+
+def _actual(aag):
+    return [(stat.date, stat.dist, stat.time, stat.ag) for stat in aag.get_stats()]
+
+
+def _check(aag, expected):
+    actual = _actual(aag)
+    assert [row[:3] for row in actual] == [row[:3] for row in expected]
+    assert [row[3] for row in actual] == pytest.approx([row[3] for row in expected], rel=1e-12)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+class TestCrunch:
+    def test_crunchall_matches_agegrade(self, columnar):
+        aags = _club(columnar)
+        expected = [_expected(aag) for aag in aags]
+        analyzeagegrade.crunchall(aags)
+        for aag, thisexpected in zip(aags, expected):
+            _check(aag, thisexpected)
+
+        # out of range results were dropped, but only those
+        assert all(stat.dist in DISTS for aag in aags for stat in aag.get_stats())
+        assert sum(len(thisexpected) for thisexpected in expected) < 30 * len(RUNNERS)
+
+    def test_crunch_matches_agegrade(self, columnar):
+        for aag in _club(columnar):
+            expected = _expected(aag)
+            aag.crunch()
+            _check(aag, expected)
+
+    def test_all_results_out_of_range(self, columnar):
+        aags = _club(columnar)
+        ungraded = analyzeagegrade.AnalyzeAgeGrade(columnar=columnar)
+        ungraded.set_runner('far', 'F', datetime(1970, 1, 1))
+        ungraded.add_stat(datetime(2020, 6, 1), BADDISTS[-1], 200000)
+        analyzeagegrade.crunchall(aags + [ungraded])
+        assert ungraded.get_stats() == []
+        assert all(aag.get_stats() for aag in aags)
+
+    def test_in_range_unchanged(self, columnar):
+        aags = _club(columnar, dists=DISTS)
+        numstats = [len(aag.get_stats()) for aag in aags]
+        analyzeagegrade.crunchall(aags)
+        assert [len(aag.get_stats()) for aag in aags] == numstats
@@ -0,0 +1,142 @@
+'''
+tests for running.athlinks.Athlinks course cache
+'''
+
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+from running.athlinks import Athlinks
+
+
+class FakeResponse(dict):
+    def __init__(self, status):
+        self.status = status
+
+
+class FakeHttp:
+    '''
+    stands in for httplib2.Http, returning a course document for each course url
+    '''
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.paths = []
+        self.lock = threading.Lock()
+
+    def request(self, url):
+        path = urlparse(url).path
+        with self.lock:
+            self.paths.append(path)
+        time.sleep(self.delay)
+        return FakeResponse(200), json.dumps({'path': path}).encode()
+
+
+def _athlinks(**kwargs):
+    athl = Athlinks(key='testkey', **kwargs)
+    athl.http = FakeHttp()
+    return athl
+
+
+class TestCourseCache:
+    def test_cached_course_not_retrieved_again(self):
+        athl = _athlinks()
+        assert athl.getcourse(1, 2) == {'path': '/races/1/2'}
+        assert athl.getcourse(1, 2) == {'path': '/races/1/2'}
+        assert athl.http.paths == ['/races/1/2']
+        assert athl.coursecachehits == 1
+
+    def test_least_recently_used_evicted(self):
+        athl = _athlinks(coursecachesize=2)
+        athl.getcourse(1, 1)
+        athl.getcourse(2, 2)
+        athl.getcourse(1, 1)
+        athl.getcourse(3, 3)
+        assert list(athl.coursecache) == ['1/1', '3/3']
+
+    def test_persisted(self, tmp_path):
+        cachefile = str(tmp_path / 'courses.cache')
+        athl = _athlinks(coursecachefilename=cachefile)
+        athl.getcourse(1, 1)
+        athl.getcourse(2, 2)
+        athl.close()
+
+        athl = _athlinks(coursecachefilename=cachefile, coursecachesize=1)
+        assert list(athl.coursecache) == ['2/2']
+        assert athl.getcourse(2, 2) == {'path': '/races/2/2'}
+        assert athl.http.paths == []
+
+    def test_concurrent_requests_coalesce(self):
+        athl = _athlinks()
+        athl.http.delay = 0.1
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(athl.getcourse(5, 6))) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert athl.http.paths == ['/races/5/6']
+        assert results == [{'path': '/races/5/6'}] * 8
+        assert athl.courseinflight == {}
+
+    def test_urlcount_from_threads(self):
+        athl = _athlinks()
+        threads = [threading.Thread(target=lambda i=i: [athl.getcourse(i, c) for c in range(50)]) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert athl.geturlcount() == 8 * 50
+
+
+class FakeSearchHttp:
+    '''
+    serves Results/search pages of two results each from racetimes (epoch seconds)
+    '''
+    def __init__(self, racetimes):
+        self.racetimes = racetimes
+        self.pages = []
+
+    def request(self, url):
+        from urllib.parse import parse_qs
+        page = int(parse_qs(urlparse(url).query)['page'][0])
+        self.pages.append(page)
+        racelist = [{'Race': {'RaceDate': '/Date({})/'.format(t * 1000)}, 'Gender': 'M'}
+                    for t in self.racetimes[(page - 1) * 2:page * 2]]
+        return FakeResponse(200), json.dumps({'List': racelist}).encode()
+
+
+def _racetimes(races):
+    return [int(race['Race']['RaceDate'][6:-5]) for race in races]
+
+
+class TestListAthleteResults:
+    def test_no_window(self):
+        athl = _athlinks()
+        athl.http = FakeSearchHttp([60, 50, 40, 30, 20])
+        assert _racetimes(athl.listathleteresults('a b')) == [60, 50, 40, 30, 20]
+        assert athl.http.pages == [1, 2, 3, 4]
+
+    def test_window_pages_to_end(self):
+        athl = _athlinks()
+        athl.http = FakeSearchHttp([60, 50, 40, 30, 20, 10])
+        assert _racetimes(athl.listathleteresults('a b', begindate=35, enddate=55)) == [50, 40]
+        assert athl.http.pages == [1, 2, 3, 4]
+
+    def test_descending_first_page_not_trusted(self):
+        # first pages are most recent first, but a later page has results within the window
+        athl = _athlinks()
+        athl.http = FakeSearchHttp([60, 50, 40, 30, 20, 45, 10, 38])
+        assert _racetimes(athl.listathleteresults('a b', begindate=35, enddate=55)) == [50, 40, 45, 38]
+        assert athl.http.pages == [1, 2, 3, 4, 5]
+
+    def test_filters_all_pages_when_not_ordered(self):
+        athl = _athlinks()
+        athl.http = FakeSearchHttp([20, 50, 10, 40, 30])
+        assert _racetimes(athl.listathleteresults('a b', begindate=35)) == [50, 40]
+        assert athl.http.pages == [1, 2, 3, 4]
+
+    def test_keyword_filter(self):
+        athl = _athlinks()
+        athl.http = FakeSearchHttp([60, 50])
+        assert athl.listathleteresults('a b', Gender='F') == []
@@ -0,0 +1,145 @@
+'''
+tests for running.cassette
+'''
+
+import os
+
+import pytest
+import responses
+
+from running import cassette
+from running.cassette import Cassette, CassetteHttp, cassetteMiss, requestkey
+
+
+class FakeResponse(dict):
+    def __init__(self, status, headers):
+        super().__init__(headers)
+        self.status = status
+
+
+class FakeHttp:
+    '''
+    returns the same body for every request, counting requests
+    '''
+    def __init__(self, status=200):
+        self.status = status
+        self.requests = []
+
+    def request(self, uri, method='GET', body=None, headers=None):
+        self.requests.append(uri)
+        return FakeResponse(self.status, {'content-type': 'application/json', 'set-cookie': 'session=abc'}), b'{"a": 1}'
+
+
+class TestRequestKey:
+    def test_ignores_credentials_and_query_order(self):
+        key1, url1 = requestkey('GET', 'https://Example.com/a?key=secret1&b=2&a=1')
+        key2, url2 = requestkey('get', 'https://example.com/a?a=1&b=2&key=secret2')
+        assert key1 == key2
+        assert url1 == 'https://example.com/a?a=1&b=2'
+
+    def test_user_tokens_distinguish(self):
+        key1, url1 = requestkey('GET', 'https://example.com/a?access_token=user1&key=app', salt=b'salt')
+        key2, url2 = requestkey('GET', 'https://example.com/a?access_token=user2&key=app', salt=b'salt')
+        assert key1 != key2
+        assert requestkey('GET', 'https://example.com/a?key=other&access_token=user1', salt=b'salt')[0] == key1
+        assert requestkey('GET', 'https://example.com/a?token=user1', salt=b'salt')[0] != \
+               requestkey('GET', 'https://example.com/a?token=user2', salt=b'salt')[0]
+        assert 'user1' not in url1 and 'app' not in url1
+
+    def test_user_tokens_salted(self):
+        assert requestkey('GET', 'https://example.com/a?access_token=user1', salt=b'salt1')[0] != \
+               requestkey('GET', 'https://example.com/a?access_token=user1', salt=b'salt2')[0]
+
+    def test_body_and_method_distinguish(self):
+        assert requestkey('POST', 'https://example.com', 'a')[0] != requestkey('POST', 'https://example.com', 'b')[0]
+        assert requestkey('GET', 'https://example.com')[0] != requestkey('POST', 'https://example.com')[0]
+
+
+class TestCassetteHttp:
+    def test_record_then_replay(self, tmp_path):
+        http = FakeHttp()
+        recorder = CassetteHttp(http, Cassette(str(tmp_path), 'record'))
+        resp, content = recorder.request('https://example.com/x?key=secret')
+        assert resp.status == 200
+
+        # new cassette object reads what was recorded from disk
+        player = CassetteHttp(FakeHttp(), Cassette(str(tmp_path), 'replay'))
+        replayresp, replaycontent = player.request('https://example.com/x?key=other')
+        assert replaycontent == content
+        assert replayresp.status == 200
+        assert replayresp['content-type'] == 'application/json'
+        assert cassette.replayed(replayresp)
+        assert player.http.requests == []
+
+    def test_nothing_secret_is_written(self, tmp_path):
+        CassetteHttp(FakeHttp(), Cassette(str(tmp_path), 'record')).request('https://example.com/x?api_key=hunter2')
+        with open(os.path.join(str(tmp_path), 'index.jsonl')) as indexfile:
+            index = indexfile.read()
+        assert 'hunter2' not in index
+        assert 'session=abc' not in index
+
+    def test_user_tokens_not_shared(self, tmp_path):
+        CassetteHttp(FakeHttp(), Cassette(str(tmp_path), 'record')).request('https://example.com/x?access_token=user1')
+
+        # salt is kept with the cassette, so the same user's request replays
+        player = CassetteHttp(FakeHttp(), Cassette(str(tmp_path), 'replay'))
+        player.request('https://example.com/x?access_token=user1')
+        with pytest.raises(cassetteMiss):
+            player.request('https://example.com/x?access_token=user2')
+
+        with open(os.path.join(str(tmp_path), 'index.jsonl')) as indexfile:
+            assert 'user1' not in indexfile.read()
+
+    def test_identical_bodies_stored_once(self, tmp_path):
+        http = CassetteHttp(FakeHttp(), Cassette(str(tmp_path), 'record'))
+        http.request('https://example.com/x?key=1')
+        http.request('https://example.com/x?key=2')
+        objects = [f for _, _, files in os.walk(os.path.join(str(tmp_path), 'objects')) for f in files]
+        assert len(objects) == 1
+
+    def test_replay_miss_raises(self, tmp_path):
+        with pytest.raises(cassetteMiss):
+            CassetteHttp(FakeHttp(), Cassette(str(tmp_path), 'replay')).request('https://example.com/x')
+
+    def test_auto_records_misses(self, tmp_path):
+        http = FakeHttp()
+        auto = CassetteHttp(http, Cassette(str(tmp_path), 'auto'))
+        auto.request('https://example.com/x')
+        auto.request('https://example.com/x')
+        assert http.requests == ['https://example.com/x']
+        assert auto.cassette.hits == 1
+
+    def test_transient_failures_not_recorded(self, tmp_path):
+        thiscassette = Cassette(str(tmp_path), 'auto')
+        CassetteHttp(FakeHttp(status=503), thiscassette).request('https://example.com/x')
+        assert thiscassette.index == {}
+
+
+class TestCassetteSession:
+    @responses.activate
+    def test_record_then_replay(self, tmp_path):
+        responses.add(responses.GET, 'https://example.com/api', json={'a': 1}, status=200)
+        recorder = cassette.session(Cassette(str(tmp_path), 'record'), pool_maxsize=2)
+        assert recorder.get('https://example.com/api', params={'api_key': 'k'}).json() == {'a': 1}
+
+        player = cassette.session(Cassette(str(tmp_path), 'replay'))
+        r = player.get('https://example.com/api', params={'api_key': 'other'})
+        assert r.status_code == 200
+        assert r.json() == {'a': 1}
+        assert cassette.replayed(r.headers)
+        assert len(responses.calls) == 1
+
+
+class TestCurrent:
+    def test_configured_from_environment(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cassette, '_current', {})
+        monkeypatch.setenv(cassette.ENVDIRECTORY, str(tmp_path))
+        monkeypatch.setenv(cassette.ENVMODE, 'replay')
+        assert cassette.current().mode == 'replay'
+        assert isinstance(cassette.wraphttp(FakeHttp()), CassetteHttp)
+
+    def test_not_configured(self, monkeypatch):
+        monkeypatch.setattr(cassette, '_current', {})
+        monkeypatch.delenv(cassette.ENVDIRECTORY, raising=False)
+        http = FakeHttp()
+        assert cassette.wraphttp(http) is http
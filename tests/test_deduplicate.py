@@ -0,0 +1,97 @@
+'''
+tests for deduplicating age grade stats, compared with the previous deduplicate algorithm
+'''
+
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from running.agegradecolumns import AgeGradeColumns
+
+DISTANCES = [1609, 5000, 8047, 10000, 15000, 21097, 42195]
+
+
+def legacydeduplicate(stats):
+    '''
+    AnalyzeAgeGrade.deduplicate() before it was made a single pass, as in benchmarks/dedupbenchmark.py,
+    with index added to sort keys so that ties don't compare stat objects
+    '''
+    EPS = .1
+    decstats = sorted([((s.date,s.dist,i),s) for i,s in enumerate(stats)])
+    stats = [ds[1] for ds in decstats]
+
+    deduped = []
+    while len(stats) > 0:
+        thisstat = stats.pop(0)
+        sameraces = [(thisstat.priority,0,thisstat)]
+        while   len(stats) > 0 \
+                and thisstat.date == stats[0].date \
+                and abs((thisstat.dist - stats[0].dist) / thisstat.dist) <= EPS:
+            stat = stats.pop(0)
+            sameraces.append((stat.priority,len(sameraces),stat))
+        sameraces.sort()
+        deduped.append(sameraces[0][2])
+    return deduped
+
+
+def _rows(seed, nstats=300):
+    '''
+    synthetic stats, with few dates so there are many races on the same date at different distances,
+    repeats of earlier races at slightly different distances, some beyond the tolerance,
+    and few priorities so there are many ties
+    '''
+    rand = random.Random(seed)
+    dates = [datetime(2020, 1, 1) + timedelta(days=rand.randrange(365)) for i in range(nstats // 10)]
+    races = []
+    rows = []
+    for i in range(nstats):
+        if races and rand.random() < 0.4:
+            date, dist = rand.choice(races)
+            dist = rand.choice([dist, dist * rand.uniform(0.85, 1.15)])
+        else:
+            date = rand.choice(dates)
+            dist = rand.choice(DISTANCES)
+            races.append((date, dist))
+        rows.append({'date': date, 'dist': dist, 'time': dist / 3.5, 'race': 'race {}'.format(i),
+                     'priority': rand.choice([1, 2, 2])})
+    return rows
+
+
+def _legacyraces(rows):
+    return [stat.race for stat in legacydeduplicate([SimpleNamespace(**row) for row in rows])]
+
+
+class TestColumnsDeduplicate:
+    @pytest.mark.parametrize('seed', range(20))
+    def test_matches_legacy(self, seed):
+        rows = _rows(seed)
+        expected = _legacyraces(rows)
+        assert len(expected) < len(rows)
+        assert AgeGradeColumns(rows).deduplicate().values('race').tolist() == expected
+
+    def test_same_date_different_distance(self):
+        date = datetime(2025, 5, 3)
+        rows = [{'date': date, 'dist': dist, 'time': dist / 4, 'race': str(dist), 'priority': priority}
+                for dist, priority in [(10000, 2), (5000, 1), (10200, 1), (5000, 1), (1609, 3)]]
+        expected = _legacyraces(rows)
+        assert expected == ['1609', '5000', '10200']
+        assert AgeGradeColumns(rows).deduplicate().values('race').tolist() == expected
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+class TestAnalyzeAgeGradeDeduplicate:
+    @pytest.mark.parametrize('seed', range(5))
+    def test_matches_legacy(self, columnar, seed):
+        # analyzeagegrade needs runningclub and the running.running package
+        analyzeagegrade = pytest.importorskip('running.analyzeagegrade', exc_type=ImportError)
+        aag = analyzeagegrade.AnalyzeAgeGrade(columnar=columnar)
+        aag.set_runner('synthetic runner')
+        for row in _rows(seed):
+            aag.add_stat(**row)
+        expected = [stat.race for stat in legacydeduplicate(aag.get_stats())]
+        aag.deduplicate()
+        assert [stat.race for stat in aag.get_stats()] == expected
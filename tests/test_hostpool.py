@@ -0,0 +1,59 @@
+'''
+tests for running.hostpool
+'''
+
+import random
+import threading
+import time
+
+from running.hostpool import HostLimiter, ThreadLocalHttp, orderedmap
+
+
+class FakeHttp:
+    '''
+    records the most concurrent requests seen
+    '''
+    active = 0
+    mostactive = 0
+    lock = threading.Lock()
+
+    def request(self, uri):
+        with FakeHttp.lock:
+            FakeHttp.active += 1
+            FakeHttp.mostactive = max(FakeHttp.mostactive, FakeHttp.active)
+        time.sleep(0.02)
+        with FakeHttp.lock:
+            FakeHttp.active -= 1
+        return id(self), uri
+
+
+class TestOrderedMap:
+    def test_results_in_input_order(self):
+        def slow(i):
+            time.sleep(random.random() / 100)
+            return i * i
+        assert list(orderedmap(slow, range(50), workers=8)) == [i * i for i in range(50)]
+
+    def test_single_worker(self):
+        assert list(orderedmap(str, [3, 1, 2])) == ['3', '1', '2']
+
+
+class TestThreadLocalHttp:
+    def test_limits_requests_per_host(self):
+        http = ThreadLocalHttp(FakeHttp, limiter=HostLimiter(maxperhost=2))
+        results = list(orderedmap(lambda i: http.request('https://example.com/{}'.format(i)), range(12), workers=6))
+        assert FakeHttp.mostactive == 2
+        assert [uri for httpid, uri in results] == ['https://example.com/{}'.format(i) for i in range(12)]
+
+    def test_separate_http_per_thread(self):
+        created = []
+        def factory():
+            created.append(FakeHttp())
+            return created[-1]
+        http = ThreadLocalHttp(factory)
+        http.request('https://example.com')
+        http.request('https://example.com')
+        thread = threading.Thread(target=lambda: http.request('https://example.com'))
+        thread.start()
+        thread.join()
+        assert len(created) == 2
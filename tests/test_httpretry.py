@@ -0,0 +1,216 @@
+'''
+tests for running.httpretry
+'''
+
+import pytest
+
+from running.httpretry import RetryPolicy, CircuitBreakers, RetryMetrics, circuitOpen, httpStatusError, FAILUREWINDOW
+
+URL = 'https://example.com/path?x=1'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Flaky:
+    '''
+    fails the given number of times, then succeeds
+    '''
+    def __init__(self, failures, error=None):
+        self.failures = failures
+        self.error = error or IOError('down')
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return 'ok'
+
+
+def _policy(clock, failurethreshold=100, failurewindow=0, **kwargs):
+    breakers = CircuitBreakers(failurethreshold=failurethreshold, resettimeout=60, clock=clock, failurewindow=failurewindow)
+    return RetryPolicy(breakers=breakers, metrics=RetryMetrics(), sleep=clock.sleep, random=lambda: 1.0, **kwargs)
+
+
+class TestRetryPolicy:
+    def test_exponential_backoff_capped(self):
+        clock = FakeClock()
+        policy = _policy(clock, maxretries=6, basedelay=1, maxdelay=10)
+        assert policy.call(URL, Flaky(6)) == 'ok'
+        assert clock.sleeps == [1, 2, 4, 8, 10, 10]
+
+    def test_jitter(self):
+        clock = FakeClock()
+        policy = _policy(clock, basedelay=4)
+        policy.random = lambda: 0.25
+        policy.call(URL, Flaky(2))
+        assert clock.sleeps == [1.0, 2.0]
+
+    def test_retries_exceeded(self):
+        clock = FakeClock()
+        policy = _policy(clock, maxretries=2)
+        func = Flaky(10)
+        with pytest.raises(IOError):
+            policy.call(URL, func)
+        assert func.calls == 3
+        assert policy.metrics.snapshot()['example.com'] == {'requests': 3, 'retries': 2, 'failures': 3,
+                                                            'circuitopened': 0, 'rejected': 0}
+
+
+class TestCircuitBreaker:
+    def test_opens_and_fails_fast(self):
+        clock = FakeClock()
+        policy = _policy(clock, failurethreshold=3, maxretries=10)
+        func = Flaky(100)
+        with pytest.raises(IOError):
+            policy.call(URL, func)
+        assert func.calls == 3
+        assert policy.breakers.openhosts() == ['example.com']
+
+        with pytest.raises(circuitOpen):
+            policy.call(URL, func)
+        assert func.calls == 3
+        counts = policy.metrics.snapshot()['example.com']
+        assert (counts['circuitopened'], counts['rejected']) == (1, 1)
+
+    def test_attempts_counted_across_calls(self):
+        clock = FakeClock()
+        policy = _policy(clock, failurethreshold=3, maxretries=1)
+        func = Flaky(100)
+        with pytest.raises(IOError):
+            policy.call(URL, func)
+        with pytest.raises(IOError):
+            policy.call(URL, func)
+        assert func.calls == 3
+        assert policy.breakers.openhosts() == ['example.com']
+
+    def test_short_outage_retried_through(self):
+        clock = FakeClock()
+        policy = _policy(clock, failurethreshold=3, failurewindow=30, maxretries=10)
+        func = Flaky(4)
+        assert policy.call(URL, func) == 'ok'
+        assert clock.sleeps == [1, 2, 4, 8]
+        assert policy.breakers.openhosts() == []
+
+    def test_opens_after_failure_window(self):
+        clock = FakeClock()
+        policy = _policy(clock, failurethreshold=3, failurewindow=30, maxretries=10)
+        func = Flaky(100)
+        with pytest.raises(IOError):
+            policy.call(URL, func)
+        # attempts at 0, 1, 3, 7, 15, 31 seconds
+        assert func.calls == 6
+        assert policy.breakers.openhosts() == ['example.com']
+
+    def test_success_resets_failures(self):
+        clock = FakeClock()
+        policy = _policy(clock, failurethreshold=2, maxretries=0)
+        with pytest.raises(IOError):
+            policy.call(URL, Flaky(1))
+        assert policy.call(URL, Flaky(0)) == 'ok'
+        with pytest.raises(IOError):
+            policy.call(URL, Flaky(1))
+        assert policy.breakers.openhosts() == []
+
+    def test_trial_after_reset_timeout(self):
+        clock = FakeClock()
+        policy = _policy(clock, failurethreshold=2, maxretries=10)
+        with pytest.raises(IOError):
+            policy.call(URL, Flaky(100))
+        assert policy.breakers.openhosts() == ['example.com']
+
+        # failed trial opens circuit again immediately
+        clock.now += 60
+        func = Flaky(1)
+        with pytest.raises(IOError):
+            policy.call(URL, func)
+        assert func.calls == 1
+        with pytest.raises(circuitOpen):
+            policy.call(URL, func)
+
+        # successful trial closes circuit
+        clock.now += 60
+        assert policy.call(URL, func) == 'ok'
+        assert policy.breakers.openhosts() == []
+
+    def test_hosts_independent(self):
+        clock = FakeClock()
+        policy = _policy(clock, failurethreshold=1, maxretries=0)
+        with pytest.raises(IOError):
+            policy.call(URL, Flaky(1))
+        assert policy.call('https://other.example.com/', Flaky(0)) == 'ok'
+
+
+class TestClientErrors:
+    def test_not_retried_or_counted(self):
+        clock = FakeClock()
+        policy = _policy(clock, failurethreshold=1, maxretries=10)
+        func = Flaky(100, error=httpStatusError(404, 'URL response status = 404'))
+        for i in range(3):
+            with pytest.raises(httpStatusError):
+                policy.call(URL, func)
+        assert func.calls == 3
+        assert clock.sleeps == []
+        assert policy.breakers.openhosts() == []
+        assert policy.metrics.snapshot()['example.com']['failures'] == 0
+
+    def test_too_many_requests_retried(self):
+        clock = FakeClock()
+        policy = _policy(clock, maxretries=10)
+        func = Flaky(2, error=httpStatusError(429, 'URL response status = 429'))
+        assert policy.call(URL, func) == 'ok'
+        assert func.calls == 3
+
+    def test_server_error_retried(self):
+        clock = FakeClock()
+        policy = _policy(clock, maxretries=10)
+        assert policy.call(URL, Flaky(2, error=httpStatusError(503, 'URL response status = 503'))) == 'ok'
+
+
+class TestDefaults:
+    def _athlinkspolicy(self, clock, jitter):
+        # default breaker, with athlinks' retries and delays
+        athlinks = pytest.importorskip('running.athlinks')
+        policy = athlinks.Athlinks(key='testkey').retry
+        policy.breakers = CircuitBreakers(clock=clock)
+        policy.metrics = RetryMetrics()
+        policy.sleep = clock.sleep
+        policy.random = lambda: jitter
+        return policy
+
+    @pytest.mark.parametrize('jitter', [1.0, 0.5])
+    def test_dead_host_rejected_quickly(self, jitter):
+        clock = FakeClock()
+        policy = self._athlinkspolicy(clock, jitter)
+        func = Flaky(1000)
+        started = clock.now
+        with pytest.raises(IOError):
+            policy.call(URL, func)
+        assert policy.breakers.openhosts() == ['example.com']
+        assert func.calls <= 8
+        assert clock.now - started <= FAILUREWINDOW + policy.maxdelay
+
+        # later calls fail without a request or any wait
+        with pytest.raises(circuitOpen):
+            policy.call(URL, func)
+        assert func.calls <= 8
+        assert clock.now - started <= FAILUREWINDOW + policy.maxdelay
+
+    def test_transient_failures_retried(self):
+        clock = FakeClock()
+        policy = self._athlinkspolicy(clock, 1.0)
+        func = Flaky(4)
+        assert policy.call(URL, func) == 'ok'
+        assert clock.sleeps == [1, 2, 4, 8]
+        assert policy.breakers.openhosts() == []
@@ -0,0 +1,43 @@
+'''
+tests for running.membershipintervals.removeoverlaps
+'''
+
+from running.membershipintervals import removeoverlaps
+
+
+def _sweep(intervals, **kwargs):
+    intervals = [list(i) for i in intervals]
+    kept = removeoverlaps(intervals,
+                          getstart=lambda i: i[0],
+                          getend=lambda i: i[1],
+                          newstart=lambda lastend: lastend + 1,
+                          setstart=lambda i, start: i.__setitem__(0, start),
+                          **kwargs)
+    return [tuple(i) for i in kept]
+
+
+class TestRemoveOverlaps:
+    def test_no_overlaps_sorted(self):
+        assert _sweep([(20, 29), (0, 9), (10, 19)]) == [(0, 9), (10, 19), (20, 29)]
+
+    def test_pair_overlap(self):
+        assert _sweep([(0, 10), (5, 20)]) == [(0, 10), (11, 20)]
+
+    def test_chain_of_three(self):
+        # third interval overlaps both earlier intervals
+        assert _sweep([(0, 10), (5, 20), (1, 30)]) == [(0, 10), (11, 20), (21, 30)]
+
+    def test_contained_kept_without_toss(self):
+        assert _sweep([(0, 20), (5, 20)]) == [(0, 20), (21, 20)]
+
+    def test_contained_tossed(self):
+        assert _sweep([(0, 20), (5, 20), (10, 30)], toss=True) == [(0, 20), (21, 30)]
+
+    def test_onoverlap(self):
+        overlaps = []
+        _sweep([(0, 10), (5, 10), (8, 20)], toss=True,
+               onoverlap=lambda last, this, start, tossed: overlaps.append((tuple(last), tuple(this), start, tossed)))
+        assert overlaps == [((0, 10), (5, 10), 11, True), ((0, 10), (8, 20), 11, False)]
+
+    def test_empty(self):
+        assert _sweep([]) == []
@@ -0,0 +1,56 @@
+'''
+tests for running.parseralogxml
+'''
+
+from csv import DictReader
+from io import BytesIO, StringIO
+
+from running.parseralogxml import iterevents, xml2csv
+
+LOG = b'''<?xml version="1.0"?>
+<RunningAHEADLog{ns}>
+  <EquipmentCollection><Equipment id="e1">Shoes</Equipment></EquipmentCollection>
+  <EventCollection>
+    <Event time="2015-03-01T06:30:00Z" typeName="Run" subtypeName="Easy">
+      <Duration seconds="1800"/>
+      <Distance unit="km">5</Distance>
+      <Equipment id="e1">Shoes</Equipment>
+      <Route id="r1">Loop</Route>
+      <EnvironmentalConditions><Temperature unit="F">45</Temperature></EnvironmentalConditions>
+      <Notes>felt good</Notes>
+    </Event>
+    <Event time="2015-03-02T07:00:00Z" typeName="Swim"><Duration seconds="900"/></Event>
+    <Event time="2015-03-03" typeName="Walk"><Distance unit="mi">2</Distance></Event>
+  </EventCollection>
+</RunningAHEADLog>
+'''
+
+
+def _convert(log):
+    out = StringIO()
+    xml2csv(BytesIO(log), out)
+    return list(DictReader(StringIO(out.getvalue())))
+
+
+class TestXml2Csv:
+    def test_rows(self):
+        rows = _convert(LOG.replace(b'{ns}', b''))
+        assert len(rows) == 2
+        assert rows[0] == {'date': '2015-03-01', 'time': '06:30:00', 'type': 'Run', 'subtype': 'Easy',
+                           'dist': str(5 / 1.609344), 'duration': '0:30:00', 'equipment': 'Shoes',
+                           'route': 'Loop', 'temp': '45', 'notes': 'felt good'}
+        assert rows[1] == {'date': '2015-03-03', 'time': '', 'type': 'Walk', 'subtype': '', 'dist': '2.0',
+                           'duration': '', 'equipment': '', 'route': '', 'temp': '', 'notes': ''}
+
+    def test_namespace_ignored(self):
+        plain = _convert(LOG.replace(b'{ns}', b''))
+        namespaced = _convert(LOG.replace(b'{ns}', b' xmlns="http://www.runningahead.com/log"'))
+        assert namespaced == plain
+
+
+class TestIterEvents:
+    def test_events_in_file_order(self):
+        seen = []
+        for event in iterevents(BytesIO(LOG.replace(b'{ns}', b''))):
+            seen.append(event.get('typeName'))
+        assert seen == ['Run', 'Swim', 'Walk']
@@ -0,0 +1,50 @@
+'''
+tests for running.racedistance
+'''
+
+import pytest
+
+from running.racedistance import parseevent, MPERMILE, MARATHONMILES, HALFMARATHONMILES
+
+
+class TestParseEvent:
+    def test_kilometers(self):
+        event = parseevent(' Hill Race - 50K ')
+        assert event.text == 'Hill Race - 50K'
+        assert event.racename == 'Hill Race'
+        assert event.distkm == 50
+        assert event.distmiles == pytest.approx(50000 / MPERMILE)
+        assert event.hours is None
+
+    def test_hyphen_in_racename(self):
+        event = parseevent('Big-Hill Race - 100 Miler')
+        assert event.racename == 'Big-Hill Race'
+        assert event.distmiles == 100
+
+    @pytest.mark.parametrize('distfield, miles', [
+        ('Marathon', MARATHONMILES),
+        ('Half Marathon', HALFMARATHONMILES),
+        ('1/2 Marathon', HALFMARATHONMILES),
+        ('26 Miler', MARATHONMILES),
+        ('13 Miler', HALFMARATHONMILES),
+    ])
+    def test_marathons(self, distfield, miles):
+        event = parseevent('Race - ' + distfield)
+        assert event.distmiles == miles
+        assert event.distkm == pytest.approx(miles * MPERMILE / 1000)
+
+    def test_timed(self):
+        event = parseevent('Race - 24hrs')
+        assert event.hours == 24
+        assert event.distmiles is None and event.distkm is None
+
+    @pytest.mark.parametrize('distfield', ['50.5K', '10M', '24 hrs', ''])
+    def test_not_recognized(self, distfield):
+        event = parseevent('Race - ' + distfield)
+        assert event.distmiles is None and event.distkm is None and event.hours is None
+
+    def test_memoized(self):
+        parseevent.cache_clear()
+        parseevent('Race - 50K')
+        parseevent('Race - 50K')
+        assert parseevent.cache_info().hits == 1
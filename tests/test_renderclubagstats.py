@@ -0,0 +1,83 @@
+'''
+tests for running.renderclubagstats parallel rendering
+'''
+
+import csv
+import itertools
+import pickle
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+# renderclubagstats needs the IPython and runningclub versions it was written against
+rc = pytest.importorskip('running.renderclubagstats', exc_type=ImportError)
+from running.renderclubagstats import RenderParams, renderrunner, render, initaagrunner
+
+NAMES = ['zed', 'amy', 'kim', 'bob', 'lee']
+BEGINDATE = datetime(2010, 1, 1)
+ENDDATE = datetime(2015, 12, 31, 23, 59, 59)
+
+
+def _aag(columnar=False):
+    '''
+    synthetic club, runners added out of name order
+    '''
+    rand = random.Random(5)
+    aag = {}
+    for k, name in enumerate(NAMES):
+        initaagrunner(aag, name, 'MF'[k % 2], datetime(1950 + 6*k, 1 + k, 1 + k), columnar=columnar)
+        for i in range(rand.randrange(10, 40)):
+            dist = rand.choice([1609, 5000, 10000, 21097, 42195])
+            aag[name].add_stat(BEGINDATE + timedelta(days=rand.randrange(6*365)), dist, dist / rand.uniform(3, 4.5),
+                               race='race {}'.format(rand.randrange(20)), source=rand.choice(['athlinks', 'clubraces']),
+                               priority=rand.randint(1, 3))
+    return aag
+
+
+def _crunched():
+    aag = _aag()
+    runners = [aag[name] for name in sorted(aag)]
+    for runner in runners:
+        runner.deduplicate()
+    rc.analyzeagegrade.crunchall(runners)
+    return runners
+
+
+def _params(tmp_path):
+    return RenderParams(str(tmp_path / '{who}.png'), 25, 3, 5, BEGINDATE, ENDDATE, True)
+
+
+class TestParallelRender:
+    def test_payload_pickles(self, tmp_path):
+        params = _params(tmp_path)
+        runner = _crunched()[0]
+        copyrunner, copyparams = pickle.loads(pickle.dumps((runner, params)))
+        assert copyparams == params
+        assert renderrunner(copyrunner, copyparams) == renderrunner(runner, params)
+
+    def test_pool_matches_serial(self, tmp_path):
+        params = _params(tmp_path)
+        runners = _crunched()
+        serial = [renderrunner(runner, params) for runner in runners]
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            pooled = list(executor.map(renderrunner, runners, itertools.repeat(params), chunksize=2))
+        assert pooled == serial
+        assert any(summout for detlrows, summout, chart in serial)
+
+    def test_render_processes(self, tmp_path):
+        outputs = {}
+        for processes in [1, 2]:
+            summfile = tmp_path / 'summ{}.csv'.format(processes)
+            detlfile = tmp_path / 'detl{}.csv'.format(processes)
+            render(_aag(), str(tmp_path / '{who}.png'), str(summfile), str(detlfile),
+                   25, 3, 5, BEGINDATE, ENDDATE, summaryonly=True, processes=processes)
+            outputs[processes] = [summfile.read_text(), detlfile.read_text()]
+        assert outputs[2] == outputs[1]
+
+        # detail rows are in name order
+        with open(str(tmp_path / 'detl2.csv'), newline='') as detlf:
+            names = [row['name'] for row in csv.DictReader(detlf)]
+        assert names == sorted(names)
+        assert set(names) == {name.title() for name in NAMES}
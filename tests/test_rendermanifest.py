@@ -0,0 +1,133 @@
+'''
+tests for running.rendermanifest
+'''
+
+import collections
+import os
+from datetime import datetime
+
+import pytest
+
+from running.rendermanifest import runnerdigest, makeentry, readmanifest, writemanifest, unchanged, plan
+
+# same fields as renderclubagstats.RenderParams
+RenderParams = collections.namedtuple('RenderParams', 'outfile,minagegrade,minraces,mintrend,begindate,enddate,summaryonly')
+
+PARAMS = RenderParams('{who}.png', 25, 3, 5, datetime(2010, 1, 1), datetime(2015, 12, 31, 23, 59, 59), False)
+RUNNER = ('jane doe', 'F', datetime(1970, 5, 3))
+NAMES = ['ann', 'bob', 'cal']
+
+
+def _digests(params=PARAMS, statsdigests=None):
+    statsdigests = statsdigests or {}
+    return {name: runnerdigest((name, 'F', datetime(1970, 5, 3)), params, statsdigests.get(name, 'stats-' + name))
+            for name in NAMES}
+
+
+@pytest.fixture
+def rendered(tmp_path):
+    '''
+    manifest as written after rendering every runner, with charts on disk
+    '''
+    digests = _digests()
+    manifest = {}
+    for name in NAMES:
+        chart = str(tmp_path / '{}.png'.format(name))
+        with open(chart, 'w') as chartf:
+            chartf.write('png')
+        manifest[name] = makeentry(name, digests[name], {'name': name, 'age': 50}, chart)
+    manifestfile = str(tmp_path / 'manifest.jsonl')
+    writemanifest(manifestfile, manifest)
+    return manifestfile
+
+
+class TestRunnerDigest:
+    def test_stable(self):
+        assert runnerdigest(RUNNER, PARAMS, 'abc') == runnerdigest(list(RUNNER), PARAMS, 'abc')
+
+    @pytest.mark.parametrize('change', [{'minagegrade': 30}, {'minraces': 4}, {'mintrend': 6},
+                                        {'begindate': datetime(2011, 1, 1)}, {'enddate': datetime(2016, 12, 31)},
+                                        {'outfile': '{who}-{date}.png'}])
+    def test_params_change(self, change):
+        assert runnerdigest(RUNNER, PARAMS._replace(**change), 'abc') != runnerdigest(RUNNER, PARAMS, 'abc')
+
+    def test_summaryonly_ignored(self):
+        assert runnerdigest(RUNNER, PARAMS._replace(summaryonly=True), 'abc') == runnerdigest(RUNNER, PARAMS, 'abc')
+
+    def test_runner_and_stats_change(self):
+        assert runnerdigest(RUNNER, PARAMS, 'abd') != runnerdigest(RUNNER, PARAMS, 'abc')
+        assert runnerdigest(('jane doe', 'F', datetime(1970, 5, 4)), PARAMS, 'abc') != runnerdigest(RUNNER, PARAMS, 'abc')
+
+
+class TestPlan:
+    def test_unchanged_runners_reused(self, rendered):
+        manifest = readmanifest(rendered)
+        reused, torender = plan(NAMES, manifest, _digests(), False)
+        assert torender == []
+        assert reused == manifest
+        assert reused['bob']['summary'] == {'name': 'bob', 'age': 50}
+
+    def test_changed_stats_rendered(self, rendered):
+        reused, torender = plan(NAMES, readmanifest(rendered), _digests(statsdigests={'bob': 'new'}), False)
+        assert torender == ['bob']
+        assert sorted(reused) == ['ann', 'cal']
+
+    @pytest.mark.parametrize('change', [{'minagegrade': 30}, {'begindate': datetime(2011, 1, 1)},
+                                        {'enddate': datetime(2016, 12, 31)}, {'minraces': 4}, {'mintrend': 6}])
+    def test_changed_params_render_all(self, rendered, change):
+        reused, torender = plan(NAMES, readmanifest(rendered), _digests(PARAMS._replace(**change)), False)
+        assert (reused, torender) == ({}, NAMES)
+
+    def test_missing_chart_rendered(self, rendered):
+        manifest = readmanifest(rendered)
+        os.remove(manifest['cal']['chart'])
+        reused, torender = plan(NAMES, manifest, _digests(), False)
+        assert torender == ['cal']
+
+    def test_new_runner_rendered(self, rendered):
+        manifest = readmanifest(rendered)
+        del manifest['ann']
+        assert plan(NAMES, manifest, _digests(), False)[1] == ['ann']
+
+    def test_filtered_runner_reused_without_chart(self, rendered):
+        manifest = readmanifest(rendered)
+        manifest['ann'] = makeentry('ann', manifest['ann']['hash'], None, None)
+        assert plan(NAMES, manifest, _digests(), False)[1] == []
+
+    def test_summaryonly(self, rendered):
+        manifest = readmanifest(rendered)
+
+        # charts aren't needed for summary only
+        os.remove(manifest['cal']['chart'])
+        reused, torender = plan(NAMES, manifest, _digests(PARAMS._replace(summaryonly=True)), True)
+        assert (sorted(reused), torender) == (NAMES, [])
+
+        # runner last rendered summary only needs a chart when charts are rendered
+        manifest['bob'] = makeentry('bob', manifest['bob']['hash'], manifest['bob']['summary'], None)
+        assert plan(NAMES, manifest, _digests(), False)[1] == ['bob', 'cal']
+        assert plan(NAMES, manifest, _digests(), True)[1] == []
+
+
+class TestReadManifest:
+    def test_roundtrip(self, rendered, tmp_path):
+        manifest = readmanifest(rendered)
+        assert sorted(manifest) == NAMES
+        copy = str(tmp_path / 'copy.jsonl')
+        writemanifest(copy, manifest)
+        assert readmanifest(copy) == manifest
+
+    def test_missing(self, tmp_path):
+        manifest = readmanifest(str(tmp_path / 'missing.jsonl'))
+        assert manifest == {}
+        assert plan(NAMES, manifest, _digests(), False) == ({}, NAMES)
+
+    @pytest.mark.parametrize('corruption', ['{"name": "ann", "hash": "x"', 'garbage\n', '{"name": "ann"}\n', '[1, 2]\n'])
+    def test_corrupt_renders_all(self, rendered, corruption):
+        with open(rendered, 'a') as manifestf:
+            manifestf.write(corruption)
+        manifest = readmanifest(rendered)
+        assert manifest == {}
+        assert plan(NAMES, manifest, _digests(), False) == ({}, NAMES)
+
+    def test_unchanged_without_entry(self):
+        assert not unchanged(None, 'abc', False)
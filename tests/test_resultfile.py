@@ -0,0 +1,105 @@
+'''
+tests for running.resultfile
+'''
+
+import datetime
+
+import pytest
+
+from running import parameterError
+from running.resultfile import ResultFile, ResultSchema, asciitext
+
+
+class Result:
+    pass
+
+
+class SampleResultFile(ResultFile):
+    schema = ResultSchema([
+        ('Name', 'name', 'text'),
+        ('DOB', 'dob', 'date'),
+        ('Gender', 'gender', 'gender'),
+        ('age', 'age', 'int'),
+        ('km', 'km', 'float'),
+        ('id', 'id', 'num'),
+        ('time', 'time', 'text'),
+    ], textfn=asciitext)
+    resultclass = Result
+
+
+def writefile(tmp_path, lines):
+    path = tmp_path / 'results.csv'
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+ROWS = [
+    'Name,DOB,Gender,age,km,id,time,extra',
+    ' José Smith ,1960-01-02,Male,54,5,12,0:25:00,x',
+    'Ann Jones,1960-01-02,Female,,10.5,1.5,0:50:00,y',
+    'Bob Brown,1970-03-04,M,44,21.1,abc,1:40:00',
+]
+
+
+class TestResultFile:
+    def test_converts_columns(self, tmp_path):
+        resultfile = SampleResultFile(writefile(tmp_path, ROWS))
+        resultfile.open()
+        results = list(resultfile)
+        resultfile.close()
+
+        assert [r.name for r in results] == ['José Smith', 'Ann Jones', 'Bob Brown']
+        assert results[0].dob == datetime.datetime(1960, 1, 2)
+        assert [r.gender for r in results] == ['M', 'F', 'M']
+        assert results[0].age == 54 and results[1].age == ''
+        assert results[0].km == 5.0 and isinstance(results[0].km, float)
+        assert [r.id for r in results] == [12, 1.5, 'abc']
+        assert results[2].time == '1:40:00'
+
+    def test_dates_parsed_once(self, tmp_path):
+        resultfile = SampleResultFile(writefile(tmp_path, ROWS))
+        resultfile.open()
+        first, second, third = resultfile
+        assert first.dob is second.dob
+
+    def test_iterator_protocol(self, tmp_path):
+        resultfile = SampleResultFile(writefile(tmp_path, ROWS[:2]))
+        resultfile.open()
+        next(resultfile)
+        with pytest.raises(StopIteration):
+            next(resultfile)
+
+    def test_readbatch(self, tmp_path):
+        resultfile = SampleResultFile(writefile(tmp_path, ROWS))
+        resultfile.open()
+        assert [r.name for r in resultfile.readbatch(2)] == ['José Smith', 'Ann Jones']
+        assert [r.name for r in resultfile.readbatch(2)] == ['Bob Brown']
+        assert resultfile.readbatch(2) == []
+
+    def test_blank_lines_skipped(self, tmp_path):
+        lines = ROWS[:2] + [''] + ROWS[2:3] + ['', ''] + ROWS[3:] + ['']
+        resultfile = SampleResultFile(writefile(tmp_path, lines))
+        resultfile.open()
+        assert [r.name for r in resultfile] == ['José Smith', 'Ann Jones', 'Bob Brown']
+        resultfile.close()
+
+        resultfile.open()
+        assert [r.name for r in resultfile.readbatch(2)] == ['José Smith', 'Ann Jones']
+        assert [r.name for r in resultfile.readbatch(2)] == ['Bob Brown']
+        assert resultfile.readbatch(2) == []
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / 'empty.csv'
+        path.write_text('')
+        resultfile = SampleResultFile(str(path))
+        resultfile.open()
+        assert list(resultfile) == []
+
+    def test_missing_column(self, tmp_path):
+        resultfile = SampleResultFile(writefile(tmp_path, ['Name,DOB', 'a,1960-01-01']))
+        with pytest.raises(parameterError):
+            resultfile.open()
+
+    def test_invalid_kind(self):
+        with pytest.raises(parameterError):
+            ResultSchema([('a', 'a', 'bogus')])
@@ -0,0 +1,165 @@
+'''
+tests for running.runningahead.RunningAhead workout cache
+'''
+
+import json
+import os
+from datetime import date
+
+import pytest
+
+from running import runningahead
+from running.runningahead import RunningAhead, _writecachefile
+
+
+class FakeOAuth2Session:
+    def __init__(self, client=None):
+        pass
+
+    def fetch_token(self, **kwargs):
+        return {'access_token': 'clientcredentials'}
+
+
+class FakeRunningAheadLog:
+    '''
+    stands in for RunningAhead._raget, serving each user's workouts
+    '''
+    def __init__(self):
+        self.workouts = {}
+        self.requests = []
+
+    def add(self, token, id, date):
+        self.workouts.setdefault(token, {})[id] = {'id': id, 'date': date, 'workoutName': 'Race'}
+
+    def __call__(self, method, accesstoken, **payload):
+        assert method == 'logs/me/workouts'
+        filters = json.loads(payload.get('filters', '[]'))
+        self.requests.append(filters)
+        workouts = sorted(self.workouts.get(accesstoken, {}).values(), key=lambda wo: wo['date'])
+        for field, op, value in filters:
+            assert (field, op) == ('date', 'ge')
+            workouts = [wo for wo in workouts if wo['date'] >= value]
+        offset = payload['offset']
+        return {'numEntries': len(workouts), 'entries': workouts[offset:offset+payload['limit']]}
+
+
+class FakeDate(date):
+    today_ = date(2026, 3, 1)
+
+    @classmethod
+    def today(cls):
+        return cls.today_
+
+
+@pytest.fixture
+def ralog(monkeypatch):
+    monkeypatch.setattr(runningahead, 'OAuth2Session', FakeOAuth2Session)
+    monkeypatch.setattr(runningahead, 'date', FakeDate)
+    monkeypatch.setattr(FakeDate, 'today_', date(2026, 3, 1))
+    ralog = FakeRunningAheadLog()
+    monkeypatch.setattr(RunningAhead, '_raget', lambda self, method, accesstoken, **payload: ralog(method, accesstoken, **payload))
+    return ralog
+
+
+def _ra(cachefile):
+    return RunningAhead(key='key', secret='secret', workoutcachefilename=str(cachefile))
+
+
+class TestWorkoutCache:
+    def test_first_sync_gets_everything(self, ralog, tmp_path):
+        ralog.add('tok', 1, '2020-01-01')
+        ralog.add('tok', 2, '2026-02-27')
+        ra = _ra(tmp_path / 'wo.cache')
+        assert [wo['id'] for wo in ra.listcachedworkouts('tok')] == [1, 2]
+        assert ralog.requests == [[]]
+
+    def test_synced_once_per_session(self, ralog, tmp_path):
+        ralog.add('tok', 1, '2020-01-01')
+        ra = _ra(tmp_path / 'wo.cache')
+        ra.listcachedworkouts('tok')
+        ra.listcachedworkouts('tok', begindate='2019-01-01')
+        assert len(ralog.requests) == 1
+
+    def test_incremental_after_reopen(self, ralog, tmp_path):
+        cachefile = tmp_path / 'wo.cache'
+        ralog.add('tok', 1, '2020-01-01')
+        ra = _ra(cachefile)
+        ra.listcachedworkouts('tok')
+        ra.close()
+
+        # next day, a new workout and one logged a few days late
+        FakeDate.today_ = date(2026, 3, 2)
+        ralog.add('tok', 2, '2026-02-26')
+        ralog.add('tok', 3, '2026-03-02')
+        ra = _ra(cachefile)
+        assert [wo['id'] for wo in ra.listcachedworkouts('tok')] == [1, 2, 3]
+        assert ralog.requests[-1] == [['date', 'ge', '2026-02-22']]
+
+    def test_begindate_enddate(self, ralog, tmp_path):
+        for id, wodate in enumerate(['2025-12-31', '2026-01-01', '2026-01-31', '2026-02-01']):
+            ralog.add('tok', id, wodate)
+        ra = _ra(tmp_path / 'wo.cache')
+        workouts = ra.listcachedworkouts('tok', begindate='2026-01-01', enddate='2026-01-31')
+        assert [wo['date'] for wo in workouts] == ['2026-01-01', '2026-01-31']
+
+    def test_periodic_full_sync(self, ralog, tmp_path):
+        cachefile = tmp_path / 'wo.cache'
+        ralog.add('tok', 1, '2020-01-01')
+        ralog.add('tok', 2, '2026-02-01')
+        ra = _ra(cachefile)
+        ra.listcachedworkouts('tok')
+        ra.close()
+
+        # workout deleted, and old workout logged very late
+        del ralog.workouts['tok'][2]
+        ralog.add('tok', 3, '2021-06-01')
+
+        # incremental sync doesn't see these
+        FakeDate.today_ = date(2026, 3, 10)
+        ra = _ra(cachefile)
+        assert [wo['id'] for wo in ra.listcachedworkouts('tok')] == [1, 2]
+        ra.close()
+
+        # full sync does
+        FakeDate.today_ = date(2026, 3, 1 + runningahead.WORKOUTFULLSYNCDAYS)
+        ra = _ra(cachefile)
+        assert [wo['id'] for wo in ra.listcachedworkouts('tok')] == [1, 3]
+        assert ralog.requests[-1] == []
+
+    def test_full_sync_requested(self, ralog, tmp_path):
+        ralog.add('tok', 1, '2020-01-01')
+        ra = _ra(tmp_path / 'wo.cache')
+        ra.syncworkouts('tok')
+        del ralog.workouts['tok'][1]
+        ra.syncworkouts('tok', full=True)
+        assert ra.listcachedworkouts('tok') == []
+
+    def test_users_kept_separately(self, ralog, tmp_path):
+        cachefile = tmp_path / 'wo.cache'
+        ralog.add('tok1', 1, '2020-01-01')
+        ralog.add('tok2', 2, '2020-01-02')
+        ra = _ra(cachefile)
+        ra.listcachedworkouts('tok1')
+        ra.listcachedworkouts('tok2')
+        ra.close()
+
+        ra = _ra(cachefile)
+        assert sorted(ra.workoutcache) == ['tok1', 'tok2']
+        assert list(ra.workoutcache['tok2']['workouts']) == ['2']
+
+    def test_not_written_if_not_updated(self, ralog, tmp_path):
+        cachefile = tmp_path / 'wo.cache'
+        ra = _ra(cachefile)
+        ra.close()
+        assert not cachefile.exists()
+
+
+class TestWriteCacheFile:
+    def test_replaces_file(self, tmp_path):
+        cachefile = tmp_path / 'some.cache'
+        cachefile.write_text('old\n')
+        os.chmod(cachefile, 0o640)
+        _writecachefile(str(cachefile), [{'a': 1}, {'b': 2}], '.tmpcache')
+        assert [json.loads(line) for line in cachefile.read_text().splitlines()] == [{'a': 1}, {'b': 2}]
+        assert os.stat(cachefile).st_mode & 0o777 == 0o640
+        assert [f.name for f in tmp_path.iterdir()] == ['some.cache']
@@ -0,0 +1,103 @@
+'''
+tests for running.runningaheadmembers.RunningAheadMembers
+'''
+
+from running.runningaheadmembers import RunningAheadMembers
+
+MEMBERHDR = ('MemberID,MembershipType,FamilyName,GivenName,MiddleName,Gender,DOB,Email,EmailOptIn,PrimaryMember,'
+             'RenewalDate,JoinDate,ExpirationDate,Street1,Street2,City,State,PostalCode,Country,Telephone,EntryType')
+
+
+def _memberrow(memberid, lname, fname, dob, join, expiration):
+    fields = dict.fromkeys(MEMBERHDR.split(','), '')
+    fields.update({'MemberID': memberid, 'FamilyName': lname, 'GivenName': fname, 'DOB': dob,
+                   'JoinDate': join, 'ExpirationDate': expiration})
+    return ','.join(fields[f] for f in MEMBERHDR.split(','))
+
+
+def _members():
+    return RunningAheadMembers([
+        MEMBERHDR,
+        _memberrow('1', 'Smith', 'John', '1960-05-01', '2010-01-01', '2010-12-31'),
+        _memberrow('2', 'Smithers', 'Jon', '1960-05-01', '2010-01-01', '2010-12-31'),
+        _memberrow('3', 'Jones', 'Mary', '1970-02-03', '2011-01-01', '2011-12-31'),
+        _memberrow('4', 'Johnson', 'Mary', '1970-02-05', '2011-01-01', '2011-12-31'),
+    ])
+
+
+class TestGetMemberKey:
+    def test_exact_match(self):
+        members = _members()
+        assert members.getmemberkey('Smith', 'John', '1960-05-01') == ('Smith', 'John', '1960-05-01')
+        assert members.getclosematchkeys() == []
+
+    def test_exact_match_normalized(self):
+        members = _members()
+        assert members.getmemberkey('SMITH', ' john', '1960-05-01') == ('Smith', 'John', '1960-05-01')
+
+    def test_dob_index_has_each_name_once(self):
+        members = RunningAheadMembers([
+            MEMBERHDR,
+            _memberrow('1', 'Smith', 'John', '1960-05-01', '2010-01-01', '2010-12-31'),
+            _memberrow('1', 'Smith', 'John', '1960-05-01', '2011-01-01', '2011-12-31'),
+            _memberrow('2', 'Smithers', 'Jon', '1960-05-01', '2010-01-01', '2010-12-31'),
+        ])
+        assert members.dobnames['1960-05-01'] == {('Smith', 'John', '1960-05-01'), ('Smithers', 'Jon', '1960-05-01')}
+
+    def test_close_match_same_dob(self):
+        members = _members()
+        assert members.getmemberkey('Smith', 'Jon', '1960-05-01', cutoff=0.5) is None
+        assert ('Smith', 'John', '1960-05-01') in members.getclosematchkeys()
+
+    def test_close_match_compares_only_same_dob(self, monkeypatch):
+        members = _members()
+        monkeypatch.setattr(members.nameindex, 'postings', {})
+        assert members.getmemberkey('Smith', 'Jon', '1960-05-01', cutoff=0.5) is None
+        assert sorted(members.getclosematchkeys()) == [('Smith', 'John', '1960-05-01'), ('Smithers', 'Jon', '1960-05-01')]
+
+    def test_no_dob_match_without_tolerance(self):
+        members = _members()
+        assert members.getmemberkey('Jones', 'Mary', '1970-02-04') is None
+        assert members.getclosematchkeys() == []
+
+    def test_dob_tolerance(self):
+        members = _members()
+        assert members.getmemberkey('Jones', 'Mary', '1970-02-04', dobtolerance=1) is None
+        assert members.getclosematchkeys() == [('Jones', 'Mary', '1970-02-03')]
+
+    def test_any_dob(self):
+        members = _members()
+        assert members.getmemberkey('Jones', 'Mary', '1999-01-01', dobtolerance=None) is None
+        assert members.getclosematchkeys()[0] == ('Jones', 'Mary', '1970-02-03')
+
+
+class TestMembershipRecords:
+    def _overlapping(self):
+        return RunningAheadMembers([
+            MEMBERHDR,
+            _memberrow('1', 'Smith', 'John', '1960-05-01', '2011-06-01', '2012-12-31'),
+            _memberrow('1', 'Smith', 'John', '1960-05-01', '2010-01-01', '2011-12-31'),
+            _memberrow('3', 'Jones', 'Mary', '1970-02-03', '2011-01-01', '2011-12-31'),
+        ])
+
+    def test_membership_iter_adjusts_overlap(self):
+        members = self._overlapping()
+        joins = sorted((m.lname, m.join, m.expiration) for m in members.membership_iter())
+        assert joins == [('Jones', '2011-01-01', '2011-12-31'),
+                         ('Smith', '2010-01-01', '2011-12-31'),
+                         ('Smith', '2012-01-01', '2012-12-31')]
+
+    def test_membership_iter_raw(self):
+        members = self._overlapping()
+        raw = [r for r in members.membership_iter(raw=True) if r['FamilyName'] == 'Smith']
+        assert [r['JoinDate'] for r in raw] == ['2010-01-01', '2012-01-01']
+        assert raw[0]['MemberID'] == '1'
+
+    def test_member_iter_uses_earliest_join(self):
+        members = self._overlapping()
+        member = members.getmember(('Smith', 'John', '1960-05-01'))
+        assert (member.join, member.expiration) == ('2010-01-01', '2012-12-31')
+        raw = {r['FamilyName']: r for r in members.member_iter(raw=True)}
+        assert raw['Smith']['JoinDate'] == '2010-01-01'
+        # materialized records are independent of the stored membership
+        assert [m.join for m in members.getmemberships(('Smith', 'John', '1960-05-01'))] == ['2010-01-01', '2012-01-01']
@@ -0,0 +1,67 @@
+'''
+tests for running.runningaheadparticipants.RunningAheadParticipants
+'''
+
+import pytest
+
+from running.runningaheadparticipants import RunningAheadParticipants, unsupportedFileType
+
+PARTICIPANTHDR = ('Participant ID,Registration Date,Event Category,Status,Bib,Last Name,First Name,Middle Name,'
+                  'Gender,Age,DOB,Email,Street 1,Street 2,City,State,ZIP Code,Country')
+
+
+def _participantrow(lname, fname, dob, status='Registered', bib=''):
+    fields = dict.fromkeys(PARTICIPANTHDR.split(','), '')
+    fields.update({'Last Name': lname, 'First Name': fname, 'DOB': dob, 'Status': status, 'Bib': bib})
+    return ','.join(fields[f] for f in PARTICIPANTHDR.split(','))
+
+
+def _export(*rows):
+    return [PARTICIPANTHDR] + list(rows)
+
+
+class TestRunningAheadParticipants:
+    def test_activeregistrations(self):
+        participants = RunningAheadParticipants(_export(
+            _participantrow('Smith', 'John', '1960-05-01'),
+            _participantrow('Jones', 'Mary', '1970-02-03', status='Cancelled'),
+            _participantrow('Brown', 'Sam', '1980-07-07'),
+        ))
+        assert [p.lname for p in participants.activeregistrations_iter()] == ['Smith', 'Brown']
+        assert len(list(participants.allregistrations_iter())) == 3
+
+    def test_dobregistrations(self):
+        participants = RunningAheadParticipants(_export(
+            _participantrow('Smith', 'John', '1960-05-01'),
+            _participantrow('Smith', 'Jane', '1960-05-01', status='Cancelled'),
+        ))
+        assert [p.fname for p in participants.dobregistrations_iter('1960-05-01')] == ['John', 'Jane']
+        assert [p.fname for p in participants.dobregistrations_iter('1960-05-01', status='Registered')] == ['John']
+        assert list(participants.dobregistrations_iter('1999-01-01')) == []
+
+    def test_reload_delta(self):
+        participants = RunningAheadParticipants(_export(
+            _participantrow('Smith', 'John', '1960-05-01'),
+            _participantrow('Jones', 'Mary', '1970-02-03'),
+            _participantrow('Brown', 'Sam', '1980-07-07'),
+        ))
+        delta = participants.reload(_export(
+            _participantrow('Smith', 'John', '1960-05-01'),
+            _participantrow('Jones', 'Mary', '1970-02-03', status='Cancelled'),
+            _participantrow('Green', 'Al', '1990-01-01', bib='12'),
+        ))
+        assert delta == {'added': [('Green', 'Al', '1990-01-01')],
+                         'changed': [('Jones', 'Mary', '1970-02-03')],
+                         'removed': [('Brown', 'Sam', '1980-07-07')]}
+        assert sorted(p.lname for p in participants.activeregistrations_iter()) == ['Green', 'Smith']
+        assert list(participants.dobregistrations_iter('1980-07-07')) == []
+        assert 'Cancelled' in participants.statuses
+
+    def test_reload_unchanged(self):
+        export = _export(_participantrow('Smith', 'John', '1960-05-01'))
+        participants = RunningAheadParticipants(export)
+        assert participants.reload(export) == {'added': [], 'changed': [], 'removed': []}
+
+    def test_unsupported_file_type(self):
+        with pytest.raises(unsupportedFileType):
+            RunningAheadParticipants(42)
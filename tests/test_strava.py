@@ -0,0 +1,152 @@
+'''
+tests for running.strava.Strava club activity cache
+'''
+
+import json
+import os
+
+import pytest
+
+pytest.importorskip('running.strava')
+from running.strava import Strava
+
+
+def _activity(id, day=1, hour=10):
+    return {'id': id, 'name': 'run {}'.format(id), 'start_date': '2026-01-{:02d}T{:02d}:00:00Z'.format(day, hour)}
+
+
+def _cachelines(cachefile):
+    with open(cachefile) as f:
+        return [json.loads(line) for line in f]
+
+
+def _idlines(cachefile):
+    with open('{}.ids'.format(cachefile)) as f:
+        return f.read().splitlines()
+
+
+@pytest.fixture
+def cachefile(tmp_path):
+    return str(tmp_path / 'club.cache')
+
+
+def _strava(cachefile, **kwargs):
+    return Strava(clubactivitycachefilename=cachefile, key='token', **kwargs)
+
+
+class TestClubActivityCache:
+    def test_append(self, cachefile):
+        s = _strava(cachefile)
+        s._addactivity(_activity(1))
+        s._addactivity(_activity(2, day=2))
+        s.close()
+        assert [a['id'] for a in _cachelines(cachefile)] == [1, 2]
+        idlines = _idlines(cachefile)
+        assert len(idlines) == 3 and 'compacted' in json.loads(idlines[0])
+
+        with open(cachefile, 'rb') as f:
+            before = f.read()
+        s = _strava(cachefile)
+        s._addactivity(_activity(3, day=3))
+        s.close()
+        with open(cachefile, 'rb') as f:
+            after = f.read()
+        assert after.startswith(before)
+        assert [a['id'] for a in _cachelines(cachefile)] == [1, 2, 3]
+        assert _idlines(cachefile)[:3] == idlines
+        assert int(_idlines(cachefile)[-1].split(',')[2]) == os.path.getsize(cachefile)
+
+    def test_reopen_reads_index_only(self, cachefile):
+        s = _strava(cachefile)
+        s._addactivity(_activity(1))
+        s._addactivity(_activity(2, day=2))
+        s.close()
+
+        s = _strava(cachefile)
+        assert s._clubactivitycache is None
+        assert sorted(s.clubactivityids) == [1, 2]
+        assert s.newestcachedtime == s.clubactivityids[2]
+        assert s.clubactivitycachesize == 2
+        assert sorted(s.clubactivitycache) == [1, 2]
+
+    def test_duplicates_suppressed(self, cachefile):
+        s = _strava(cachefile)
+        s._addactivity(_activity(1))
+        s._addactivity(_activity(1))
+        assert s.clubactivitycacheadded == 1
+        s.close()
+
+        s = _strava(cachefile)
+        s._addactivity(_activity(1))
+        s._addactivity(_activity(2, day=2))
+        assert [a['id'] for a in s.clubactivitypending] == [2]
+        s.close()
+        assert [a['id'] for a in _cachelines(cachefile)] == [1, 2]
+
+    def test_pending_visible_before_close(self, cachefile):
+        s = _strava(cachefile)
+        s._addactivity(_activity(1))
+        assert list(s.clubactivitycache) == [1]
+        s.close()
+        s = _strava(cachefile)
+        s._addactivity(_activity(2, day=2))
+        assert sorted(s.clubactivitycache) == [1, 2]
+
+    def test_stale_index_rebuilt(self, cachefile):
+        s = _strava(cachefile)
+        s._addactivity(_activity(1))
+        s.close()
+
+        # cache appended but index not, e.g., interrupted close()
+        with open(cachefile, 'a') as f:
+            f.write('{}\n'.format(json.dumps(_activity(2, day=2))))
+        s = _strava(cachefile)
+        assert sorted(s.clubactivityids) == [1, 2]
+        assert int(_idlines(cachefile)[-1].split(',')[2]) == os.path.getsize(cachefile)
+
+    def test_corrupt_index_rebuilt(self, cachefile):
+        s = _strava(cachefile)
+        s._addactivity(_activity(1))
+        s.close()
+
+        with open('{}.ids'.format(cachefile), 'w') as f:
+            f.write('not json\n1,garbage\n')
+        s = _strava(cachefile)
+        assert list(s.clubactivityids) == [1]
+        assert len(_idlines(cachefile)) == 2
+
+    def test_index_without_cache_removed(self, cachefile):
+        s = _strava(cachefile)
+        s._addactivity(_activity(1))
+        s.close()
+
+        os.remove(cachefile)
+        s = _strava(cachefile)
+        assert s.clubactivityids == {}
+        assert not os.path.exists('{}.ids'.format(cachefile))
+
+    def test_compaction(self, cachefile):
+        # two processes appended the same activity
+        s = _strava(cachefile)
+        s._addactivity(_activity(1))
+        s._addactivity(_activity(2, day=2))
+        s.close()
+        with open(cachefile, 'a') as f:
+            f.write('{}\n'.format(json.dumps(_activity(2, day=2))))
+
+        # not due for compaction yet
+        s = _strava(cachefile)
+        s.close()
+        assert [a['id'] for a in _cachelines(cachefile)] == [1, 2, 2]
+
+        s = _strava(cachefile, compactinterval=0)
+        s._addactivity(_activity(3, day=3))
+        s.close()
+        assert [a['id'] for a in _cachelines(cachefile)] == [1, 2, 3]
+        idlines = _idlines(cachefile)
+        assert [line.split(',')[0] for line in idlines[1:]] == ['1', '2', '3']
+        assert int(idlines[-1].split(',')[2]) == os.path.getsize(cachefile)
+        assert sorted(os.listdir(os.path.dirname(cachefile))) == ['club.cache', 'club.cache.ids']
+
+        s = _strava(cachefile)
+        assert s.clubactivitycachecompacted == json.loads(idlines[0])['compacted']
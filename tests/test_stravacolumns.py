@@ -0,0 +1,56 @@
+'''
+tests for running.stravacolumns.ActivityColumns
+'''
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from running.stravacolumns import ActivityColumns
+
+
+def _activity(id, athlete, day, type='Run', distance=1000.0, elapsed_time=300):
+    return {'id': id, 'type': type, 'distance': distance, 'elapsed_time': elapsed_time,
+            'start_date': '{}T12:00:00Z'.format(day), 'start_date_local': '{}T08:00:00Z'.format(day),
+            'athlete': {'firstname': athlete, 'lastname': 'Runner'}}
+
+
+ACTIVITIES = [
+    _activity(1, 'Ann', '2026-01-05', distance=5000.0),                # Monday
+    _activity(2, 'Ann', '2026-01-11', distance=3000.0),                # Sunday, same week
+    _activity(3, 'Bob', '2026-01-06', distance=10000.0),
+    _activity(4, 'Bob', '2026-01-12', type='Ride', distance=40000.0),  # next week
+    _activity(5, 'Cat', '2026-01-13', distance=8000.0),
+]
+
+
+class TestActivityColumns:
+    def test_totals(self):
+        columns = ActivityColumns(ACTIVITIES)
+        assert columns.totals() == {'activities': 5, 'athletes': 3, 'distance': 66000.0, 'elapsed_time': 1500.0}
+        assert columns.totals(begin='2026-01-12', type='Run') == {'activities': 1, 'athletes': 1,
+                                                                  'distance': 8000.0, 'elapsed_time': 300.0}
+        assert columns.totals(type='Swim')['activities'] == 0
+
+    def test_weeklydistance(self):
+        weeks, athletes, distance = ActivityColumns(ACTIVITIES).weeklydistance(type='Run')
+        assert [str(w) for w in weeks] == ['2026-01-05', '2026-01-12']
+        assert athletes == ['Ann Runner', 'Bob Runner', 'Cat Runner']
+        assert distance.tolist() == [[8000.0, 0.0], [10000.0, 0.0], [0.0, 8000.0]]
+
+    def test_leaderboard(self):
+        columns = ActivityColumns(ACTIVITIES)
+        assert columns.leaderboard(type='Run') == [('Bob Runner', 10000.0, 1), ('Ann Runner', 8000.0, 2),
+                                                   ('Cat Runner', 8000.0, 1)]
+        assert columns.leaderboard(type='Run', n=1, field='activities') == [('Ann Runner', 2.0, 2)]
+        assert columns.leaderboard(end='2026-01-06', n=None) == [('Bob Runner', 10000.0, 1), ('Ann Runner', 5000.0, 1)]
+
+    def test_leaderboards_by_type(self):
+        leaderboards = ActivityColumns(ACTIVITIES).leaderboards(n=1)
+        assert leaderboards == {'Run': [('Bob Runner', 10000.0, 1)], 'Ride': [('Bob Runner', 40000.0, 1)]}
+
+    def test_empty(self):
+        columns = ActivityColumns([])
+        assert len(columns) == 0
+        assert columns.totals()['activities'] == 0
+        assert columns.leaderboard() == []
@@ -0,0 +1,91 @@
+'''
+tests for running.stravaquota.StravaQuota
+'''
+
+import pytest
+
+from running.stravaquota import StravaQuota
+
+# 2026-01-01 00:05:00 UTC
+START = 1767225900
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _quota(**kwargs):
+    clock = FakeClock(START)
+    return StravaQuota(clock=clock, sleep=clock.sleep, **kwargs), clock
+
+
+class TestStravaQuota:
+    def test_no_wait_under_limits(self):
+        quota, clock = _quota()
+        quota.update({'X-RateLimit-Limit': '600,30000', 'X-RateLimit-Usage': '10,100'})
+        assert quota.wait() == 0
+        assert clock.sleeps == []
+
+    def test_waits_for_short_window(self):
+        quota, clock = _quota()
+        quota.update({'X-RateLimit-Limit': '600,30000', 'X-RateLimit-Usage': '600,1000'})
+        # next 15 minute window starts at 00:15:00
+        assert quota.wait() == 10*60
+        assert quota.shortusage == 0
+        assert quota.dailyusage == 1000
+
+    def test_waits_for_daily_window(self):
+        quota, clock = _quota()
+        quota.update({'X-RateLimit-Limit': '600,30000', 'X-RateLimit-Usage': '5,30000'})
+        assert quota.wait() == 24*60*60 - 5*60
+        assert (quota.shortusage, quota.dailyusage) == (0, 0)
+
+    def test_reserve(self):
+        quota, clock = _quota(reserve=10)
+        quota.update({'X-RateLimit-Limit': '600,30000', 'X-RateLimit-Usage': '590,1000'})
+        assert quota.wait() == 10*60
+
+    def test_counts_requests_without_headers(self):
+        quota, clock = _quota()
+        quota.update({})
+        quota.update({'X-RateLimit-Usage': 'garbage'})
+        assert (quota.shortusage, quota.dailyusage) == (2, 2)
+
+    def test_exhausted(self):
+        quota, clock = _quota()
+        quota.update({'X-RateLimit-Limit': '600,30000', 'X-RateLimit-Usage': '100,1000'})
+        quota.exhausted()
+        assert quota.wait() == 10*60
+
+    def test_no_pacing_within_burst(self):
+        quota, clock = _quota()
+        quota.update({'X-RateLimit-Limit': '600,30000', 'X-RateLimit-Usage': '299,14999'})
+        assert quota.wait() == 0
+
+    def test_paces_after_burst(self):
+        quota, clock = _quota()
+        # 5 minutes into the window, 300 of 600 requests left to spread over the window
+        quota.update({'X-RateLimit-Limit': '600,30000', 'X-RateLimit-Usage': '400,1000'})
+        assert quota.wait() == pytest.approx(101 * 15*60 / 300 - 5*60)
+        quota.update({'X-RateLimit-Limit': '600,30000', 'X-RateLimit-Usage': '401,1001'})
+        assert quota.wait() == pytest.approx(15*60 / 300)
+
+    def test_paces_daily_window(self):
+        quota, clock = _quota()
+        # 5 minutes into the day, 5000 requests past the burst of 15000
+        quota.update({'X-RateLimit-Limit': '600,30000', 'X-RateLimit-Usage': '10,20000'})
+        assert quota.wait() == pytest.approx(5001 * 24*60*60 / 15000 - 5*60)
+
+    def test_burst_1_only_waits_when_used_up(self):
+        quota, clock = _quota(burst=1)
+        quota.update({'X-RateLimit-Limit': '600,30000', 'X-RateLimit-Usage': '599,29999'})
+        assert quota.wait() == 0
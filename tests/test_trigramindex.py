@@ -0,0 +1,48 @@
+'''
+tests for running.trigramindex.TrigramIndex
+'''
+
+from running.trigramindex import TrigramIndex, trigrams
+
+
+class TestTrigrams:
+    def test_normalizes_case_and_whitespace(self):
+        assert trigrams('John  Smith') == trigrams('john smith')
+
+    def test_padding_represents_start_and_end(self):
+        grams = trigrams('ab')
+        assert '  a' in grams
+        assert 'ab ' in grams
+
+
+class TestTrigramIndex:
+    def test_exact_name_is_most_similar(self):
+        index = TrigramIndex()
+        index.add('john smith', 'js')
+        index.add('jon smithers', 'jss')
+        index.add('mary jones', 'mj')
+        matches = index.search('john smith', cutoff=0.3)
+        assert matches[0] == (1.0, 'js')
+        assert 'mj' not in [key for similarity, key in matches]
+
+    def test_cutoff_and_n(self):
+        index = TrigramIndex()
+        for i in range(20):
+            index.add('runner {}'.format(i), i)
+        assert len(index.search('runner 1', cutoff=0.1, n=5)) == 5
+        assert index.search('completely different', cutoff=0.9) == []
+
+    def test_keyfilter(self):
+        index = TrigramIndex()
+        index.add('john smith', 1)
+        index.add('john smith', 2)
+        assert index.search('john smith', keyfilter=lambda key: key == 2) == [(1.0, 2)]
+
+    def test_candidates(self):
+        index = TrigramIndex()
+        index.add('john smith', 1)
+        index.add('jon smith', 2)
+        index.add('john smith', 3)
+        assert index.search('john smith', cutoff=0.5, candidates={2, 3, 4}) == \
+            [(1.0, 3)] + [match for match in index.search('john smith', cutoff=0.5) if match[1] == 2]
+        assert index.search('john smith', candidates=[]) == []
@@ -0,0 +1,87 @@
+'''
+tests for running.ultrasignup.UltraSignup search results cache
+'''
+
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+from running.hostpool import orderedmap
+from running.ultrasignup import UltraSignup, normname
+
+
+class FakeResponse(dict):
+    def __init__(self, status):
+        self.status = status
+
+
+class FakeHttp:
+    '''
+    stands in for httplib2.Http, returning one runner with no results for each search
+    '''
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.paths = []
+        self.lock = threading.Lock()
+
+    def request(self, url):
+        path = urlparse(url).path
+        with self.lock:
+            self.paths.append(path)
+        time.sleep(self.delay)
+        return FakeResponse(200), json.dumps([{'Gender': 'M', 'Results': [], 'path': path}]).encode()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _ultrasignup(**kwargs):
+    ultra = UltraSignup(**kwargs)
+    ultra.http = FakeHttp()
+    return ultra
+
+
+class TestNormName:
+    def test_ignores_case_and_whitespace(self):
+        assert normname(' Mary  Ann ', 'SMITH') == normname('mary ann', 'Smith') == ('mary ann', 'smith')
+
+
+class TestResultsCache:
+    def test_repeated_name_not_searched_again(self):
+        ultra = _ultrasignup()
+        ultra.gethistory('Jo', 'Smith')
+        ultra.gethistory('JO', 'smith ')
+        assert len(ultra.http.paths) == 1
+        assert ultra.resultscachehits == 1
+
+    def test_expires(self):
+        clock = FakeClock()
+        ultra = _ultrasignup(resultsttl=60, clock=clock)
+        ultra.gethistory('Jo', 'Smith')
+        clock.now += 59
+        ultra.gethistory('Jo', 'Smith')
+        clock.now += 1
+        ultra.gethistory('Jo', 'Smith')
+        assert len(ultra.http.paths) == 2
+
+    def test_expired_entries_removed(self):
+        clock = FakeClock()
+        ultra = _ultrasignup(resultsttl=60, clock=clock)
+        ultra.gethistory('Jo', 'Smith')
+        clock.now += 30
+        ultra.gethistory('Al', 'Jones')
+        clock.now += 30
+        ultra.gethistory('Bo', 'Brown')
+        assert list(ultra.resultscache) == [('al', 'jones'), ('bo', 'brown')]
+
+    def test_concurrent_searches_coalesced(self):
+        ultra = _ultrasignup()
+        ultra.http = FakeHttp(delay=0.05)
+        list(orderedmap(lambda i: ultra.gethistory('Jo', 'Smith'), range(6), workers=6))
+        assert len(ultra.http.paths) == 1